@@ -7,13 +7,26 @@ VNDK_VENDOR_API := $(if $(TARGET_VENDOR_API_LEVEL),$(TARGET_VENDOR_API_LEVEL),15
 VNDK_SYSTEM_API := $(if $(TARGET_SYSTEM_API_LEVEL),$(TARGET_SYSTEM_API_LEVEL),16)
 
 VNDK_COMPAT_DIR := build/make/tools/vndk_compat/
-VNDK_COMPAT_PLAN := $(PRODUCT_OUT)/vndk_compat_plan.json
+# Plan format: json, or vcplan for the compact columnar format
+# (plan_table.py) when badly mismatched vendors produce huge plans.
+# Every plan consumer reads either; plan_table.py converts between them.
+VNDK_COMPAT_PLAN_FORMAT ?= json
+VNDK_COMPAT_PLAN := $(PRODUCT_OUT)/vndk_compat_plan.$(VNDK_COMPAT_PLAN_FORMAT)
 VNDK_COMPAT_PROP := $(PRODUCT_OUT)/vndk_compat.prop
+VNDK_COMPAT_SCORE := $(PRODUCT_OUT)/vndk_compat_score.json
+VNDK_COMPAT_DRAFT_RULES := $(PRODUCT_OUT)/vndk_compat_draft_rules.json
 
 VNDK_SYSTEM_MODEL := $(VNDK_COMPAT_DIR)/models/v$(VNDK_SYSTEM_API).model.json
 VNDK_VENDOR_FOOTPRINT := $(PRODUCT_OUT)/vendor_footprint.json
 VNDK_POLICY := $(VNDK_COMPAT_DIR)/policies/v$(VNDK_VENDOR_API).policy.json
 
+# Stage memoization: set VNDK_COMPAT_CACHE_DIR (e.g. a CI cache volume shared
+# by several checkouts) to restore unchanged stage outputs instead of
+# recomputing them. Unset, stage_cache.py just runs the command.
+VNDK_COMPAT_CACHE_DIR ?=
+VNDK_STAGE := python3 $(VNDK_COMPAT_DIR)/stage_cache.py \
+	$(if $(VNDK_COMPAT_CACHE_DIR),--cache-dir $(VNDK_COMPAT_CACHE_DIR))
+
 # ---------------------------------------------------------------
 # Guard: Only run the pipeline if required inputs exist.
 # The system model must be pre-generated (see models/README.md).
@@ -26,26 +39,46 @@ ifneq ($(wildcard $(VNDK_POLICY)),)
 #    Requires: system model + vendor footprint + policy
 #    If the system model doesn't exist yet, the rule will fail
 #    with a clear error from make (missing prerequisite).
-$(VNDK_COMPAT_PLAN): $(VNDK_COMPAT_DIR)/vndk_diff_engine.py $(VNDK_SYSTEM_MODEL) $(VNDK_VENDOR_FOOTPRINT)
+#    ABI breaks no policy rule covers get ranked draft rules in
+#    $(VNDK_COMPAT_DRAFT_RULES) for review.
+$(VNDK_COMPAT_PLAN): $(VNDK_COMPAT_DIR)/vndk_diff_engine.py $(VNDK_COMPAT_DIR)/symbol_suggest.py $(VNDK_COMPAT_DIR)/plan_io.py $(VNDK_COMPAT_DIR)/plan_table.py $(VNDK_SYSTEM_MODEL) $(VNDK_VENDOR_FOOTPRINT)
 	@echo "VNDK Compat Engine: Analyzing $(VNDK_VENDOR_API) -> $(VNDK_SYSTEM_API)..."
-	$(hide) python3 $(VNDK_COMPAT_DIR)/vndk_diff_engine.py \
+	$(hide) $(VNDK_STAGE) --stage diff \
+		--input $(VNDK_SYSTEM_MODEL) --input $(VNDK_VENDOR_FOOTPRINT) --input $(VNDK_POLICY) \
+		--tool $(VNDK_COMPAT_DIR)/vndk_diff_engine.py --tool $(VNDK_COMPAT_DIR)/symbol_suggest.py \
+		--tool $(VNDK_COMPAT_DIR)/plan_io.py --tool $(VNDK_COMPAT_DIR)/plan_table.py \
+		--output $@ --output $(VNDK_COMPAT_DRAFT_RULES) -- \
+		python3 $(VNDK_COMPAT_DIR)/vndk_diff_engine.py \
 		--system-model $(VNDK_SYSTEM_MODEL) \
 		--vendor-footprint $(VNDK_VENDOR_FOOTPRINT) \
 		--policy $(VNDK_POLICY) \
-		--output $@
+		--output $@ \
+		--suggest-rules $(VNDK_COMPAT_DRAFT_RULES)
 
 # 2. Scoring System: Calculate health metrics
-$(VNDK_COMPAT_PROP): $(VNDK_COMPAT_DIR)/scoring_system.py $(VNDK_COMPAT_PLAN)
+#    Also writes a per-library / per-penalty breakdown next to the plan.
+$(VNDK_COMPAT_PROP): $(VNDK_COMPAT_DIR)/scoring_system.py $(VNDK_COMPAT_DIR)/plan_io.py $(VNDK_COMPAT_DIR)/plan_table.py $(VNDK_COMPAT_PLAN)
 	@echo "VNDK Compat: Calculating compatibility score..."
-	$(hide) python3 $(VNDK_COMPAT_DIR)/scoring_system.py \
+	$(hide) $(VNDK_STAGE) --stage score \
+		--input $(VNDK_COMPAT_PLAN) \
+		--tool $(VNDK_COMPAT_DIR)/scoring_system.py --tool $(VNDK_COMPAT_DIR)/plan_io.py \
+		--tool $(VNDK_COMPAT_DIR)/plan_table.py \
+		--output $@ --output $(VNDK_COMPAT_SCORE) -- \
+		python3 $(VNDK_COMPAT_DIR)/scoring_system.py \
 		--plan $(VNDK_COMPAT_PLAN) \
-		--output-props $@
+		--output-props $@ \
+		--output-breakdown $(VNDK_COMPAT_SCORE)
 
 # 3. Linker IR: Transform graph to configuration
 VNDK_LINKER_CONFIG := $(PRODUCT_OUT)/system/etc/linker.config.json
-$(VNDK_LINKER_CONFIG): $(VNDK_COMPAT_DIR)/linker_ir.py $(VNDK_COMPAT_PLAN)
+$(VNDK_LINKER_CONFIG): $(VNDK_COMPAT_DIR)/linker_ir.py $(VNDK_COMPAT_DIR)/plan_io.py $(VNDK_COMPAT_DIR)/plan_table.py $(VNDK_COMPAT_PLAN)
 	@echo "VNDK Compat: Generating Linker Namespace via IR..."
-	$(hide) python3 $(VNDK_COMPAT_DIR)/linker_ir.py \
+	$(hide) $(VNDK_STAGE) --stage linker_ir \
+		--input $(VNDK_LINKER_CONFIG).orig --input $(VNDK_COMPAT_PLAN) \
+		--tool $(VNDK_COMPAT_DIR)/linker_ir.py --tool $(VNDK_COMPAT_DIR)/plan_io.py \
+		--tool $(VNDK_COMPAT_DIR)/plan_table.py \
+		--output $@ -- \
+		python3 $(VNDK_COMPAT_DIR)/linker_ir.py \
 		--input-config $(VNDK_LINKER_CONFIG).orig \
 		--plan $(VNDK_COMPAT_PLAN) \
 		--output $@
@@ -2,22 +2,21 @@
 import os
 import sys
 import argparse
-import xml.etree.ElementTree as ET
 import subprocess
 import json
 
+import vintf_model
+from elf_discovery import discover_libraries
+
 def parse_vintf_manifest(manifest_path):
-    """Parses vendor manifest.xml to find HAL dependencies."""
+    """Parses vendor manifest.xml (plus fragments) to find HAL dependencies."""
     hal_deps = []
     if not os.path.exists(manifest_path):
         return hal_deps
-    
-    tree = ET.parse(manifest_path)
-    root = tree.getroot()
-    for hal in root.findall('hal'):
-        name = hal.find('name').text
-        versions = [v.text for v in hal.findall('version')]
-        hal_deps.append({'name': name, 'versions': versions})
+
+    index = vintf_model.load_manifest(manifest_path)
+    for name in index.names():
+        hal_deps.append({'name': name, 'versions': index.versions(name)})
     return hal_deps
 
 def get_elf_dependencies(file_path):
@@ -36,16 +35,14 @@ def get_elf_dependencies(file_path):
 def analyze_vendor_partition(vendor_path, system_libs):
     """Scans vendor partition for library dependencies."""
     missing_deps = {}
-    for root, dirs, files in os.walk(vendor_path):
-        for f in files:
-            if f.endswith('.so'):
-                full_path = os.path.join(root, f)
-                deps = get_elf_dependencies(full_path)
-                for dep in deps:
-                    if dep not in system_libs:
-                        if dep not in missing_deps:
-                            missing_deps[dep] = []
-                        missing_deps[dep].append(full_path)
+    for lib in discover_libraries(vendor_path):
+        # Parse each unique library once, attribute results to every alias
+        deps = get_elf_dependencies(lib.path)
+        for dep in deps:
+            if dep not in system_libs:
+                if dep not in missing_deps:
+                    missing_deps[dep] = []
+                missing_deps[dep].extend(lib.aliases)
     return missing_deps
 
 def main():
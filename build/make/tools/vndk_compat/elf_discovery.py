@@ -0,0 +1,182 @@
+#!/usr/bin/env python3
+"""Shared shared-library discovery for the VNDK compat tools.
+
+Walks a tree with os.scandir, keeps only real ELF shared objects (sniffed
+from the ELF identification header, not the file name) and collapses
+hardlinks, symlinks and byte-identical copies so every unique library is
+parsed once. Each result carries the full list of paths it was found at.
+"""
+import os
+import re
+import sys
+import hashlib
+import argparse
+from typing import Dict, Iterator, List, Optional, Tuple
+
+ELF_MAGIC = b'\x7fELF'
+ELF_HEADER_PROBE = 20  # e_ident (16) + e_type (2) + e_machine (2)
+ELFCLASS = {1: 32, 2: 64}
+ET_DYN = 3
+
+# libfoo.so, libfoo.so.1, libfoo.so.1.2.3
+SHARED_LIB_RE = re.compile(r'\.so(\.\d+)*$')
+
+HASH_BLOCK = 1 << 20
+
+
+class ElfLibrary:
+    __slots__ = ('path', 'aliases', 'elf_class', 'size', 'dev', 'ino')
+
+    def __init__(self, path: str, elf_class: int, size: int, dev: int, ino: int):
+        self.path = path
+        self.aliases = [path]
+        self.elf_class = elf_class
+        self.size = size
+        self.dev = dev
+        self.ino = ino
+
+    @property
+    def name(self) -> str:
+        return os.path.basename(self.path)
+
+    @property
+    def names(self) -> List[str]:
+        """Distinct basenames this library is reachable under, primary first."""
+        seen = [self.name]
+        for p in self.aliases:
+            n = os.path.basename(p)
+            if n not in seen:
+                seen.append(n)
+        return seen
+
+    def __repr__(self):
+        return f"ElfLibrary({self.path!r}, aliases={len(self.aliases)})"
+
+
+def sniff_elf(path: str) -> Optional[Tuple[int, int]]:
+    """Returns (elf_class, e_type) for ELF files, None for anything else."""
+    try:
+        with open(path, 'rb') as f:
+            head = f.read(ELF_HEADER_PROBE)
+    except OSError:
+        return None
+    if len(head) < ELF_HEADER_PROBE or head[:4] != ELF_MAGIC:
+        return None
+    elf_class = ELFCLASS.get(head[4])
+    if elf_class is None:
+        return None
+    byteorder = 'big' if head[5] == 2 else 'little'
+    return elf_class, int.from_bytes(head[16:18], byteorder)
+
+
+def _scan(top: str) -> Iterator[Tuple[str, os.stat_result]]:
+    stack = [top]
+    while stack:
+        d = stack.pop()
+        try:
+            it = os.scandir(d)
+        except OSError:
+            continue
+        with it:
+            for entry in it:
+                try:
+                    # Like os.walk: do not descend into symlinked directories
+                    if entry.is_dir(follow_symlinks=False):
+                        stack.append(entry.path)
+                        continue
+                    if not SHARED_LIB_RE.search(entry.name):
+                        continue
+                    st = entry.stat()  # follows symlinks; dangling links raise
+                except OSError:
+                    continue
+                yield entry.path, st
+
+
+def _content_hash(path: str) -> Optional[str]:
+    h = hashlib.blake2b(digest_size=20)
+    try:
+        with open(path, 'rb') as f:
+            for block in iter(lambda: f.read(HASH_BLOCK), b''):
+                h.update(block)
+    except OSError:
+        return None
+    return h.hexdigest()
+
+
+def _primary_key(path: str):
+    # Prefer real files over symlinks, then the shortest / lexically first path
+    return (os.path.islink(path), len(path), path)
+
+
+def discover_libraries(*roots: str, dedup_content: bool = True) -> List[ElfLibrary]:
+    """Returns unique ELF shared libraries under `roots`.
+
+    Entries are collapsed first by (st_dev, st_ino), then (optionally) by
+    content hash among files of equal size.
+    """
+    by_inode: Dict[Tuple[int, int], ElfLibrary] = {}
+    for root in roots:
+        for path, st in _scan(root):
+            key = (st.st_dev, st.st_ino)
+            lib = by_inode.get(key)
+            if lib is not None:
+                lib.aliases.append(path)
+                continue
+            sniffed = sniff_elf(path)
+            if sniffed is None or sniffed[1] != ET_DYN:
+                continue
+            by_inode[key] = ElfLibrary(path, sniffed[0], st.st_size, *key)
+
+    libs = list(by_inode.values())
+    if dedup_content:
+        libs = _collapse_identical(libs)
+
+    for lib in libs:
+        lib.aliases.sort(key=_primary_key)
+        lib.path = lib.aliases[0]
+    libs.sort(key=lambda l: l.path)
+    return libs
+
+
+def _collapse_identical(libs: List[ElfLibrary]) -> List[ElfLibrary]:
+    by_size: Dict[int, List[ElfLibrary]] = {}
+    for lib in libs:
+        by_size.setdefault(lib.size, []).append(lib)
+
+    result = []
+    for group in by_size.values():
+        if len(group) == 1:
+            result.append(group[0])
+            continue
+        by_hash: Dict[str, ElfLibrary] = {}
+        for lib in group:
+            digest = _content_hash(lib.path)
+            if digest is None:
+                result.append(lib)
+                continue
+            first = by_hash.get(digest)
+            if first is None:
+                by_hash[digest] = lib
+            else:
+                first.aliases.extend(lib.aliases)
+        result.extend(by_hash.values())
+    return result
+
+
+def main():
+    parser = argparse.ArgumentParser(description='List unique ELF shared libraries')
+    parser.add_argument('roots', nargs='+')
+    parser.add_argument('--no-content-dedup', action='store_true')
+    args = parser.parse_args()
+
+    libs = discover_libraries(*args.roots, dedup_content=not args.no_content_dedup)
+    total = 0
+    for lib in libs:
+        total += len(lib.aliases)
+        extra = f"  (+{len(lib.aliases) - 1} aliases)" if len(lib.aliases) > 1 else ""
+        print(f"{lib.path}  elf{lib.elf_class}{extra}")
+    print(f"{len(libs)} unique libraries, {total} paths", file=sys.stderr)
+
+
+if __name__ == '__main__':
+    main()
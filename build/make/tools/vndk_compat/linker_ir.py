@@ -4,6 +4,8 @@ import argparse
 import os
 from typing import Dict, List, Set, Any
 
+from plan_io import read_plan_header
+
 class NamespaceNode:
     def __init__(self, name: str):
         self.name = name
@@ -45,7 +47,7 @@ class LinkerNamespaceIR:
 def main():
     parser = argparse.ArgumentParser(description='Linker Namespace IR Tool')
     parser.add_argument('--input-config', help='Optional base linker.config.json')
-    parser.add_argument('--plan', required=True, help='Compat plan JSON')
+    parser.add_argument('--plan', required=True, help='Compat plan (.json, .jsonl or .vcplan)')
     parser.add_argument('--output', required=True)
 
     args = parser.parse_args()
@@ -64,9 +66,8 @@ def main():
                 node.permitted_paths.update(ns.get('permitted_paths', []))
 
     # Apply plan-based adjustments
-    with open(args.plan, 'r') as f:
-        plan = json.load(f)
-    
+    plan = read_plan_header(args.plan)
+
     v_api = plan.get('vendor_api_level', 15)
     compat_ns = f"vndk_compat_v{v_api}"
     
@@ -0,0 +1,356 @@
+#!/usr/bin/env python3
+"""Dynamic-linker load cost estimator for vendor libraries and compat shims.
+
+Counts relocations (.rela.dyn / .rela.plt / .relr.dyn), undefined symbol
+lookups and DT_NEEDED depth for every library in the given directories,
+turns them into a rough linker-time / dirty-memory estimate and rolls the
+numbers up per linker namespace (from linker_ir.py output) and per process.
+
+The absolute numbers are a model, not a measurement; they are meant for
+ranking libraries and comparing shim/remap/stub choices against each other.
+"""
+import os
+import re
+import sys
+import json
+import argparse
+import subprocess
+from typing import Dict, List, Optional, Tuple
+
+from elf_discovery import discover_libraries
+from plan_io import iter_plan_actions, write_plan
+
+# Cost model (nanoseconds / bytes), tuned for a mid-range arm64 core
+RELATIVE_RELOC_NS = 2
+RELR_RELOC_NS = 1
+LOOKUP_NS_PER_SCOPE_LIB = 40  # one GNU hash probe per library in lookup scope
+MAP_NS_PER_LIB = 25000        # open + mmap + header parsing
+PAGE_SIZE = 4096
+RELOC_SLOT_BYTES = 8
+
+# Generated shim shapes (see shim_generator.py templates)
+SHIM_COSTS = {
+    # exported forwarder: static fn pointer + lazy dlsym on first call
+    "forward": {"symbolic_relocs": 0, "runtime_lookups": 1, "bss_bytes": 8, "text_bytes": 96},
+    # remap: direct call to the new symbol, bound at load time
+    "remap": {"symbolic_relocs": 1, "runtime_lookups": 0, "bss_bytes": 0, "text_bytes": 16},
+    # stub: self-contained, only the ALOGW import
+    "stub": {"symbolic_relocs": 0, "runtime_lookups": 0, "bss_bytes": 0, "text_bytes": 32},
+}
+
+_RELOC_HDR_RE = re.compile(r"^Relocation section '([^']+)' at offset \S+ contains (\d+) entr")
+_NEEDED_RE = re.compile(r"\(NEEDED\)\s+Shared library: \[([^\]]+)\]")
+_SYMTAB_HDR_RE = re.compile(r"^Symbol table '([^']+)'")
+
+
+def run_readelf(file_path: str, args: List[str]) -> str:
+    try:
+        return subprocess.check_output(['readelf'] + args + [file_path], stderr=subprocess.DEVNULL).decode()
+    except Exception:
+        return ""
+
+
+class LibCost:
+    __slots__ = ('name', 'path', 'device_path', 'needed', 'relative', 'relr',
+                 'symbolic', 'plt', 'undefined', 'exports', 'depth', 'scope')
+
+    def __init__(self, name: str, path: str, device_path: str):
+        self.name = name
+        self.path = path
+        self.device_path = device_path
+        self.needed = []
+        self.relative = 0
+        self.relr = 0
+        self.symbolic = 0
+        self.plt = 0
+        self.undefined = 0
+        self.exports = 0
+        self.depth = 0
+        self.scope = 1
+
+    @property
+    def lookups(self) -> int:
+        return self.symbolic + self.plt
+
+    def est_ns(self) -> int:
+        return (MAP_NS_PER_LIB
+                + self.relative * RELATIVE_RELOC_NS
+                + self.relr * RELR_RELOC_NS
+                + self.lookups * LOOKUP_NS_PER_SCOPE_LIB * self.scope)
+
+    def est_dirty_bytes(self) -> int:
+        slots = self.relative + self.relr + self.symbolic + self.plt
+        # Relocated slots dirty whole pages (GOT, .data.rel.ro)
+        return -(-slots * RELOC_SLOT_BYTES // PAGE_SIZE) * PAGE_SIZE
+
+    def to_json(self) -> Dict:
+        return {
+            "name": self.name,
+            "path": self.device_path,
+            "needed": self.needed,
+            "depth": self.depth,
+            "scope": self.scope,
+            "relocations": {
+                "relative": self.relative,
+                "relr": self.relr,
+                "symbolic": self.symbolic,
+                "plt": self.plt,
+            },
+            "undefined_symbols": self.undefined,
+            "exported_symbols": self.exports,
+            "est_ns": self.est_ns(),
+            "est_dirty_bytes": self.est_dirty_bytes(),
+        }
+
+
+def parse_readelf(cost: LibCost, output: str):
+    section = None
+    in_symtab = False
+    for line in output.splitlines():
+        m = _RELOC_HDR_RE.match(line)
+        if m:
+            section, in_symtab = m.group(1), False
+            if section.startswith('.relr'):
+                cost.relr += int(m.group(2))
+                section = None
+            continue
+        m = _SYMTAB_HDR_RE.match(line)
+        if m:
+            section, in_symtab = None, m.group(1) == '.dynsym'
+            continue
+        m = _NEEDED_RE.search(line)
+        if m:
+            cost.needed.append(m.group(1))
+            continue
+        if section is not None:
+            parts = line.split()
+            if len(parts) < 3 or not parts[0][:1].isalnum() or parts[0] == 'Offset':
+                continue
+            rtype = parts[2]
+            if not rtype.startswith('R_'):
+                continue
+            if section.endswith('.plt'):
+                cost.plt += 1
+            elif rtype.endswith('_RELATIVE'):
+                cost.relative += 1
+            else:
+                cost.symbolic += 1
+        elif in_symtab:
+            parts = line.split()
+            if len(parts) < 8 or not parts[0].endswith(':') or parts[0] == '0:':
+                continue
+            if parts[6] == 'UND':
+                cost.undefined += 1
+            elif parts[4] in ('GLOBAL', 'WEAK'):
+                cost.exports += 1
+
+
+def scan_libraries(lib_dirs: List[Tuple[str, str]]) -> Dict[str, LibCost]:
+    """lib_dirs: (host_dir, device_mount) pairs, e.g. ('out/.../vendor', '/vendor')."""
+    costs = {}
+    for host_dir, mount in lib_dirs:
+        for lib in discover_libraries(host_dir):
+            rel = os.path.relpath(lib.path, host_dir)
+            device_path = os.path.join(mount, rel) if mount else lib.path
+            output = run_readelf(lib.path, ['-W', '-d', '-r', '--dyn-syms'])
+            for name in lib.names:
+                if name in costs:
+                    continue
+                cost = LibCost(name, lib.path, device_path)
+                parse_readelf(cost, output)
+                costs[name] = cost
+    _compute_depths(costs)
+    return costs
+
+
+def _compute_depths(costs: Dict[str, LibCost]):
+    closures: Dict[str, frozenset] = {}
+    depths: Dict[str, int] = {}
+
+    def visit(name: str, stack: set) -> Tuple[int, frozenset]:
+        if name in depths:
+            return depths[name], closures[name]
+        cost = costs.get(name)
+        if cost is None or name in stack:
+            # Outside the scanned set (or a cycle): counts as one scope entry
+            return 0, frozenset((name,))
+        stack.add(name)
+        depth, closure = 0, {name}
+        for dep in cost.needed:
+            d, c = visit(dep, stack)
+            depth = max(depth, d + 1)
+            closure |= c
+        stack.discard(name)
+        depths[name], closures[name] = depth, frozenset(closure)
+        return depth, closures[name]
+
+    sys.setrecursionlimit(max(sys.getrecursionlimit(), 10000))
+    for name, cost in costs.items():
+        cost.depth, closure = visit(name, set())
+        cost.scope = len(closure)
+
+
+def _shim_kind(action: Dict) -> Optional[str]:
+    # Accepts both vndk_compat_engine ("shim"/"stub") and diff engine (ABI_BREAK) actions
+    res = action.get('resolution')
+    if isinstance(res, dict):
+        kind, remap = res.get('action'), res.get('remap')
+    else:
+        kind, remap = action.get('type'), action.get('remap')
+    if kind == 'shim':
+        return 'remap' if remap else 'forward'
+    if kind == 'stub':
+        return 'stub'
+    return None
+
+
+def shim_action_cost(action: Dict, costs: Dict[str, LibCost]) -> Optional[Dict]:
+    kind = _shim_kind(action)
+    if kind is None:
+        return None
+    shape = SHIM_COSTS[kind]
+    target = action.get('target') or action.get('target_lib') or ''
+    lib = costs.get(target) or costs.get(target + '.so')
+    scope = lib.scope if lib else 1
+    lookups = shape["symbolic_relocs"] + shape["runtime_lookups"]
+    return {
+        "kind": kind,
+        "est_ns": lookups * LOOKUP_NS_PER_SCOPE_LIB * scope,
+        "est_bytes": shape["bss_bytes"] + shape["text_bytes"],
+    }
+
+
+def estimate_shims(plan_path: str, costs: Dict[str, LibCost],
+                   annotate_path: Optional[str] = None) -> Dict:
+    """Costs the shim library shim_generator.py would build from `plan_path`.
+
+    With `annotate_path`, writes the plan back with a `cost` field on each
+    resolution (or on the action itself for vndk_compat_engine plans).
+    """
+    header = {}
+    totals = {"forward": 0, "remap": 0, "stub": 0, "est_ns": 0, "est_bytes": 0}
+
+    def costed():
+        for action in iter_plan_actions(plan_path, header):
+            cost = shim_action_cost(action, costs)
+            if cost is not None:
+                totals[cost["kind"]] += 1
+                totals["est_ns"] += cost["est_ns"]
+                totals["est_bytes"] += cost["est_bytes"]
+                res = action.get('resolution')
+                (res if isinstance(res, dict) else action)["cost"] = {
+                    "est_ns": cost["est_ns"], "est_bytes": cost["est_bytes"]}
+            yield action
+
+    if annotate_path:
+        write_plan(annotate_path, costed(), header)
+    else:
+        for _ in costed():
+            pass
+    # The shim itself is one more library to map
+    if totals["forward"] + totals["remap"] + totals["stub"]:
+        totals["est_ns"] += MAP_NS_PER_LIB
+    return totals
+
+
+def _namespace_for(device_path: str, namespaces: List[Dict]) -> str:
+    d = os.path.dirname(device_path)
+    for ns in namespaces:
+        if d in ns.get('search_paths', []):
+            return ns['name']
+    for ns in namespaces:
+        for p in ns.get('permitted_paths', []):
+            if d == p or d.startswith(p.rstrip('/') + '/'):
+                return ns['name']
+    return '<unassigned>'
+
+
+def rollup_namespaces(costs: Dict[str, LibCost], linker_config: Dict) -> Dict:
+    namespaces = linker_config.get('namespaces', [])
+    result: Dict[str, Dict] = {}
+    seen = set()
+    for cost in costs.values():
+        if cost.path in seen:
+            continue
+        seen.add(cost.path)
+        ns = _namespace_for(cost.device_path, namespaces)
+        entry = result.setdefault(ns, {"libraries": 0, "est_ns": 0, "est_dirty_bytes": 0})
+        entry["libraries"] += 1
+        entry["est_ns"] += cost.est_ns()
+        entry["est_dirty_bytes"] += cost.est_dirty_bytes()
+    return result
+
+
+def rollup_processes(costs: Dict[str, LibCost], processes: Dict[str, List[str]]) -> Dict:
+    """processes: {process: [root libraries]} -> cost of the DT_NEEDED closure."""
+    result = {}
+    for proc, roots in processes.items():
+        todo, closure = list(roots), set()
+        while todo:
+            name = todo.pop()
+            if name in closure:
+                continue
+            closure.add(name)
+            if name in costs:
+                todo.extend(costs[name].needed)
+        known = [costs[n] for n in sorted(closure) if n in costs]
+        result[proc] = {
+            "libraries": len(closure),
+            "unknown": sorted(n for n in closure if n not in costs),
+            "est_ns": sum(c.est_ns() for c in known),
+            "est_dirty_bytes": sum(c.est_dirty_bytes() for c in known),
+        }
+    return result
+
+
+def _parse_lib_dir(spec: str) -> Tuple[str, str]:
+    host, _, mount = spec.partition('=')
+    return host, mount
+
+
+def main():
+    parser = argparse.ArgumentParser(description='VNDK Compat load-cost estimator')
+    parser.add_argument('--lib-dir', action='append', required=True,
+                        help='HOST_DIR[=DEVICE_MOUNT], e.g. out/.../vendor=/vendor (repeatable)')
+    parser.add_argument('--linker-config', help='linker_ir.py output for per-namespace totals')
+    parser.add_argument('--processes', help='JSON {process: [root libs]} for per-process totals')
+    parser.add_argument('--plan', help='Compat plan; estimates the generated shim library')
+    parser.add_argument('--annotate-plan', help='Write the plan with per-resolution cost fields')
+    parser.add_argument('--top', type=int, default=25, help='Number of libraries to rank')
+    parser.add_argument('--output', required=True)
+
+    args = parser.parse_args()
+
+    costs = scan_libraries([_parse_lib_dir(s) for s in args.lib_dir])
+    unique = {c.path: c for c in costs.values()}.values()
+    ranked = sorted(unique, key=lambda c: -c.est_ns())
+
+    report = {
+        "model": {
+            "relative_reloc_ns": RELATIVE_RELOC_NS,
+            "lookup_ns_per_scope_lib": LOOKUP_NS_PER_SCOPE_LIB,
+            "map_ns_per_lib": MAP_NS_PER_LIB,
+        },
+        "libraries": len(ranked),
+        "est_ns": sum(c.est_ns() for c in ranked),
+        "est_dirty_bytes": sum(c.est_dirty_bytes() for c in ranked),
+        "top": [c.to_json() for c in ranked[:args.top]],
+    }
+
+    if args.linker_config:
+        with open(args.linker_config, 'r') as f:
+            report["namespaces"] = rollup_namespaces(costs, json.load(f))
+    if args.processes:
+        with open(args.processes, 'r') as f:
+            report["processes"] = rollup_processes(costs, json.load(f))
+    if args.plan:
+        report["shims"] = estimate_shims(args.plan, costs, args.annotate_plan)
+
+    with open(args.output, 'w') as f:
+        json.dump(report, f, indent=2)
+
+    for c in ranked[:10]:
+        print(f"{c.est_ns() / 1000:10.1f} us  {c.device_path}")
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,203 @@
+#!/usr/bin/env python3
+"""Incremental readers for VNDK compat plans.
+
+Plans are either a single JSON document with a top-level "actions" array
+(as written by vndk_diff_engine.py / vndk_compat_engine.py), JSON Lines,
+one action per line, or the columnar .vcplan format (see plan_table.py).
+All are read incrementally so memory stays bounded by the largest single
+action (or row block) rather than the whole plan.
+"""
+import os
+import json
+import shutil
+import tempfile
+from typing import Dict, Iterable, Iterator, Tuple
+
+from plan_table import PlanTable, is_table_plan, iter_table_actions, read_table_header, write_table
+
+CHUNK_SIZE = 1 << 16
+JSONL_SUFFIXES = ('.jsonl', '.ndjson')
+
+_decoder = json.JSONDecoder()
+_WS = ' \t\r\n'
+
+
+class PlanFormatError(ValueError):
+    pass
+
+
+class _ChunkReader:
+    """Sliding window over a text file for incremental raw_decode calls."""
+
+    def __init__(self, f):
+        self.f = f
+        self.buf = ''
+        self.pos = 0
+        self.eof = False
+
+    def _fill(self) -> bool:
+        if self.eof:
+            return False
+        chunk = self.f.read(CHUNK_SIZE)
+        if not chunk:
+            self.eof = True
+            return False
+        # Drop consumed text so the window never grows past one element
+        self.buf = self.buf[self.pos:] + chunk
+        self.pos = 0
+        return True
+
+    def peek(self) -> str:
+        while True:
+            while self.pos < len(self.buf) and self.buf[self.pos] in _WS:
+                self.pos += 1
+            if self.pos < len(self.buf):
+                return self.buf[self.pos]
+            if not self._fill():
+                return ''
+
+    def expect(self, ch: str):
+        if self.peek() != ch:
+            raise PlanFormatError(f"expected '{ch}' in plan")
+        self.pos += 1
+
+    def value(self):
+        self.peek()
+        while True:
+            try:
+                obj, end = _decoder.raw_decode(self.buf, self.pos)
+            except json.JSONDecodeError:
+                if self._fill():
+                    continue
+                raise PlanFormatError("truncated or malformed plan")
+            # A number at the end of the window may continue in the next chunk
+            if end == len(self.buf) and not self.eof and isinstance(obj, (int, float)):
+                if self._fill():
+                    continue
+            self.pos = end
+            return obj
+
+
+def is_jsonl(path: str) -> bool:
+    return path.endswith(JSONL_SUFFIXES)
+
+
+def _iter_jsonl(f, header: Dict) -> Iterator[Dict]:
+    for lineno, line in enumerate(f, 1):
+        line = line.strip()
+        if not line:
+            continue
+        try:
+            rec = json.loads(line)
+        except json.JSONDecodeError as e:
+            raise PlanFormatError(f"line {lineno}: {e}")
+        # A leading {"header": {...}} record carries plan-level metadata
+        if lineno == 1 and isinstance(rec, dict) and set(rec) == {'header'}:
+            header.update(rec['header'])
+            continue
+        yield rec
+
+
+def _iter_json(f, header: Dict) -> Iterator[Dict]:
+    r = _ChunkReader(f)
+    r.expect('{')
+    if r.peek() == '}':
+        return
+    while True:
+        key = r.value()
+        r.expect(':')
+        if key == 'actions':
+            r.expect('[')
+            if r.peek() == ']':
+                r.pos += 1
+            else:
+                while True:
+                    yield r.value()
+                    if r.peek() == ',':
+                        r.pos += 1
+                        continue
+                    r.expect(']')
+                    break
+        else:
+            header[key] = r.value()
+        if r.peek() == ',':
+            r.pos += 1
+            continue
+        r.expect('}')
+        return
+
+
+def iter_plan_actions(path: str, header: Dict = None) -> Iterator[Dict]:
+    """Yields plan actions one at a time.
+
+    Non-action top-level fields (api levels, metrics, ...) are collected into
+    `header` as they are passed over, so callers can inspect them once the
+    iterator is exhausted.
+    """
+    if header is None:
+        header = {}
+    if is_table_plan(path):
+        yield from iter_table_actions(path, header)
+        return
+    with open(path, 'r') as f:
+        if is_jsonl(path):
+            yield from _iter_jsonl(f, header)
+        else:
+            yield from _iter_json(f, header)
+
+
+def read_plan(path: str) -> Tuple[Dict, list]:
+    """Convenience wrapper returning (header, actions) fully materialized."""
+    header = {}
+    actions = list(iter_plan_actions(path, header))
+    return header, actions
+
+
+def read_plan_header(path: str) -> Dict:
+    """Plan-level fields only; .vcplan plans answer without a scan."""
+    if is_table_plan(path):
+        return read_table_header(path)
+    header = {}
+    for _ in iter_plan_actions(path, header):
+        pass
+    return header
+
+
+def write_plan(path: str, actions: Iterable[Dict], header: Dict):
+    """Streams actions into a plan document, header fields last.
+
+    `header` may still be filled while `actions` is consumed (as
+    iter_plan_actions does), so it is only read after the last action.
+    A .vcplan path writes the columnar format; `actions` may then also be
+    a PlanTable, which is written without re-interning. A .jsonl/.ndjson
+    path writes JSON Lines: a {"header": {...}} record, then one action per
+    line (actions are spooled to a temporary file until the header is final).
+    """
+    if is_table_plan(path):
+        write_table(path, actions, header)
+        return
+    if isinstance(actions, PlanTable):
+        actions = actions.iter_dicts()
+    if is_jsonl(path):
+        _write_jsonl(path, actions, header)
+        return
+    with open(path, 'w') as out:
+        out.write('{\n  "actions": [')
+        first = True
+        for action in actions:
+            out.write(('\n    ' if first else ',\n    ') + json.dumps(action))
+            first = False
+        out.write('\n  ]')
+        for key, value in header.items():
+            out.write(f',\n  {json.dumps(key)}: {json.dumps(value)}')
+        out.write('\n}\n')
+
+
+def _write_jsonl(path: str, actions: Iterable[Dict], header: Dict):
+    with tempfile.TemporaryFile('w+', dir=os.path.dirname(os.path.abspath(path))) as spool:
+        for action in actions:
+            spool.write(json.dumps(action) + '\n')
+        spool.seek(0)
+        with open(path, 'w') as out:
+            out.write(json.dumps({'header': header}) + '\n')
+            shutil.copyfileobj(spool, out)
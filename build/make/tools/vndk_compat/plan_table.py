@@ -0,0 +1,634 @@
+#!/usr/bin/env python3
+"""Columnar, array-backed VNDK compat plans.
+
+A plan action is flattened into (path, value) pairs, e.g.
+("resolution", "action") -> "shim". PlanTable keeps one int32 array per
+path plus one array of shape ids; a shape is the ordered tuple of paths a
+row has, so rows are rebuilt with their original key order. Column cells
+are ids into shared tables:
+
+    >= 0    interned string
+    -1      path absent in this row
+    -2      null
+    <= -3   interned non-string value (numbers, lists, ...), -(id + 3)
+
+Library names, action kinds and repeated symbols are therefore stored once
+and every action costs a few int32 cells instead of two dicts.
+
+The .vcplan serialization is a stream of zlib-compressed records:
+
+    "VCPT" u32 version
+    { tag:1  u32 length  payload }*        S/V/P/C table deltas, R rows, H header
+    "VCPH" u64 offset of the H record
+
+S/V/P/C deltas are JSON lists, so strings may contain any character.
+
+Table deltas precede the row block that first uses them, so a reader can
+stream actions block by block (iter_table_actions) without materializing
+the plan, and the footer makes the header readable without a scan.
+
+Usage:
+    plan_table.py --input plan.json --output plan.vcplan   # either direction
+    plan_table.py --bench 200000
+"""
+import os
+import copy
+import sys
+import json
+import time
+import zlib
+import struct
+import argparse
+import tracemalloc
+from array import array
+from typing import Dict, Iterable, Iterator, List, Optional, Tuple
+
+TABLE_SUFFIX = '.vcplan'
+MAGIC = b'VCPT'
+FOOTER_MAGIC = b'VCPH'
+FORMAT_VERSION = 2
+BLOCK_ROWS = 8192
+COMPRESS_LEVEL = 1
+
+ABSENT = -1
+NULL = -2
+VALUE_BASE = -3
+
+_REC = struct.Struct('<cI')
+_FOOTER = struct.Struct('<4sQ')
+_SWAP = sys.byteorder != 'little'
+
+Path = Tuple[str, ...]
+
+
+class TableFormatError(ValueError):
+    pass
+
+
+def is_table_plan(path: str) -> bool:
+    return path.endswith(TABLE_SUFFIX)
+
+
+def _flatten(obj: Dict, prefix: Path, out: List):
+    for key, value in obj.items():
+        path = prefix + (key,)
+        if isinstance(value, dict) and value:
+            _flatten(value, path, out)
+        else:
+            out.append((path, value))
+
+
+class PlanAction:
+    """Read-only view of one row; behaves like the action dict for lookups."""
+    __slots__ = ('table', 'row')
+
+    def __init__(self, table: 'PlanTable', row: int):
+        self.table = table
+        self.row = row
+
+    def _top(self, key: str, default=None):
+        return self.table.top_value(self.row, key, default)
+
+    @property
+    def type(self) -> Optional[str]:
+        return self._top('type')
+
+    @property
+    def target(self) -> Optional[str]:
+        return self._top('target') or self._top('target_lib')
+
+    @property
+    def symbol(self) -> Optional[str]:
+        return self._top('symbol')
+
+    @property
+    def action(self) -> Optional[str]:
+        """Resolution action (diff plans) or shim/stub type (compat plans)."""
+        return self.table.value(self.row, ('resolution', 'action'), self.type)
+
+    @property
+    def remap(self) -> Optional[str]:
+        return self.table.value(self.row, ('resolution', 'remap'), self._top('remap'))
+
+    @property
+    def version(self) -> Optional[str]:
+        return self._top('version')
+
+    def get(self, key: str, default=None):
+        return self._top(key, default)
+
+    def __getitem__(self, key: str):
+        value = self._top(key, self)
+        if value is self:
+            raise KeyError(key)
+        return value
+
+    def __contains__(self, key: str) -> bool:
+        return self._top(key, self) is not self
+
+    def keys(self) -> List[str]:
+        seen = []
+        for path in self.table.shapes[self.table.shape_ids[self.row]]:
+            if path[0] not in seen:
+                seen.append(path[0])
+        return seen
+
+    def to_dict(self) -> Dict:
+        return self.table.row_dict(self.row)
+
+    def __repr__(self):
+        return f"PlanAction({self.to_dict()!r})"
+
+
+class PlanTable:
+    """Plan actions as interned tables plus parallel int32 columns."""
+
+    def __init__(self):
+        self.strings: List[str] = []
+        self._string_ids: Dict[str, int] = {}
+        self.values: List = []
+        self._value_ids: Dict[str, int] = {}
+        self.shapes: List[Tuple[Path, ...]] = []
+        self._shape_ids: Dict[Tuple[Path, ...], int] = {}
+        self.paths: List[Path] = []
+        self.columns: Dict[Path, array] = {}
+        self.shape_ids = array('i')
+        # shape id -> [(column, path position)] for appends, and
+        # shape id -> [(column, path)] for row decoding
+        self._fill: Dict[int, List] = {}
+        self._read: Dict[int, List] = {}
+        self._key_paths: Dict[str, Path] = {}
+
+    def _reset_plans(self):
+        self._fill.clear()
+        self._read.clear()
+
+    # -- interning --
+    def _reindex(self):
+        # Tables read from disk skip the reverse index until appended to
+        if len(self._string_ids) != len(self.strings):
+            self._string_ids = {v: i for i, v in enumerate(self.strings)}
+
+    def intern(self, s: str) -> int:
+        self._reindex()
+        i = self._string_ids.get(s)
+        if i is None:
+            i = self._string_ids[s] = len(self.strings)
+            self.strings.append(s)
+        return i
+
+    def encode(self, value) -> int:
+        if isinstance(value, str):
+            return self.intern(value)
+        if value is None:
+            return NULL
+        key = json.dumps(value)
+        i = self._value_ids.get(key)
+        if i is None:
+            i = self._value_ids[key] = len(self.values)
+            # Own copy, so later changes to the caller's list/dict do not leak in
+            self.values.append(json.loads(key))
+        return VALUE_BASE - i
+
+    def decode(self, cell: int):
+        if cell >= 0:
+            return self.strings[cell]
+        if cell == NULL:
+            return None
+        value = self.values[VALUE_BASE - cell]
+        # Interned lists/dicts are shared by every row; hand out copies
+        if isinstance(value, (list, dict)):
+            return copy.deepcopy(value)
+        return value
+
+    def _add_column(self, path: Path):
+        self.paths.append(path)
+        self.columns[path] = array('i', [ABSENT]) * len(self.shape_ids)
+        self._reset_plans()
+
+    def _shape(self, paths: Tuple[Path, ...]) -> int:
+        sid = self._shape_ids.get(paths)
+        if sid is None:
+            sid = self._shape_ids[paths] = len(self.shapes)
+            self.shapes.append(paths)
+            for path in paths:
+                if path not in self.columns:
+                    self._add_column(path)
+        return sid
+
+    def _fill_plan(self, sid: int) -> List:
+        plan = self._fill.get(sid)
+        if plan is None:
+            pos = {p: i for i, p in enumerate(self.shapes[sid])}
+            plan = self._fill[sid] = [(self.columns[p], pos.get(p)) for p in self.paths]
+        return plan
+
+    # -- building --
+    def append(self, action: Dict):
+        self._reindex()
+        string_ids = self._string_ids
+        key_paths = self._key_paths
+        paths = []
+        cells = []
+        for key, value in action.items():
+            if isinstance(value, dict) and value:
+                flat = []
+                _flatten(value, (key,), flat)
+                for path, v in flat:
+                    paths.append(path)
+                    cells.append(self.encode(v))
+                continue
+            path = key_paths.get(key)
+            if path is None:
+                path = key_paths[key] = (key,)
+            paths.append(path)
+            if isinstance(value, str):
+                i = string_ids.get(value)
+                cells.append(self.intern(value) if i is None else i)
+            else:
+                cells.append(self.encode(value))
+        sid = self._shape(tuple(paths))
+        for column, i in self._fill_plan(sid):
+            column.append(ABSENT if i is None else cells[i])
+        self.shape_ids.append(sid)
+
+    def extend(self, actions: Iterable[Dict]):
+        for action in actions:
+            self.append(action)
+
+    def clear_rows(self):
+        """Drops the rows but keeps the interned tables (ids stay stable)."""
+        del self.shape_ids[:]
+        for column in self.columns.values():
+            del column[:]
+
+    # -- access --
+    def __len__(self) -> int:
+        return len(self.shape_ids)
+
+    def __iter__(self) -> Iterator[PlanAction]:
+        for row in range(len(self.shape_ids)):
+            yield PlanAction(self, row)
+
+    def __getitem__(self, row: int) -> PlanAction:
+        if row < 0:
+            row += len(self.shape_ids)
+        if not 0 <= row < len(self.shape_ids):
+            raise IndexError(row)
+        return PlanAction(self, row)
+
+    def value(self, row: int, path: Path, default=None):
+        column = self.columns.get(path)
+        if column is None or column[row] == ABSENT:
+            return default
+        return self.decode(column[row])
+
+    def top_value(self, row: int, key: str, default=None):
+        column = self.columns.get((key,))
+        if column is not None and column[row] != ABSENT:
+            return self.decode(column[row])
+        # Nested object: rebuild just that sub-dict
+        sub = {}
+        for path in self.shapes[self.shape_ids[row]]:
+            if path[0] == key and len(path) > 1:
+                _set_path(sub, path[1:], self.decode(self.columns[path][row]))
+        return sub if sub else default
+
+    def _read_plan(self, sid: int) -> List:
+        plan = self._read.get(sid)
+        if plan is None:
+            plan = self._read[sid] = [(self.columns[p], p) for p in self.shapes[sid]]
+        return plan
+
+    def row_dict(self, row: int) -> Dict:
+        out = {}
+        strings = self.strings
+        for column, path in self._read_plan(self.shape_ids[row]):
+            cell = column[row]
+            value = strings[cell] if cell >= 0 else self.decode(cell)
+            if len(path) == 1:
+                out[path[0]] = value
+            else:
+                _set_path(out, path, value)
+        return out
+
+    def iter_dicts(self) -> Iterator[Dict]:
+        for row in range(len(self.shape_ids)):
+            yield self.row_dict(row)
+
+    def nbytes(self) -> int:
+        """Approximate payload size: columns plus interned tables."""
+        n = self.shape_ids.itemsize * len(self.shape_ids)
+        n += sum(c.itemsize * len(c) for c in self.columns.values())
+        n += sum(sys.getsizeof(s) for s in self.strings)
+        return n
+
+    @classmethod
+    def load(cls, path: str, header: Dict = None) -> 'PlanTable':
+        """Reads a whole plan (.vcplan, JSON or JSON Lines) into a table."""
+        table = cls()
+        if is_table_plan(path):
+            _TableReader(path, header if header is not None else {}).read_into(table)
+        else:
+            from plan_io import iter_plan_actions
+            table.extend(iter_plan_actions(path, header))
+        return table
+
+
+def _set_path(out: Dict, path: Path, value):
+    d = out
+    for key in path[:-1]:
+        d = d.setdefault(key, {})
+    d[path[-1]] = value
+
+
+# ============================================================
+# .vcplan serialization
+# ============================================================
+
+def _pack_ints(a: array) -> bytes:
+    if _SWAP:
+        a = array('i', a)
+        a.byteswap()
+    return a.tobytes()
+
+
+def _unpack_ints(data: bytes) -> array:
+    a = array('i')
+    a.frombytes(data)
+    if _SWAP:
+        a.byteswap()
+    return a
+
+
+class _TableWriter:
+    """Emits table deltas and row blocks of a PlanTable as they fill up."""
+
+    def __init__(self, f):
+        self.f = f
+        self.sent = {'S': 0, 'V': 0, 'P': 0, 'C': 0}
+        f.write(MAGIC + struct.pack('<I', FORMAT_VERSION))
+
+    def _record(self, tag: bytes, payload: bytes):
+        data = zlib.compress(payload, COMPRESS_LEVEL)
+        self.f.write(_REC.pack(tag, len(data)))
+        self.f.write(data)
+
+    def _delta(self, tag: str, items: List, upto: int, encode):
+        start = self.sent[tag]
+        if start < upto:
+            self._record(tag.encode(), encode(items[start:upto]))
+            self.sent[tag] = upto
+
+    def write_rows(self, table: PlanTable, start: int = 0, end: Optional[int] = None):
+        if end is None:
+            end = len(table)
+        if start >= end:
+            return
+        # Ids are handed out in order of first use, so a block only needs
+        # the table entries up to the largest id it references
+        max_string, min_cell = -1, 0
+        for column in table.columns.values():
+            cells = column[start:end]
+            max_string = max(max_string, max(cells))
+            min_cell = min(min_cell, min(cells))
+        self._delta('S', table.strings, max_string + 1, lambda new: json.dumps(new).encode())
+        self._delta('V', table.values, max(0, VALUE_BASE - min_cell + 1),
+                    lambda new: json.dumps(new).encode())
+        self._delta('P', table.shapes, max(table.shape_ids[start:end]) + 1,
+                    lambda new: json.dumps(new).encode())
+        self._delta('C', table.paths, len(table.paths), lambda new: json.dumps(new).encode())
+        parts = [struct.pack('<I', end - start), _pack_ints(table.shape_ids[start:end])]
+        for path in table.paths:
+            parts.append(_pack_ints(table.columns[path][start:end]))
+        self._record(b'R', b''.join(parts))
+
+    def finish(self, header: Dict):
+        offset = self.f.tell()
+        self._record(b'H', json.dumps(header).encode())
+        self.f.write(_FOOTER.pack(FOOTER_MAGIC, offset))
+
+
+def write_table(path: str, actions, header: Dict):
+    """Writes a .vcplan from a PlanTable or any iterable of action dicts.
+
+    Like plan_io.write_plan, `header` is only read after the last action.
+    """
+    with open(path, 'wb') as f:
+        w = _TableWriter(f)
+        if isinstance(actions, PlanTable):
+            for start in range(0, len(actions), BLOCK_ROWS):
+                w.write_rows(actions, start, min(start + BLOCK_ROWS, len(actions)))
+        else:
+            table = PlanTable()
+            for action in actions:
+                table.append(action)
+                if len(table) >= BLOCK_ROWS:
+                    w.write_rows(table)
+                    table.clear_rows()
+            w.write_rows(table)
+        w.finish(header)
+
+
+class _TableReader:
+    def __init__(self, path: str, header: Dict):
+        self.path = path
+        self.header = header
+
+    def records(self, f) -> Iterator[Tuple[bytes, bytes]]:
+        if f.read(4) != MAGIC:
+            raise TableFormatError(f"{self.path}: not a {TABLE_SUFFIX} plan")
+        (version,) = struct.unpack('<I', f.read(4))
+        if version != FORMAT_VERSION:
+            raise TableFormatError(f"{self.path}: unsupported version {version}")
+        while True:
+            head = f.read(_REC.size)
+            if len(head) < _REC.size:
+                raise TableFormatError(f"{self.path}: truncated plan")
+            tag, size = _REC.unpack(head)
+            data = f.read(size)
+            if len(data) < size:
+                raise TableFormatError(f"{self.path}: truncated plan")
+            yield tag, zlib.decompress(data)
+            if tag == b'H':
+                return
+
+    def blocks(self, table: PlanTable) -> Iterator[int]:
+        """Applies table deltas to `table`, replacing its rows block by block.
+
+        Yields the row count of each block once it is loaded.
+        """
+        with open(self.path, 'rb') as f:
+            for tag, payload in self.records(f):
+                if tag == b'S':
+                    table.strings.extend(json.loads(payload))
+                elif tag == b'V':
+                    for value in json.loads(payload):
+                        table._value_ids[json.dumps(value)] = len(table.values)
+                        table.values.append(value)
+                elif tag == b'P':
+                    for shape in json.loads(payload):
+                        shape = tuple(tuple(p) for p in shape)
+                        table._shape_ids[shape] = len(table.shapes)
+                        table.shapes.append(shape)
+                elif tag == b'C':
+                    for p in json.loads(payload):
+                        table._add_column(tuple(p))
+                elif tag == b'R':
+                    yield self._rows(table, payload)
+                elif tag == b'H':
+                    self.header.update(json.loads(payload))
+
+    @staticmethod
+    def _rows(table: PlanTable, payload: bytes) -> int:
+        (n,) = struct.unpack_from('<I', payload)
+        width = 4 * n
+        at = 4
+        table.shape_ids = _unpack_ints(payload[at:at + width])
+        at += width
+        for path in table.paths:
+            table.columns[path] = _unpack_ints(payload[at:at + width])
+            at += width
+        table._reset_plans()
+        return n
+
+    def read_into(self, table: PlanTable):
+        shape_ids = array('i')
+        columns: Dict[Path, array] = {}
+        for _ in self.blocks(table):
+            rows_before = len(shape_ids)
+            shape_ids.extend(table.shape_ids)
+            for path in table.paths:
+                column = columns.get(path)
+                if column is None:
+                    column = columns[path] = array('i', [ABSENT]) * rows_before
+                column.extend(table.columns[path])
+        table.shape_ids = shape_ids
+        table.columns = {p: columns.get(p, array('i', [ABSENT]) * len(shape_ids))
+                         for p in table.paths}
+        table._reset_plans()
+
+
+def iter_table_actions(path: str, header: Dict = None) -> Iterator[Dict]:
+    """Streams the actions of a .vcplan as dicts, one row block in memory."""
+    table = PlanTable()
+    for n in _TableReader(path, header if header is not None else {}).blocks(table):
+        for row in range(n):
+            yield table.row_dict(row)
+
+
+def read_table_header(path: str) -> Dict:
+    """Plan-level fields of a .vcplan, read through the footer."""
+    with open(path, 'rb') as f:
+        f.seek(-_FOOTER.size, os.SEEK_END)
+        magic, offset = _FOOTER.unpack(f.read(_FOOTER.size))
+        if magic != FOOTER_MAGIC:
+            raise TableFormatError(f"{path}: missing footer")
+        f.seek(offset)
+        tag, size = _REC.unpack(f.read(_REC.size))
+        if tag != b'H':
+            raise TableFormatError(f"{path}: bad header offset")
+        return json.loads(zlib.decompress(f.read(size)))
+
+
+# ============================================================
+# Benchmark
+# ============================================================
+
+def synthetic_actions(n: int, libs: int = 400) -> Iterator[Dict]:
+    """Diff-engine shaped actions: ABI breaks spread over `libs` libraries."""
+    for i in range(n):
+        lib = f"libvendor_{i % libs}.so"
+        if i % 97 == 0:
+            yield {"type": "MISSING_LIBRARY", "target": lib, "severity": "CRITICAL"}
+            continue
+        sym = f"_ZN7android{i % 5000}Hal{i}14onEventEv"
+        if i % 3 == 0:
+            res = {"action": "shim", "remap": sym + "_v2" if i % 6 == 0 else None}
+        elif i % 3 == 1:
+            res = {"action": "stub", "remap": None}
+        else:
+            res = {"action": "NONE", "fallback": "snapshot"}
+        yield {"type": "ABI_BREAK", "target": lib, "symbol": sym, "resolution": res}
+
+
+def _measure(fn):
+    # Timed untraced; tracemalloc slows allocation-heavy code several-fold
+    t = time.perf_counter()
+    result = fn()
+    elapsed = time.perf_counter() - t
+    del result
+    tracemalloc.start()
+    result = fn()
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return result, elapsed, peak
+
+
+def bench(n: int, workdir: str) -> List[Tuple[str, float, int, int]]:
+    """Returns (case, seconds, peak traced bytes, file bytes) rows."""
+    from plan_io import iter_plan_actions
+    header = {"vendor_api_level": 15, "system_api_level": 16}
+    json_path = os.path.join(workdir, 'bench_plan.json')
+    table_path = os.path.join(workdir, 'bench_plan' + TABLE_SUFFIX)
+    rows = []
+
+    dicts, t, peak = _measure(lambda: list(synthetic_actions(n)))
+    rows.append(("build list of dicts", t, peak, 0))
+
+    def build_table():
+        table = PlanTable()
+        table.extend(synthetic_actions(n))
+        return table
+    table, t, peak = _measure(build_table)
+    rows.append(("build PlanTable", t, peak, 0))
+
+    def dump_json():
+        with open(json_path, 'w') as f:
+            json.dump(dict(header, actions=dicts), f, indent=2)
+    _, t, peak = _measure(dump_json)
+    rows.append(("json.dump indent=2", t, peak, os.path.getsize(json_path)))
+    _, t, peak = _measure(lambda: write_table(table_path, table, header))
+    rows.append(("write .vcplan", t, peak, os.path.getsize(table_path)))
+    del dicts
+
+    def load_json():
+        with open(json_path) as f:
+            return len(json.load(f)['actions'])
+    _, t, peak = _measure(load_json)
+    rows.append(("json.load", t, peak, 0))
+    _, t, peak = _measure(lambda: sum(1 for _ in iter_plan_actions(json_path)))
+    rows.append(("stream JSON (plan_io)", t, peak, 0))
+    _, t, peak = _measure(lambda: sum(1 for _ in iter_table_actions(table_path)))
+    rows.append(("stream .vcplan", t, peak, 0))
+    _, t, peak = _measure(lambda: len(PlanTable.load(table_path)))
+    rows.append(("PlanTable.load .vcplan", t, peak, 0))
+
+    os.unlink(json_path)
+    os.unlink(table_path)
+    return rows
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Convert or benchmark columnar compat plans')
+    parser.add_argument('--input', help='Plan to convert (.json, .jsonl or .vcplan)')
+    parser.add_argument('--output', help='Converted plan; format follows the suffix')
+    parser.add_argument('--bench', type=int, metavar='N', help='Benchmark with N synthetic actions')
+    parser.add_argument('--workdir', default='.', help='Scratch directory for --bench')
+
+    args = parser.parse_args()
+    if args.bench:
+        print(f"{'case':<26} {'seconds':>8} {'peak MB':>9} {'file MB':>9}")
+        for case, t, peak, size in bench(args.bench, args.workdir):
+            print(f"{case:<26} {t:>8.2f} {peak / 1e6:>9.1f} {size / 1e6 if size else 0:>9.1f}")
+        return
+    if not (args.input and args.output):
+        parser.error('--input and --output are required unless --bench is given')
+
+    from plan_io import iter_plan_actions, write_plan
+    header = {}
+    write_plan(args.output, iter_plan_actions(args.input, header), header)
+
+
+if __name__ == '__main__':
+    main()
@@ -1,8 +1,12 @@
 #!/usr/bin/env python3
+import os
 import json
 import argparse
 import sys
-from typing import Dict
+from concurrent.futures import ProcessPoolExecutor
+from typing import Dict, Iterable, List, Optional
+
+from plan_io import iter_plan_actions
 
 # Penalty weights as defined in the design spec
 PENALTIES = {
@@ -15,52 +19,166 @@ PENALTIES = {
     "MISSING_LIBRARY": 15
 }
 
-def calculate_score(plan: Dict) -> int:
-    score = 100
-    actions = plan.get('actions', [])
-    
+def classify_action(action: Dict) -> Optional[str]:
+    """Maps a plan action to its PENALTIES key, or None if it costs nothing."""
+    p_type = action.get('type')
+    res = action.get('resolution', {})
+    action_val = res.get('action') if isinstance(res, dict) else None
+
+    if p_type == "MISSING_LIBRARY":
+        return "MISSING_LIBRARY"
+    if p_type == "ABI_BREAK":
+        if action_val == "shim":
+            return "SYMBOL_REMAP" if res.get('remap') else "FORWARDING_SHIM"
+        if action_val == "stub":
+            return "STUB_GENERATED"
+        return "SNAPSHOT_DEPENDENCY"
+    return None
+
+class ScoreAccumulator:
+    """Single-pass scorer keeping per-library/type/penalty subtotals."""
+
+    def __init__(self):
+        self.actions = 0
+        self.penalty = 0
+        self.by_library = {}
+        self.by_action_type = {}
+        self.by_penalty = {}
+
+    def add(self, action: Dict):
+        self.actions += 1
+        key = classify_action(action)
+        points = PENALTIES[key] if key else 0
+        self.penalty += points
+
+        lib = action.get('target') or action.get('target_lib') or '<unknown>'
+        self._bump(self.by_library, lib, points)
+        self._bump(self.by_action_type, str(action.get('type')), points)
+        if key:
+            self._bump(self.by_penalty, key, points)
+
+    @staticmethod
+    def _bump(table: Dict, key: str, points: int):
+        entry = table.get(key)
+        if entry is None:
+            entry = table[key] = {"count": 0, "penalty": 0}
+        entry["count"] += 1
+        entry["penalty"] += points
+
+    @property
+    def score(self) -> int:
+        return max(0, 100 - self.penalty)
+
+    def breakdown(self) -> Dict:
+        score = self.score
+        return {
+            "score": score,
+            "state": get_state(score),
+            "actions": self.actions,
+            "penalty_total": self.penalty,
+            "by_penalty": self.by_penalty,
+            "by_action_type": self.by_action_type,
+            # Most expensive libraries first
+            "by_library": dict(sorted(self.by_library.items(),
+                                      key=lambda kv: (-kv[1]["penalty"], kv[0]))),
+        }
+
+def score_actions(actions: Iterable[Dict]) -> ScoreAccumulator:
+    acc = ScoreAccumulator()
     for action in actions:
-        p_type = action.get('type')
-        res = action.get('resolution', {})
-        action_val = res.get('action') if isinstance(res, dict) else None
-
-        if p_type == "MISSING_LIBRARY":
-            score -= PENALTIES["MISSING_LIBRARY"]
-        elif p_type == "ABI_BREAK":
-            if action_val == "shim":
-                if res.get('remap'):
-                    score -= PENALTIES["SYMBOL_REMAP"]
-                else:
-                    score -= PENALTIES["FORWARDING_SHIM"]
-            elif action_val == "stub":
-                score -= PENALTIES["STUB_GENERATED"]
-            else:
-                score -= PENALTIES["SNAPSHOT_DEPENDENCY"]
-                
-    return max(0, score)
+        acc.add(action)
+    return acc
+
+def calculate_score(plan: Dict) -> int:
+    return score_actions(plan.get('actions', [])).score
 
 def get_state(score: int) -> str:
     if score >= 100: return "FULL"
     if score >= 70: return "DEGRADED"
     return "UNSUPPORTED"
 
+def write_props(path: str, score: int, state: str):
+    with open(path, 'w') as f:
+        f.write(f"ro.vndk.compat_score={score}\n")
+        f.write(f"ro.vndk.compat_state={state}\n")
+
+def score_plan_file(plan_path: str, props_path: str,
+                    breakdown_path: Optional[str] = None) -> Dict:
+    header = {}
+    acc = score_actions(iter_plan_actions(plan_path, header))
+    result = acc.breakdown()
+    for key in ("vendor_api_level", "system_api_level"):
+        if key in header:
+            result[key] = header[key]
+
+    write_props(props_path, result["score"], result["state"])
+    if breakdown_path:
+        # Outputs depend only on the plan's contents, not where it lives, so
+        # stage_cache can restore them for any product with the same plan
+        with open(breakdown_path, 'w') as f:
+            json.dump(result, f, indent=2)
+    result["plan"] = plan_path
+    return result
+
+def _plan_stem(plan_path: str) -> str:
+    name = os.path.basename(plan_path)
+    for suffix in ('.json', '.jsonl', '.ndjson'):
+        if name.endswith(suffix):
+            return name[:-len(suffix)]
+    return name
+
+def score_many(plan_paths: List[str], output_dir: str, jobs: int) -> List[Dict]:
+    """Scores several plans (e.g. one per product) concurrently."""
+    stems = [_plan_stem(p) for p in plan_paths]
+    if len(set(stems)) != len(stems):
+        # Same basename under different product dirs: keep the parent dir in the name
+        stems = [f"{os.path.basename(os.path.dirname(os.path.abspath(p)))}_{s}"
+                 for p, s in zip(plan_paths, stems)]
+    seen = {}
+    for plan, stem in zip(plan_paths, stems):
+        if stem in seen:
+            raise ValueError(f"plans {seen[stem]} and {plan} would both write "
+                             f"{stem}.prop in {output_dir}; rename one of them")
+        seen[stem] = plan
+    os.makedirs(output_dir, exist_ok=True)
+
+    with ProcessPoolExecutor(max_workers=jobs) as pool:
+        futures = [
+            pool.submit(score_plan_file, plan,
+                        os.path.join(output_dir, f"{stem}.prop"),
+                        os.path.join(output_dir, f"{stem}.breakdown.json"))
+            for plan, stem in zip(plan_paths, stems)
+        ]
+        return [fut.result() for fut in futures]
+
 def main():
     parser = argparse.ArgumentParser(description='VNDK Compatibility Scorer')
-    parser.add_argument('--plan', required=True)
-    parser.add_argument('--output-props', required=True)
+    parser.add_argument('--plan', required=True, nargs='+',
+                        help='Plan file(s), JSON or JSON Lines (.jsonl)')
+    parser.add_argument('--output-props', help='Prop file (single plan)')
+    parser.add_argument('--output-breakdown', help='Breakdown JSON (single plan)')
+    parser.add_argument('--output-dir', help='Per-plan .prop/.breakdown.json outputs (multiple plans)')
+    parser.add_argument('--jobs', type=int, default=os.cpu_count() or 1)
 
     args = parser.parse_args()
 
-    with open(args.plan, 'r') as f:
-        plan = json.load(f)
+    if len(args.plan) == 1 and args.output_props:
+        score_plan_file(args.plan[0], args.output_props, args.output_breakdown)
+        return
 
-    score = calculate_score(plan)
-    state = get_state(score)
+    if not args.output_dir:
+        parser.error('--output-dir is required when scoring more than one plan '
+                     '(or when --output-props is omitted)')
 
-    with open(args.output_props, 'w') as f:
-        f.write(f"ro.vndk.compat_score={score}\n")
-        f.write(f"ro.vndk.compat_state={state}\n")
+    try:
+        results = score_many(args.plan, args.output_dir, max(1, args.jobs))
+    except ValueError as e:
+        parser.error(str(e))
+    summary = {r["plan"]: {"score": r["score"], "state": r["state"]} for r in results}
+    with open(os.path.join(args.output_dir, 'summary.json'), 'w') as f:
+        json.dump(summary, f, indent=2)
+    for r in results:
+        print(f"{r['plan']}: {r['score']} ({r['state']})")
 
 if __name__ == '__main__':
     main()
-
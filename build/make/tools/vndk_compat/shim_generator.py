@@ -2,20 +2,32 @@
 import os
 import sys
 import argparse
+import hashlib
 import json
 
+from plan_io import iter_plan_actions
+
+# Instrumented builds map a per-process counter segment here (see shim_usage.py)
+DEFAULT_COUNTER_DIR = "/data/vendor/vndk_compat"
+COUNTER_MAGIC = b"VCSC"
+COUNTER_VERSION = 1
+# magic, version, count, names_size, plan_id
+COUNTER_HEADER_SIZE = 24
+
+# Where actions marked cold by shim_usage.py go (--cold)
+COLD_POLICIES = ("keep", "shard", "drop")
+COLD_SHARD_LIB = "libvndk_compat_cold.so"
+COLD_PREFIX = "vndk_compat_cold_"
+
 SHIM_TEMPLATE = """
 #include <dlfcn.h>
 #include <log/log.h>
 #include <string>
-
-// Global handle for the real library
+{counter_support}
+// Forwarders may target different libraries; dlopen is reference counted
+// and each forwarder caches the symbol it resolved
 static void* get_real_lib_handle(const char* lib_name) {{
-    static void* handle = nullptr;
-    if (!handle) {{
-        handle = dlopen(lib_name, RTLD_NOW);
-    }}
-    return handle;
+    return dlopen(lib_name, RTLD_NOW);
 }}
 
 extern "C" {{
@@ -26,8 +38,8 @@ extern "C" {{
 """
 
 FORWARD_TEMPLATE = """
-void* {name}(...) {{
-    typedef void* (*func_ptr)(...);
+void* {func}(...) {{
+{count}    typedef void* (*func_ptr)(...);
     static func_ptr real_func = nullptr;
     if (!real_func) {{
         void* handle = get_real_lib_handle("{target_lib_path}");
@@ -44,60 +56,211 @@ void* {name}(...) {{
 REMAP_TEMPLATE = """
 extern void* {new_name}(...);
 void* {old_name}(...) {{
-    return {new_name}();
+{count}    return {new_name}();
 }}
 """
 
 STUB_TEMPLATE = """
+void* {func}(...) {{
+{count}    ALOGW("vndk_compat: stub called for {name}");
+    return nullptr;
+}}
+"""
+
+# Cold entries in the main library: same lazy lookup as a forwarder, but
+# into the cold shard, so they cost no load-time relocation. The shard gets
+# its own handle; get_real_lib_handle() caches a single library.
+COLD_TRAMPOLINE_TEMPLATE = """
 void* {name}(...) {{
-    ALOGW("vndk_compat: stub called for {name}");
+{count}    typedef void* (*func_ptr)(...);
+    static func_ptr real_func = nullptr;
+    if (!real_func) {{
+        static void* handle = dlopen("{shard_lib}", RTLD_NOW);
+        if (handle) {{
+            real_func = (func_ptr)dlsym(handle, "{shard_name}");
+        }}
+    }}
+    if (real_func) return real_func();
+    ALOGE("vndk_compat: cold shard entry {shard_name} not found");
     return nullptr;
 }}
 """
 
-def generate_shim(plan_path, output_path):
-    with open(plan_path, 'r') as f:
-        plan = json.load(f)
+# Counters live in a MAP_SHARED file per process name, so they can be pulled
+# from a running device without any IPC (and survive a crash). Processes with
+# the same name share one segment and counts accumulate across restarts and
+# reboots until shim_usage.py --reset removes the files.
+COUNTER_SUPPORT_TEMPLATE = """#include <errno.h>
+#include <fcntl.h>
+#include <stdint.h>
+#include <stdio.h>
+#include <stdlib.h>
+#include <string.h>
+#include <sys/file.h>
+#include <sys/mman.h>
+#include <sys/stat.h>
+#include <unistd.h>
+
+#define VNDK_COMPAT_COUNTERS {count}
+
+static const char kCounterNames[] =
+{names_literal};
+
+static uint64_t g_fallback_counts[VNDK_COMPAT_COUNTERS];
+
+// In-process counts cannot be collected by shim_usage.py, so say so
+static uint64_t* counter_fallback(const char* path, const char* what, int fd) {{
+    ALOGW("vndk_compat: %s %s failed (%s); shim call counts will not be collected",
+          what, path, strerror(errno));
+    if (fd >= 0) close(fd);
+    return g_fallback_counts;
+}}
+
+static uint64_t* map_counters() {{
+    char path[256];
+    snprintf(path, sizeof(path), "{counter_dir}/shim_counts.%s", getprogname());
+    // No O_TRUNC: other processes of the same name may be counting already
+    int fd = open(path, O_RDWR | O_CREAT | O_CLOEXEC, 0640);
+    if (fd < 0) return counter_fallback(path, "open", -1);
+    if (flock(fd, LOCK_EX) != 0) return counter_fallback(path, "flock", fd);
+
+    size_t names_at = {header_size} + VNDK_COMPAT_COUNTERS * sizeof(uint64_t);
+    size_t size = names_at + sizeof(kCounterNames);
+    uint32_t header[4] = {{0, {version}, VNDK_COMPAT_COUNTERS, sizeof(kCounterNames)}};
+    uint64_t plan_id = {plan_id}ULL;
+    memcpy(header, "{magic}", 4);
+
+    struct stat st;
+    if (fstat(fd, &st) != 0) return counter_fallback(path, "fstat", fd);
+    bool reuse = (size_t)st.st_size == size;
+    if (!reuse && (ftruncate(fd, 0) != 0 || ftruncate(fd, size) != 0)) {{
+        return counter_fallback(path, "ftruncate", fd);
+    }}
+    char* base = (char*)mmap(nullptr, size, PROT_READ | PROT_WRITE, MAP_SHARED, fd, 0);
+    if (base == MAP_FAILED) return counter_fallback(path, "mmap", fd);
+    // Keep counts only from a segment written by this exact shim build
+    if (reuse && (memcmp(base, header, sizeof(header)) != 0 ||
+                  memcmp(base + 16, &plan_id, sizeof(plan_id)) != 0 ||
+                  memcmp(base + names_at, kCounterNames, sizeof(kCounterNames)) != 0)) {{
+        memset(base, 0, size);
+        reuse = false;
+    }}
+    if (!reuse) {{
+        memcpy(base, header, sizeof(header));
+        memcpy(base + 16, &plan_id, sizeof(plan_id));
+        memcpy(base + names_at, kCounterNames, sizeof(kCounterNames));
+    }}
+    flock(fd, LOCK_UN);
+    close(fd);
+    return (uint64_t*)(base + {header_size});
+}}
+
+static inline void vndk_compat_count(int index) {{
+    static uint64_t* counts = map_counters();
+    __atomic_fetch_add(&counts[index], 1, __ATOMIC_RELAXED);
+}}
+"""
+
+def shim_kind(action) -> str:
+    if action['type'] == "shim":
+        return "remap" if action.get('remap') else "forward"
+    return action['type']
 
+def counter_key(action) -> str:
+    """Name recorded for an action in the counter segment: kind, lib, symbol."""
+    return f"{shim_kind(action)}\t{action['target_lib']}\t{action['symbol']}"
+
+def _is_cold(action) -> bool:
+    return (action.get('usage') or {}).get('tier') == "cold"
+
+def _definition(action, func: str, count: str) -> str:
+    kind = shim_kind(action)
+    if kind == "remap":
+        return REMAP_TEMPLATE.format(old_name=func, new_name=action['remap'], count=count)
+    if kind == "forward":
+        # Policy "forward" names the library that now exports the symbol
+        lib = action.get('forward') or action['target_lib']
+        return FORWARD_TEMPLATE.format(func=func, name=action['symbol'], count=count,
+                                       target_lib_path=lib if ".so" in lib else lib + ".so")
+    return STUB_TEMPLATE.format(func=func, name=action['symbol'], count=count)
+
+def _counter_support(names, counter_dir: str) -> str:
+    blob = "".join(n + "\0" for n in names)
+    plan_id = int.from_bytes(hashlib.sha256(blob.encode()).digest()[:8], 'little')
+    literal = "\n".join('    "' + n.replace("\t", "\\t") + '\\0"' for n in names) or '    ""'
+    return COUNTER_SUPPORT_TEMPLATE.format(
+        count=max(1, len(names)), names_literal=literal, counter_dir=counter_dir,
+        header_size=COUNTER_HEADER_SIZE, version=COUNTER_VERSION,
+        magic=COUNTER_MAGIC.decode(), plan_id=plan_id)
+
+def generate_shim(plan_path, output_path, instrument=False, counter_dir=DEFAULT_COUNTER_DIR,
+                  cold="keep"):
+    """Writes the shim source; with cold="shard" also <output>_cold.cpp."""
+    header = {}
     symbol_definitions = []
-    actions = plan.get('actions', [])
-    
-    # Group actions by target lib to use correct dlopen target if needed
-    for action in actions:
-        action_type = action['type']
+    cold_definitions = []
+    counter_names = []
+    dropped = 0
+
+    for action in iter_plan_actions(plan_path, header):
+        if action['type'] not in ("shim", "stub"):
+            continue
         name = action['symbol']
-        target_lib = action['target_lib'] + ".so"
-
-        if action_type == "shim":
-            if action.get('remap'):
-                symbol_definitions.append(REMAP_TEMPLATE.format(
-                    old_name=name,
-                    new_name=action['remap']
-                ))
-            else:
-                symbol_definitions.append(FORWARD_TEMPLATE.format(
-                    name=name,
-                    target_lib_path=target_lib
-                ))
-        elif action_type == "stub":
-            symbol_definitions.append(STUB_TEMPLATE.format(name=name))
+        if cold != "keep" and _is_cold(action):
+            if cold == "drop":
+                dropped += 1
+                continue
+            # Real implementation moves to the shard under a private name
+            cold_definitions.append(_definition(action, COLD_PREFIX + name, ""))
+
+        count = ""
+        if instrument:
+            count = f"    vndk_compat_count({len(counter_names)});\n"
+            counter_names.append(counter_key(action))
+
+        if cold == "shard" and _is_cold(action):
+            symbol_definitions.append(COLD_TRAMPOLINE_TEMPLATE.format(
+                name=name, count=count, shard_lib=COLD_SHARD_LIB,
+                shard_name=COLD_PREFIX + name))
+        else:
+            symbol_definitions.append(_definition(action, name, count))
 
     content = SHIM_TEMPLATE.format(
         target_lib="compat_layer",
-        version=plan.get('vendor_api_level', 'unknown'),
+        version=header.get('vendor_api_level', 'unknown'),
+        counter_support=_counter_support(counter_names, counter_dir) if instrument else "",
         symbol_definitions="\n".join(symbol_definitions)
     )
-    
+
     with open(output_path, 'w') as f:
         f.write(content)
 
+    if cold == "shard":
+        cold_path = os.path.splitext(output_path)[0] + "_cold.cpp"
+        with open(cold_path, 'w') as f:
+            f.write(SHIM_TEMPLATE.format(
+                target_lib=COLD_SHARD_LIB,
+                version=header.get('vendor_api_level', 'unknown'),
+                counter_support="",
+                symbol_definitions="\n".join(cold_definitions)))
+        print(f"Moved {len(cold_definitions)} cold entries to {cold_path}")
+    elif dropped:
+        print(f"Dropped {dropped} cold entries")
+
 def main():
     parser = argparse.ArgumentParser(description='Version-Agnostic Shim Generator')
     parser.add_argument('--plan', required=True, help='Path to compat_plan.json')
     parser.add_argument('--output', required=True, help='Output C++ file path')
-    
+    parser.add_argument('--instrument', action='store_true',
+                        help='Add per-symbol call counters (collect with shim_usage.py)')
+    parser.add_argument('--counter-dir', default=DEFAULT_COUNTER_DIR,
+                        help=f'Device directory for counter segments (default: {DEFAULT_COUNTER_DIR})')
+    parser.add_argument('--cold', choices=COLD_POLICIES, default="keep",
+                        help='Handling of actions shim_usage.py marked cold: keep, move to '
+                             f'{COLD_SHARD_LIB} (shard) or omit (drop)')
+
     args = parser.parse_args()
-    generate_shim(args.plan, args.output)
+    generate_shim(args.plan, args.output, args.instrument, args.counter_dir, args.cold)
 
 if __name__ == '__main__':
     main()
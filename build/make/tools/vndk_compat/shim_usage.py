@@ -0,0 +1,244 @@
+#!/usr/bin/env python3
+"""Fleet call counts for instrumented compat shims.
+
+A shim built with `shim_generator.py --instrument` maps one counter segment
+per process name at <counter-dir>/shim_counts.<name>:
+
+    char     magic[4]      "VCSC"
+    uint32   version
+    uint32   count
+    uint32   names_size
+    uint64   plan_id       hash of the names table
+    uint64   counts[count]
+    char     names[names_size]   "kind\\tlib\\tsymbol\\0" per counter
+
+Segments are collected from local dump directories (one sub-directory per
+device, e.g. as left by --pull) and/or pulled from devices with adb, summed
+across processes and devices, and used to annotate the compat plan with a
+`usage` field. A later `shim_generator.py --cold shard|drop` run then moves
+or removes the entries that no device ever called.
+
+Processes of the same name share a segment, and counts accumulate across
+restarts and reboots (a segment is only reset when a differently generated
+shim maps it), so the directory holds at most one file per instrumented
+binary. --reset unlinks a device's segments after they were pulled;
+processes that are already running keep counting into the unlinked copy
+until they restart.
+
+Entries are only tiered once at least --min-devices devices reported, so
+a thin sample never marks anything cold.
+"""
+import os
+import sys
+import json
+import struct
+import argparse
+import subprocess
+from typing import Dict, Iterator, List, Optional, Tuple
+
+from plan_io import iter_plan_actions, write_plan
+from shim_generator import COUNTER_HEADER_SIZE, COUNTER_MAGIC, DEFAULT_COUNTER_DIR, counter_key
+
+DUMP_PREFIX = "shim_counts."
+_HEADER = struct.Struct('<4sIIIQ')
+
+DEFAULT_MIN_DEVICES = 3
+DEFAULT_HOT_CALLS = 1000
+
+
+class DumpFormatError(ValueError):
+    pass
+
+
+def parse_dump(data: bytes) -> Tuple[int, List[Tuple[str, int]]]:
+    """Returns (plan_id, [(counter key, calls)]) for one counter segment."""
+    if len(data) < COUNTER_HEADER_SIZE:
+        raise DumpFormatError("short header")
+    magic, version, count, names_size, plan_id = _HEADER.unpack_from(data)
+    if magic != COUNTER_MAGIC:
+        raise DumpFormatError("bad magic")
+    if version != 1:
+        raise DumpFormatError(f"unsupported version {version}")
+    names_at = COUNTER_HEADER_SIZE + count * 8
+    if len(data) < names_at + names_size:
+        raise DumpFormatError("truncated segment")
+
+    counts = struct.unpack_from(f'<{count}Q', data, COUNTER_HEADER_SIZE)
+    names = data[names_at:names_at + names_size].decode(errors='replace').split('\0')
+    return plan_id, list(zip(names, counts))
+
+
+def iter_dump_files(dump_dir: str) -> Iterator[Tuple[str, str]]:
+    """Yields (device, path); devices are the top-level sub-directories."""
+    for root, dirs, files in os.walk(dump_dir):
+        dirs.sort()
+        rel = os.path.relpath(root, dump_dir)
+        device = "local" if rel == '.' else rel.split(os.sep)[0]
+        for name in sorted(files):
+            if name.startswith(DUMP_PREFIX):
+                yield device, os.path.join(root, name)
+
+
+def pull_dumps(serial: str, dest_dir: str, counter_dir: str = DEFAULT_COUNTER_DIR,
+               adb: str = "adb") -> Optional[str]:
+    """Copies a device's counter segments to dest_dir/<serial> (needs root adbd)."""
+    dest = os.path.join(dest_dir, serial)
+    os.makedirs(dest, exist_ok=True)
+    try:
+        subprocess.check_call([adb, '-s', serial, 'pull', counter_dir + '/.', dest],
+                              stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+    except (OSError, subprocess.CalledProcessError):
+        print(f"Warning: could not pull {counter_dir} from {serial}", file=sys.stderr)
+        return None
+    return dest
+
+
+def reset_dumps(serial: str, counter_dir: str = DEFAULT_COUNTER_DIR, adb: str = "adb") -> bool:
+    """Unlinks a device's counter segments; never truncates a mapped one."""
+    try:
+        subprocess.check_call([adb, '-s', serial, 'shell', f'rm -f {counter_dir}/{DUMP_PREFIX}*'],
+                              stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+    except (OSError, subprocess.CalledProcessError):
+        print(f"Warning: could not reset {counter_dir} on {serial}", file=sys.stderr)
+        return False
+    return True
+
+
+class UsageTable:
+    """Calls per counter key, summed over processes and devices."""
+
+    def __init__(self):
+        self.calls: Dict[str, int] = {}
+        # key -> devices with at least one call
+        self.callers: Dict[str, set] = {}
+        self.devices: set = set()
+        self.plan_ids: set = set()
+        self.segments = 0
+        self.skipped = 0
+
+    def add_segment(self, device: str, data: bytes):
+        plan_id, entries = parse_dump(data)
+        self.plan_ids.add(plan_id)
+        self.devices.add(device)
+        self.segments += 1
+        calls = self.calls
+        for key, n in entries:
+            if not key:
+                continue
+            calls[key] = calls.get(key, 0) + n
+            if n:
+                self.callers.setdefault(key, set()).add(device)
+
+    def add_dir(self, dump_dir: str):
+        for device, path in iter_dump_files(dump_dir):
+            try:
+                with open(path, 'rb') as f:
+                    self.add_segment(device, f.read())
+            except (OSError, DumpFormatError) as e:
+                # Half-initialized segments of processes killed at startup
+                self.skipped += 1
+                print(f"Warning: skipping {path}: {e}", file=sys.stderr)
+
+    def tier(self, key: str, min_devices: int, hot_calls: int) -> str:
+        if key not in self.calls or len(self.devices) < min_devices:
+            return "unknown"
+        n = self.calls[key]
+        if n == 0:
+            return "cold"
+        return "hot" if n >= hot_calls else "warm"
+
+    def usage(self, key: str, min_devices: int, hot_calls: int) -> Dict:
+        return {
+            "calls": self.calls.get(key, 0),
+            "devices": len(self.callers.get(key, ())),
+            "tier": self.tier(key, min_devices, hot_calls),
+        }
+
+    def summary(self, min_devices: int, hot_calls: int) -> Dict:
+        tiers = {"hot": 0, "warm": 0, "cold": 0, "unknown": 0}
+        for key in self.calls:
+            tiers[self.tier(key, min_devices, hot_calls)] += 1
+        ranked = sorted(self.calls.items(), key=lambda kv: (-kv[1], kv[0]))
+        return {
+            "devices": len(self.devices),
+            "segments": self.segments,
+            "skipped_segments": self.skipped,
+            "plan_ids": [f"{p:016x}" for p in sorted(self.plan_ids)],
+            "tiers": tiers,
+            "entries": [
+                {"key": k, "calls": n, "devices": len(self.callers.get(k, ()))}
+                for k, n in ranked
+            ],
+        }
+
+
+def annotate_plan(plan_path: str, table: UsageTable, output_path: str,
+                  min_devices: int, hot_calls: int) -> Dict[str, int]:
+    """Writes the plan back with a `usage` field on every shim/stub action."""
+    header = {}
+    tiers: Dict[str, int] = {}
+
+    def annotated():
+        for action in iter_plan_actions(plan_path, header):
+            if action.get('type') in ("shim", "stub"):
+                usage = table.usage(counter_key(action), min_devices, hot_calls)
+                action['usage'] = usage
+                tiers[usage['tier']] = tiers.get(usage['tier'], 0) + 1
+            yield action
+
+    write_plan(output_path, annotated(), header)
+    return tiers
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Aggregate instrumented shim call counts')
+    parser.add_argument('--dump-dir', action='append', default=[],
+                        help='Directory of counter segments, one sub-directory per device (repeatable)')
+    parser.add_argument('--pull', action='append', default=[], metavar='SERIAL',
+                        help='Pull segments from this device into the first --dump-dir (repeatable)')
+    parser.add_argument('--reset', action='store_true',
+                        help='Remove segments from each --pull device once pulled')
+    parser.add_argument('--adb', default=os.environ.get('ADB', 'adb'))
+    parser.add_argument('--counter-dir', default=DEFAULT_COUNTER_DIR, help='Segment directory on device')
+    parser.add_argument('--min-devices', type=int, default=DEFAULT_MIN_DEVICES,
+                        help='Devices required before entries are tiered')
+    parser.add_argument('--hot-calls', type=int, default=DEFAULT_HOT_CALLS,
+                        help='Fleet-wide calls at which an entry is hot')
+    parser.add_argument('--plan', help='Compat plan to annotate')
+    parser.add_argument('--annotate-plan', help='Write the plan with usage fields here')
+    parser.add_argument('--output', help='Write the fleet summary JSON here')
+
+    args = parser.parse_args()
+    if args.pull and not args.dump_dir:
+        parser.error('--pull needs a --dump-dir to pull into')
+    if args.annotate_plan and not args.plan:
+        parser.error('--annotate-plan needs --plan')
+    if args.reset and not args.pull:
+        parser.error('--reset needs --pull')
+
+    for serial in args.pull:
+        if pull_dumps(serial, args.dump_dir[0], args.counter_dir, args.adb) and args.reset:
+            reset_dumps(serial, args.counter_dir, args.adb)
+
+    table = UsageTable()
+    for d in args.dump_dir:
+        table.add_dir(d)
+    if len(table.plan_ids) > 1:
+        print("Warning: segments come from differently generated shims; "
+              "counts are merged by symbol", file=sys.stderr)
+
+    summary = table.summary(args.min_devices, args.hot_calls)
+    if args.annotate_plan:
+        summary["plan_tiers"] = annotate_plan(args.plan, table, args.annotate_plan,
+                                              args.min_devices, args.hot_calls)
+    if args.output:
+        with open(args.output, 'w') as f:
+            json.dump(summary, f, indent=2)
+
+    t = summary["tiers"]
+    print(f"{summary['devices']} device(s), {summary['segments']} segment(s): "
+          f"{t['hot']} hot, {t['warm']} warm, {t['cold']} cold, {t['unknown']} unknown")
+
+
+if __name__ == '__main__':
+    main()
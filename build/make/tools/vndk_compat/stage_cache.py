@@ -0,0 +1,310 @@
+#!/usr/bin/env python3
+"""Input-hash memoization for pipeline stages.
+
+Wraps a stage command. The cache key hashes the stage name, the
+canonicalized inputs (JSON up to 4 MiB is re-serialized with sorted keys,
+larger files are hashed as bytes, directories file by file), the command
+line with input/output/tool paths replaced by placeholders, and the source
+of the tools themselves. On a hit the recorded outputs are restored instead
+of running the command; on a miss the command runs and its outputs are
+published atomically. Since paths are not part of the key, a wrapped stage
+must not write its input or output paths into its outputs.
+
+The cache directory may be shared by several checkouts or workers (e.g. a
+CI cache volume). Entries are published with a rename, so readers never
+see partial entries, and the least recently used entries are evicted when
+the directory grows past --max-size.
+
+Usage:
+    stage_cache.py --stage diff --input model.json --input footprint.json \\
+        --tool vndk_diff_engine.py --output plan.json -- \\
+        python3 vndk_diff_engine.py --system-model model.json ... --output plan.json
+
+Without --cache-dir (or $VNDK_COMPAT_CACHE_DIR) the command just runs.
+"""
+import os
+import sys
+import json
+import shutil
+import hashlib
+import argparse
+import subprocess
+import tempfile
+import time
+from typing import Dict, List, Optional
+
+KEY_SCHEMA = "2"
+MANIFEST = "manifest.json"
+DEFAULT_MAX_SIZE = "20G"
+CANONICAL_JSON_MAX = 4 << 20
+
+
+def parse_size(text: str) -> int:
+    units = {'K': 1 << 10, 'M': 1 << 20, 'G': 1 << 30, 'T': 1 << 40}
+    text = text.strip().upper()
+    if text and text[-1] in units:
+        return int(float(text[:-1]) * units[text[-1]])
+    return int(text)
+
+
+def _hash_file(h, path: str):
+    # Large inputs (plans) are hashed as raw bytes; parsing them here would
+    # defeat the streaming readers the stages themselves use
+    if path.endswith('.json') and os.path.getsize(path) <= CANONICAL_JSON_MAX:
+        try:
+            with open(path, 'r') as f:
+                data = json.load(f)
+            # Formatting and key order do not change what a stage computes
+            h.update(json.dumps(data, sort_keys=True, separators=(',', ':')).encode())
+            return
+        except (ValueError, UnicodeDecodeError):
+            pass
+    with open(path, 'rb') as f:
+        for block in iter(lambda: f.read(1 << 20), b''):
+            h.update(block)
+
+
+def hash_path(h, path: str):
+    if os.path.isdir(path):
+        h.update(b'D')
+        for root, dirs, files in os.walk(path):
+            dirs.sort()
+            for name in sorted(files):
+                full = os.path.join(root, name)
+                h.update(os.path.relpath(full, path).encode() + b'\0')
+                _hash_file(h, full)
+    elif os.path.isfile(path):
+        h.update(b'F')
+        _hash_file(h, path)
+    else:
+        h.update(b'-')  # optional input that does not exist
+
+
+def canonical_command(command: List[str], roles: Dict[str, str]) -> List[str]:
+    """Replaces path arguments (also --flag=path) with stable placeholders."""
+    out = []
+    for tok in command:
+        flag, eq, value = tok.partition('=')
+        if eq and flag.startswith('-'):
+            out.append(f"{flag}={roles.get(os.path.abspath(value), value)}")
+        else:
+            out.append(roles.get(os.path.abspath(tok), tok))
+    return out
+
+
+def compute_key(stage: str, inputs: List[str], tools: List[str],
+                outputs: List[str], command: List[str]) -> str:
+    roles = {}
+    for kind, paths in (('in', inputs), ('tool', tools), ('out', outputs)):
+        for i, p in enumerate(paths):
+            roles.setdefault(os.path.abspath(p), f"@{kind}{i}")
+
+    h = hashlib.sha256()
+    h.update(f"schema={KEY_SCHEMA}\0stage={stage}\0".encode())
+    h.update(f"python={sys.version_info[0]}.{sys.version_info[1]}\0".encode())
+    for kind, paths in (('in', inputs), ('tool', tools)):
+        for i, p in enumerate(paths):
+            h.update(f"{kind}{i}\0".encode())
+            hash_path(h, p)
+    h.update(f"outputs={len(outputs)}\0".encode())
+    h.update(json.dumps(canonical_command(command, roles)).encode())
+    return h.hexdigest()
+
+
+class StageCache:
+    def __init__(self, cache_dir: str, max_size: int):
+        self.cache_dir = cache_dir
+        self.max_size = max_size
+
+    def entry_dir(self, key: str) -> str:
+        return os.path.join(self.cache_dir, key[:2], key)
+
+    def restore(self, key: str, outputs: List[str]) -> bool:
+        entry = self.entry_dir(key)
+        manifest_path = os.path.join(entry, MANIFEST)
+        try:
+            with open(manifest_path, 'r') as f:
+                manifest = json.load(f)
+        except (OSError, ValueError):
+            return False
+        if manifest.get('outputs') != len(outputs):
+            return False
+
+        restored = []
+        try:
+            for i, dest in enumerate(outputs):
+                _install(os.path.join(entry, str(i)), dest)
+                restored.append(dest)
+        except OSError as e:
+            # Entry evicted mid-restore, or a full/read-only disk: never leave
+            # a mix of cached and stale outputs, run the stage instead
+            print(f"stage_cache: could not restore {key[:12]}: {e}", file=sys.stderr)
+            for dest in restored:
+                _remove(dest)
+            return False
+        # mtime of the manifest is the LRU clock
+        try:
+            os.utime(manifest_path)
+        except OSError:
+            pass
+        return True
+
+    def publish(self, key: str, stage: str, outputs: List[str]):
+        final = self.entry_dir(key)
+        if os.path.exists(final):
+            return
+        os.makedirs(os.path.dirname(final), exist_ok=True)
+        tmp = tempfile.mkdtemp(prefix=f".{key[:8]}.", dir=os.path.dirname(final))
+        try:
+            size = 0
+            for i, src in enumerate(outputs):
+                dest = os.path.join(tmp, str(i))
+                if os.path.isdir(src):
+                    shutil.copytree(src, dest)
+                else:
+                    shutil.copy2(src, dest)
+                size += _tree_size(dest)
+            with open(os.path.join(tmp, MANIFEST), 'w') as f:
+                json.dump({"stage": stage, "outputs": len(outputs), "size": size,
+                           "created": int(time.time())}, f)
+            try:
+                os.rename(tmp, final)
+                tmp = None
+            except OSError:
+                pass  # another worker published the same key first
+        finally:
+            if tmp:
+                shutil.rmtree(tmp, ignore_errors=True)
+        self.evict()
+
+    def evict(self):
+        entries = []
+        total = 0
+        for shard in _listdir(self.cache_dir):
+            shard_dir = os.path.join(self.cache_dir, shard)
+            for key in _listdir(shard_dir):
+                manifest_path = os.path.join(shard_dir, key, MANIFEST)
+                try:
+                    st = os.stat(manifest_path)
+                    with open(manifest_path, 'r') as f:
+                        size = json.load(f).get('size', 0)
+                except (OSError, ValueError):
+                    continue
+                entries.append((st.st_mtime, size, os.path.join(shard_dir, key)))
+                total += size
+        if total <= self.max_size:
+            return
+        entries.sort()
+        for _, size, path in entries:
+            if total <= self.max_size:
+                break
+            # Rename first so concurrent readers never see a half-deleted entry
+            doomed = f"{path}.evict.{os.getpid()}"
+            try:
+                os.rename(path, doomed)
+            except OSError:
+                continue
+            shutil.rmtree(doomed, ignore_errors=True)
+            total -= size
+
+
+def _listdir(path: str) -> List[str]:
+    try:
+        return [n for n in os.listdir(path) if not n.startswith('.')]
+    except OSError:
+        return []
+
+
+def _tree_size(path: str) -> int:
+    if os.path.isfile(path):
+        return os.path.getsize(path)
+    total = 0
+    for root, _, files in os.walk(path):
+        for name in files:
+            total += os.path.getsize(os.path.join(root, name))
+    return total
+
+
+def _remove(path: str):
+    if os.path.isdir(path) and not os.path.islink(path):
+        shutil.rmtree(path, ignore_errors=True)
+    else:
+        try:
+            os.remove(path)
+        except OSError:
+            pass
+
+
+def _install(src: str, dest: str):
+    """Copies a cached output into place atomically."""
+    parent = os.path.dirname(os.path.abspath(dest))
+    os.makedirs(parent, exist_ok=True)
+    if os.path.isdir(src):
+        tmp = tempfile.mkdtemp(prefix='.stage_cache.', dir=parent)
+        try:
+            shutil.rmtree(tmp)
+            shutil.copytree(src, tmp)
+            if os.path.isdir(dest):
+                shutil.rmtree(dest)
+            os.rename(tmp, dest)
+        except OSError:
+            shutil.rmtree(tmp, ignore_errors=True)
+            raise
+    else:
+        fd, tmp = tempfile.mkstemp(prefix='.stage_cache.', dir=parent)
+        os.close(fd)
+        try:
+            shutil.copy2(src, tmp)
+            os.replace(tmp, dest)
+        except OSError:
+            _remove(tmp)
+            raise
+
+
+def run_stage(stage: str, inputs: List[str], tools: List[str], outputs: List[str],
+              command: List[str], cache_dir: Optional[str], max_size: int,
+              verbose: bool = False) -> int:
+    if not cache_dir:
+        return subprocess.call(command)
+
+    key = compute_key(stage, inputs, tools, outputs, command)
+    cache = StageCache(cache_dir, max_size)
+    if cache.restore(key, outputs):
+        if verbose:
+            print(f"stage_cache: {stage} hit ({key[:12]})")
+        return 0
+
+    if verbose:
+        print(f"stage_cache: {stage} miss ({key[:12]})")
+    rc = subprocess.call(command)
+    if rc == 0 and all(os.path.exists(o) for o in outputs):
+        try:
+            cache.publish(key, stage, outputs)
+        except OSError as e:
+            print(f"stage_cache: could not publish {stage}: {e}", file=sys.stderr)
+    return rc
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Memoize a pipeline stage by input hash')
+    parser.add_argument('--stage', required=True, help='Stage name (part of the key)')
+    parser.add_argument('--input', action='append', default=[], help='Input file or directory (repeatable)')
+    parser.add_argument('--tool', action='append', default=[], help='Tool source file (repeatable)')
+    parser.add_argument('--output', action='append', default=[], help='Output file or directory (repeatable)')
+    parser.add_argument('--cache-dir', default=os.environ.get('VNDK_COMPAT_CACHE_DIR', ''))
+    parser.add_argument('--max-size', default=os.environ.get('VNDK_COMPAT_CACHE_MAX_SIZE', DEFAULT_MAX_SIZE),
+                        help=f'Evict LRU entries above this size (default: {DEFAULT_MAX_SIZE})')
+    parser.add_argument('--verbose', action='store_true')
+    parser.add_argument('command', nargs=argparse.REMAINDER, help='-- command ...')
+
+    args = parser.parse_args()
+    command = args.command[1:] if args.command[:1] == ['--'] else args.command
+    if not command:
+        parser.error('missing stage command after --')
+
+    sys.exit(run_stage(args.stage, args.input, args.tool, args.output, command,
+                       args.cache_dir, parse_size(args.max_size), args.verbose))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,347 @@
+#!/usr/bin/env python3
+"""Proposes draft policy rules for ABI breaks that no policy rule covers.
+
+The system model is indexed by exact symbol, by (namespace path, base name)
+of the demangled symbol, by a normalized stem (base name without _v2/_ex/
+numeric suffixes) and by character trigrams of the stem. A query only
+touches the matching hash buckets plus the rarest trigram postings, so
+cost per unresolved symbol does not grow with the size of the model.
+
+Candidates map onto the actions the pipeline already understands:
+  shim + remap   renamed (foo -> foo_v2) or re-signatured replacement
+  shim + forward same symbol, now exported by a different library
+  stub           nothing similar enough in the system model
+
+Output is a policy JSON document ("rules") with extra "confidence" and
+"candidates" keys per rule; drafts must be reviewed before being merged
+into policies/v<N>.policy.json. Rules with a replacement are ranked by
+confidence first; stubs follow, ranked by how clearly nothing matched.
+"""
+import re
+import sys
+import json
+import argparse
+from collections import Counter
+from typing import Dict, Iterable, List, Optional, Tuple
+
+from plan_io import iter_plan_actions
+
+# Trailing markers that usually denote a replacement of the same API
+_STEM_SUFFIX_RE = re.compile(r'(?:_?[vV]\d+|_?\d+|_ex|Ex|_new|New|_impl|Impl|_internal|Internal)$')
+
+GRAM = 3
+# Postings longer than this carry little information and are skipped
+MAX_POSTING = 2048
+# Candidates re-scored exactly after trigram counting
+RESCORE_LIMIT = 32
+MIN_CONFIDENCE = 0.5
+
+# Scores per match kind (before same-library bonus)
+SCORE_MOVED = 0.97
+SCORE_SIGNATURE = 0.9
+SCORE_STEM = 0.85
+SCORE_STEM_OTHER_NS = 0.7
+SCORE_FUZZY_MAX = 0.75
+SAME_LIB_BONUS = 0.04
+
+_CTOR_DTOR = {'C1', 'C2', 'C3', 'CI', 'D0', 'D1', 'D2'}
+
+
+def _source_name(s: str, pos: int) -> Tuple[Optional[str], int]:
+    end = pos
+    while end < len(s) and s[end].isdigit():
+        end += 1
+    if end == pos:
+        return None, pos
+    n = int(s[pos:end])
+    return s[end:end + n], end + n
+
+
+def _skip_template_args(s: str, pos: int) -> int:
+    """pos points at 'I'; returns the index after the matching 'E'."""
+    depth = 0
+    while pos < len(s):
+        c = s[pos]
+        if c.isdigit():
+            _, pos = _source_name(s, pos)
+            continue
+        if c in 'IXNL':  # each opens a scope closed by 'E'
+            depth += 1
+        elif c == 'E':
+            depth -= 1
+            if depth == 0:
+                return pos + 1
+        pos += 1
+    return pos
+
+
+def demangle_parts(symbol: str) -> Tuple[Tuple[str, ...], str, Optional[str]]:
+    """Splits an Itanium-mangled name into (namespace path, base name, params).
+
+    Only the name structure is decoded; the parameter list is kept in its
+    mangled form, which is enough to tell two overloads apart. C symbols
+    and anything not understood come back as ((), symbol, None).
+    """
+    symbol = symbol.split('@', 1)[0]
+    if not symbol.startswith('_Z'):
+        return (), symbol, None
+
+    s, pos = symbol, 2
+    if s.startswith('L', pos):
+        pos += 1  # internal linkage
+    comps: List[str] = []
+
+    if s.startswith('N', pos):
+        pos += 1
+        while pos < len(s) and s[pos] in 'rVKRO':
+            pos += 1
+        while pos < len(s) and s[pos] != 'E':
+            c = s[pos]
+            if c.isdigit():
+                name, pos = _source_name(s, pos)
+                comps.append(name)
+            elif s.startswith('St', pos):
+                comps.append('std')
+                pos += 2
+            elif c == 'S':
+                end = s.find('_', pos)
+                if end < 0:
+                    return (), symbol, None
+                pos = end + 1
+            elif c == 'I':
+                pos = _skip_template_args(s, pos)
+            elif s[pos:pos + 2] in _CTOR_DTOR and comps:
+                prefix = '~' if c == 'D' else ''
+                comps.append(prefix + comps[-1])
+                pos += 2
+            elif c.islower() and pos + 1 < len(s) and s[pos + 1].isalpha():
+                comps.append('operator' + s[pos:pos + 2])
+                pos += 2
+            else:
+                return (), symbol, None
+        pos += 1
+    else:
+        if s.startswith('St', pos):
+            comps.append('std')
+            pos += 2
+        name, pos = _source_name(s, pos)
+        if name is None:
+            return (), symbol, None
+        comps.append(name)
+        if s.startswith('I', pos):
+            pos = _skip_template_args(s, pos)
+
+    if not comps:
+        return (), symbol, None
+    return tuple(comps[:-1]), comps[-1], s[pos:]
+
+
+def stem_of(base: str) -> str:
+    stem = _STEM_SUFFIX_RE.sub('', base) or base
+    return stem.lower()
+
+
+def grams_of(text: str) -> set:
+    padded = f"^{text}$"
+    if len(padded) <= GRAM:
+        return {padded}
+    return {padded[i:i + GRAM] for i in range(len(padded) - GRAM + 1)}
+
+
+def _dice(a: set, b: set) -> float:
+    if not a or not b:
+        return 0.0
+    return 2.0 * len(a & b) / (len(a) + len(b))
+
+
+class SymbolEntry:
+    __slots__ = ('symbol', 'lib', 'ns', 'base', 'stem', 'params')
+
+    def __init__(self, symbol: str, lib: str):
+        self.symbol = symbol
+        self.lib = lib
+        self.ns, self.base, self.params = demangle_parts(symbol)
+        self.stem = stem_of(self.base)
+
+
+class Candidate:
+    __slots__ = ('entry', 'score', 'reason')
+
+    def __init__(self, entry: SymbolEntry, score: float, reason: str):
+        self.entry = entry
+        self.score = score
+        self.reason = reason
+
+    def to_json(self) -> Dict:
+        return {"symbol": self.entry.symbol, "library": self.entry.lib,
+                "score": round(self.score, 3), "reason": self.reason}
+
+
+class SymbolIndex:
+    """Hash and trigram index over the exports of a system model."""
+
+    def __init__(self):
+        self.entries: List[SymbolEntry] = []
+        self.by_symbol: Dict[str, List[int]] = {}
+        self.by_qualified: Dict[Tuple[Tuple[str, ...], str], List[int]] = {}
+        self.by_stem: Dict[str, List[int]] = {}
+        self.grams: Dict[str, List[int]] = {}
+
+    def add(self, symbol: str, lib: str):
+        entry_id = len(self.entries)
+        entry = SymbolEntry(symbol, lib)
+        self.entries.append(entry)
+        self.by_symbol.setdefault(entry.symbol, []).append(entry_id)
+        self.by_qualified.setdefault((entry.ns, entry.base), []).append(entry_id)
+        postings = self.by_stem.get(entry.stem)
+        if postings is None:
+            # Trigram postings hold one representative per stem
+            self.by_stem[entry.stem] = [entry_id]
+            for g in grams_of(entry.stem):
+                self.grams.setdefault(g, []).append(entry_id)
+        else:
+            postings.append(entry_id)
+
+    @classmethod
+    def from_model(cls, model: Dict) -> 'SymbolIndex':
+        index = cls()
+        for lib in model.get('libraries', []):
+            for sym in lib.get('symbols', []):
+                index.add(sym['name'], lib['name'])
+        return index
+
+    def _fuzzy_stems(self, stem: str) -> List[Tuple[str, float]]:
+        q = grams_of(stem)
+        postings = sorted((self.grams.get(g, ()) for g in q), key=len)
+        counts: Counter = Counter()
+        for p in postings:
+            if len(p) > MAX_POSTING and counts:
+                break  # remaining grams are even more common
+            counts.update(p[:MAX_POSTING])
+        out = []
+        for entry_id, _ in counts.most_common(RESCORE_LIMIT):
+            other = self.entries[entry_id].stem
+            if other != stem:
+                out.append((other, _dice(q, grams_of(other))))
+        return out
+
+    def query(self, symbol: str, lib: Optional[str] = None, limit: int = 5) -> List[Candidate]:
+        probe = SymbolEntry(symbol, lib or '')
+        best: Dict[int, Candidate] = {}
+
+        def offer(entry_id: int, score: float, reason: str):
+            entry = self.entries[entry_id]
+            if entry.symbol == probe.symbol and entry.lib == probe.lib:
+                return
+            if lib and entry.lib == lib:
+                score = min(0.99, score + SAME_LIB_BONUS)
+            cur = best.get(entry_id)
+            if cur is None or score > cur.score:
+                best[entry_id] = Candidate(entry, score, reason)
+
+        for i in self.by_symbol.get(probe.symbol, ()):
+            offer(i, SCORE_MOVED, "moved")
+        for i in self.by_qualified.get((probe.ns, probe.base), ()):
+            if self.entries[i].symbol != probe.symbol:
+                offer(i, SCORE_SIGNATURE, "signature")
+        for i in self.by_stem.get(probe.stem, ()):
+            same_ns = self.entries[i].ns == probe.ns
+            offer(i, SCORE_STEM if same_ns else SCORE_STEM_OTHER_NS, "renamed")
+        for other, sim in self._fuzzy_stems(probe.stem):
+            for i in self.by_stem[other]:
+                ns_factor = 1.0 if self.entries[i].ns == probe.ns else 0.8
+                offer(i, SCORE_FUZZY_MAX * sim * ns_factor, "similar")
+
+        ranked = sorted(best.values(), key=lambda c: (-c.score, c.entry.symbol, c.entry.lib))
+        return ranked[:limit]
+
+
+def propose_rule(lib_name: str, symbol: str, candidates: List[Candidate],
+                 min_confidence: float = MIN_CONFIDENCE) -> Dict:
+    """Drafts one policy rule from ranked candidates."""
+    top = candidates[0] if candidates and candidates[0].score >= min_confidence else None
+    rule = {"action": "stub", "target": lib_name, "symbols": [symbol]}
+
+    if top is None:
+        rule["comment"] = "No replacement found in system model"
+        rule["confidence"] = round(1.0 - (candidates[0].score if candidates else 0.0), 3)
+    elif top.reason == "moved":
+        # The forwarder must dlopen the provider, not the library that lost it
+        rule["action"] = "shim"
+        rule["forward"] = {symbol: top.entry.lib}
+        rule["comment"] = f"Now exported by {top.entry.lib}"
+        rule["confidence"] = round(top.score, 3)
+    else:
+        rule["action"] = "shim"
+        rule["remap"] = {symbol: top.entry.symbol}
+        if top.reason == "signature":
+            rule["comment"] = (f"Parameter list changed ({top.entry.params or '-'}); "
+                               f"remap needs an adapter")
+        else:
+            rule["comment"] = f"Replacement candidate {top.entry.base} ({top.reason})"
+        if top.entry.lib != lib_name:
+            rule["comment"] += f", provided by {top.entry.lib}"
+        rule["confidence"] = round(top.score, 3)
+
+    if candidates:
+        rule["candidates"] = [c.to_json() for c in candidates]
+    return rule
+
+
+def draft_policy(index: SymbolIndex, unresolved: Iterable[Tuple[str, str]],
+                 api_level: Optional[int] = None, limit: int = 5,
+                 min_confidence: float = MIN_CONFIDENCE) -> Dict:
+    rules = []
+    seen = set()
+    for lib_name, symbol in unresolved:
+        if (lib_name, symbol) in seen:
+            continue
+        seen.add((lib_name, symbol))
+        rules.append(propose_rule(lib_name, symbol, index.query(symbol, lib_name, limit),
+                                  min_confidence))
+    # A stub's confidence is that nothing matched, not that a fix was found
+    rules.sort(key=lambda r: (r["action"] == "stub", -r["confidence"],
+                              r["target"], r["symbols"][0]))
+    return {
+        "api_level": api_level,
+        "description": "Draft rules for unresolved symbols (review before merging)",
+        "rules": rules,
+    }
+
+
+def unresolved_from_plan(plan_path: str) -> Iterable[Tuple[str, str]]:
+    for action in iter_plan_actions(plan_path):
+        if action.get('type') != 'ABI_BREAK':
+            continue
+        if (action.get('resolution') or {}).get('action', 'NONE') == 'NONE':
+            yield action['target'], action['symbol']
+
+
+def save_draft(draft: Dict, output_path: str):
+    with open(output_path, 'w') as f:
+        json.dump(draft, f, indent=2)
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Propose policy rules for unresolved ABI breaks')
+    parser.add_argument('--system-model', required=True)
+    parser.add_argument('--plan', required=True, help='Diff engine plan (JSON or JSONL)')
+    parser.add_argument('--api-level', type=int, help='api_level of the draft policy')
+    parser.add_argument('--limit', type=int, default=5, help='Candidates kept per symbol')
+    parser.add_argument('--min-confidence', type=float, default=MIN_CONFIDENCE,
+                        help='Below this the draft falls back to a stub')
+    parser.add_argument('--output', required=True)
+
+    args = parser.parse_args()
+
+    with open(args.system_model, 'r') as f:
+        index = SymbolIndex.from_model(json.load(f))
+    draft = draft_policy(index, unresolved_from_plan(args.plan), args.api_level,
+                         args.limit, args.min_confidence)
+    save_draft(draft, args.output)
+    print(f"Drafted {len(draft['rules'])} rule(s) from {len(index.entries)} indexed symbols",
+          file=sys.stderr)
+
+
+if __name__ == '__main__':
+    main()
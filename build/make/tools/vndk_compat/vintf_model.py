@@ -0,0 +1,271 @@
+#!/usr/bin/env python3
+"""Shared VINTF manifest / compatibility matrix model.
+
+Parses manifest and matrix XML into compact HAL records and indexes them
+by name, format, interface and (interface, instance). A main manifest and
+its fragment directory are merged in memory. Parsed files are cached on
+disk keyed by content hash, so repeated runs (and every tool sharing this
+module) skip XML parsing for unchanged inputs.
+
+Cache location: $VINTF_CACHE_DIR, else ~/.cache/vendor15/vintf. Set
+VINTF_CACHE_DIR to an empty string to disable the persistent cache.
+"""
+import os
+import re
+import sys
+import json
+import hashlib
+import tempfile
+import argparse
+import xml.etree.ElementTree as ET
+from typing import Dict, Iterable, List, Optional, Tuple
+
+CACHE_SCHEMA = 1
+
+# [package]@1.0::IFoo/default (HIDL) or IFoo/default (AIDL)
+_FQNAME_RE = re.compile(r"^(?:[\w.]*@(\d+\.\d+)::)?(\w+)/(\S+)$")
+
+
+class Hal:
+    __slots__ = ('name', 'format', 'versions', 'interfaces', 'transport',
+                 'optional', 'updatable_via_apex', 'source')
+
+    def __init__(self, name: str, format: str = "hidl", versions: List[str] = None,
+                 interfaces: List[Tuple[str, List[str]]] = None, transport: str = "",
+                 optional: bool = False, updatable_via_apex: bool = False, source: str = ""):
+        self.name = name
+        self.format = format
+        self.versions = versions if versions is not None else []
+        # [(interface name, [instances])]
+        self.interfaces = interfaces if interfaces is not None else []
+        self.transport = transport
+        self.optional = optional
+        self.updatable_via_apex = updatable_via_apex
+        self.source = source
+
+    def instances(self) -> Iterable[Tuple[str, str]]:
+        for iface, insts in self.interfaces:
+            for inst in insts:
+                yield iface, inst
+
+    def to_json(self) -> list:
+        return [self.name, self.format, self.versions,
+                [[i, list(insts)] for i, insts in self.interfaces],
+                self.transport, self.optional, self.updatable_via_apex]
+
+    @classmethod
+    def from_json(cls, data: list, source: str) -> 'Hal':
+        name, fmt, versions, ifaces, transport, optional, apex = data
+        return cls(name, fmt, versions, [(i, insts) for i, insts in ifaces],
+                   transport, optional, apex, source)
+
+    def __repr__(self):
+        return f"Hal({self.name!r}, {self.format}, versions={self.versions})"
+
+
+def _text(elem) -> str:
+    return elem.text.strip() if elem is not None and elem.text else ""
+
+
+def parse_hal_element(hal_elem, source: str = "") -> Optional[Hal]:
+    name = _text(hal_elem.find("name"))
+    if not name:
+        return None
+
+    versions = [_text(v) for v in hal_elem.findall("version") if _text(v)]
+    interfaces: Dict[str, List[str]] = {}
+
+    for iface_elem in hal_elem.findall("interface"):
+        iface = _text(iface_elem.find("name"))
+        if not iface:
+            continue
+        insts = interfaces.setdefault(iface, [])
+        for tag in ("instance", "regex-instance"):
+            insts.extend(_text(e) for e in iface_elem.findall(tag) if _text(e))
+
+    # fqname encodes version, interface and instance: @1.0::IFoo/default
+    for fq_elem in hal_elem.findall("fqname"):
+        m = _FQNAME_RE.match(_text(fq_elem))
+        if m:
+            ver, iface, inst = m.groups()
+            if ver and ver not in versions:
+                versions.append(ver)
+            interfaces.setdefault(iface, []).append(inst)
+
+    return Hal(
+        name=name,
+        format=hal_elem.get("format", "hidl"),
+        versions=versions,
+        interfaces=list(interfaces.items()),
+        transport=_text(hal_elem.find("transport")),
+        optional=hal_elem.get("optional") == "true",
+        updatable_via_apex=hal_elem.get("updatable-via-apex") == "true",
+        source=source,
+    )
+
+
+def _cache_dir() -> Optional[str]:
+    d = os.environ.get("VINTF_CACHE_DIR")
+    if d is None:
+        d = os.path.join(os.path.expanduser("~"), ".cache", "vendor15", "vintf")
+    return d or None
+
+
+# digest -> serialized records; callers always get fresh Hal objects
+_memo: Dict[str, list] = {}
+
+
+def parse_file(path: str) -> List[Hal]:
+    """Parses one manifest/matrix file into Hal records (content-hash cached)."""
+    with open(path, "rb") as f:
+        data = f.read()
+    digest = hashlib.sha256(data).hexdigest()
+
+    cached = _memo.get(digest)
+    if cached is not None:
+        return [Hal.from_json(h, path) for h in cached]
+
+    cache_dir = _cache_dir()
+    cache_path = os.path.join(cache_dir, f"{digest}.json") if cache_dir else None
+    if cache_path and os.path.exists(cache_path):
+        try:
+            with open(cache_path, "r") as f:
+                payload = json.load(f)
+            if payload.get("schema") == CACHE_SCHEMA:
+                hals = [Hal.from_json(h, path) for h in payload["hals"]]
+                _memo[digest] = payload["hals"]
+                return hals
+        except (OSError, ValueError, KeyError, TypeError):
+            pass
+
+    root = ET.fromstring(data)
+    hals = [h for h in (parse_hal_element(e, path) for e in root.iter("hal")) if h]
+    records = [h.to_json() for h in hals]
+    _memo[digest] = records
+
+    if cache_path:
+        try:
+            os.makedirs(cache_dir, exist_ok=True)
+            fd, tmp = tempfile.mkstemp(dir=cache_dir, suffix=".tmp")
+            with os.fdopen(fd, "w") as f:
+                json.dump({"schema": CACHE_SCHEMA, "hals": records}, f)
+            os.replace(tmp, cache_path)
+        except OSError:
+            pass
+    return hals
+
+
+def fragment_files(manifest_path: str) -> List[str]:
+    """Default fragment location: <dir>/manifest/*.xml next to <dir>/manifest.xml."""
+    base = os.path.splitext(manifest_path)[0]
+    if not os.path.isdir(base):
+        return []
+    return sorted(os.path.join(base, f) for f in os.listdir(base) if f.endswith(".xml"))
+
+
+class VintfIndex:
+    """Indexed set of HAL records from one or more VINTF files."""
+
+    def __init__(self, hals: Iterable[Hal] = ()):
+        self.hals: List[Hal] = []
+        self.by_name: Dict[str, List[Hal]] = {}
+        self.by_format: Dict[str, List[Hal]] = {}
+        self.by_interface: Dict[str, List[Hal]] = {}
+        self.by_instance: Dict[Tuple[str, str], List[Hal]] = {}
+        self.sources: List[str] = []
+        for hal in hals:
+            self.add(hal)
+
+    def add(self, hal: Hal):
+        self.hals.append(hal)
+        self.by_name.setdefault(hal.name, []).append(hal)
+        self.by_format.setdefault(hal.format, []).append(hal)
+        for iface, _ in hal.interfaces:
+            self.by_interface.setdefault(iface, []).append(hal)
+        for key in hal.instances():
+            self.by_instance.setdefault(key, []).append(hal)
+
+    def add_file(self, path: str):
+        hals = parse_file(path)
+        self.sources.append(path)
+        for hal in hals:
+            self.add(hal)
+
+    def names(self) -> List[str]:
+        return list(self.by_name)
+
+    def get(self, name: str) -> List[Hal]:
+        return self.by_name.get(name, [])
+
+    def versions(self, name: str) -> List[str]:
+        out = []
+        for hal in self.get(name):
+            out.extend(v for v in hal.versions if v not in out)
+        return out
+
+    def with_format(self, fmt: str) -> List[Hal]:
+        return self.by_format.get(fmt, [])
+
+    def providing(self, interface: str, instance: Optional[str] = None) -> List[Hal]:
+        if instance is None:
+            return self.by_interface.get(interface, [])
+        return self.by_instance.get((interface, instance), [])
+
+
+def load(paths: Iterable[str]) -> VintfIndex:
+    index = VintfIndex()
+    for p in paths:
+        index.add_file(p)
+    return index
+
+
+def load_manifest(manifest_path: str, fragment_dirs: Iterable[str] = None) -> VintfIndex:
+    """Main manifest plus fragments, merged in memory (nothing is rewritten).
+
+    A malformed main manifest raises ET.ParseError; a malformed fragment is
+    reported on stderr and skipped.
+    """
+    fragments = fragment_files(manifest_path)
+    for d in fragment_dirs or []:
+        if os.path.isdir(d):
+            fragments.extend(sorted(os.path.join(d, f) for f in os.listdir(d) if f.endswith(".xml")))
+    index = load([manifest_path])
+    for path in fragments:
+        try:
+            index.add_file(path)
+        except ET.ParseError as e:
+            print(f"WARNING: Skipping malformed manifest fragment {path}: {e}", file=sys.stderr)
+    return index
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Query VINTF manifests / matrices')
+    parser.add_argument('files', nargs='+', help='Manifest or matrix XML (first gets its fragments merged)')
+    parser.add_argument('--fragments', action='append', default=[], help='Extra fragment directory')
+    parser.add_argument('--name', help='Show HALs with this name')
+    parser.add_argument('--format', help='Show HALs with this format')
+    parser.add_argument('--interface', help='Show HALs providing this interface')
+    parser.add_argument('--instance', help='Restrict --interface to this instance')
+    args = parser.parse_args()
+
+    index = load_manifest(args.files[0], args.fragments)
+    for extra in args.files[1:]:
+        index.add_file(extra)
+
+    if args.name:
+        hals = index.get(args.name)
+    elif args.interface:
+        hals = index.providing(args.interface, args.instance)
+    elif args.format:
+        hals = index.with_format(args.format)
+    else:
+        hals = index.hals
+
+    for hal in hals:
+        ifaces = ", ".join(f"{i}/{inst}" for i, inst in hal.instances())
+        print(f"{hal.name} [{hal.format}] {','.join(hal.versions) or '-'} {ifaces}  ({hal.source})")
+    print(f"{len(hals)} of {len(index.hals)} HALs from {len(index.sources)} file(s)", file=sys.stderr)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,238 @@
+#!/usr/bin/env python3
+"""Batch (major, minor) version-interval algebra for VINTF HAL entries.
+
+Every <version> is a libvintf VersionRange: one major with a minor range.
+HIDL/native "1.0-3" is (1, 0, 3). AIDL versions are plain integers and use
+the sentinel major AIDL_MAJOR, so "2-4" is (AIDL_MAJOR, 2, 4). A manifest
+version is a point (major, minor).
+
+Satisfaction follows libvintf:
+  - HIDL/native: same major and minor >= the range's minimum minor
+    (minor versions extend each other).
+  - AIDL: lo <= version <= hi.
+
+All ranges and points of a matrix are parsed in one regex pass. They are
+packed into integer keys (owner, major, minor) in flat arrays and sorted
+once. Merging and widening is then a single linear sweep over both sorted
+streams, however many HAL entries the matrix has. Widening is minimal:
+  - HIDL: lower the first range of the major, or add a new range for a
+    major the matrix does not list.
+  - AIDL: extend the nearest range to an uncovered version, then merge
+    overlapping or adjacent ranges.
+"""
+import re
+import bisect
+from array import array
+from typing import Dict, Iterable, List, Sequence, Set, Tuple
+
+MINOR_BITS = 20
+MAJOR_BITS = 20
+AIDL_MAJOR = (1 << MAJOR_BITS) - 1
+DEFAULT_AIDL_VERSION = 1
+
+# "1", "1.0", "1-3", "1.0-3", "1.0-2.3"
+_VERSION_RE = re.compile(r"^[ \t]*(\d+)(?:\.(\d+))?(?:-(\d+)(?:\.(\d+))?)?[ \t]*$", re.M)
+
+Range = Tuple[int, int, int]  # (major, min minor, max minor)
+
+
+def _key(owner: int, major: int, minor: int) -> int:
+    return (((owner << MAJOR_BITS) | major) << MINOR_BITS) | minor
+
+
+def parse_batch(texts: Sequence[str], aidl: Sequence[bool]) -> Tuple[List[List[Range]], Set[int]]:
+    """Parses version strings in one regex pass.
+
+    Returns the ranges of each text (a text spanning majors, e.g. "1.0-2.3",
+    becomes one range per major) and the indices of texts that did not parse.
+    """
+    joined = "\n".join(t.replace("\n", " ") for t in texts)
+    starts = array('q', [0])
+    for t in texts[:-1]:
+        starts.append(starts[-1] + len(t) + 1)
+
+    out: List[List[Range]] = [[] for _ in texts]
+    bad = set(range(len(texts)))
+    for m in _VERSION_RE.finditer(joined):
+        i = bisect.bisect_right(starts, m.start()) - 1
+        a, b, c, d = m.groups()
+        bad.discard(i)
+        if aidl[i]:
+            lo = int(a)
+            hi = int(c) if c is not None else lo
+            out[i].append((AIDL_MAJOR, lo, hi))
+            continue
+        major, lo = int(a), int(b or 0)
+        if c is None:
+            out[i].append((major, lo, lo))
+        elif d is None:
+            # HIDL shorthand: "1.0-3" is minors 0..3 of major 1
+            out[i].append((major, lo, int(c)))
+        else:
+            last, hi = int(c), int(d)
+            if last == major:
+                out[i].append((major, lo, hi))
+            else:
+                out[i].append((major, lo, lo))
+                out[i].extend((k, 0, 0) for k in range(major + 1, last))
+                out[i].append((last, 0, hi))
+    return out, bad
+
+
+def format_range(r: Range) -> str:
+    major, lo, hi = r
+    if major == AIDL_MAJOR:
+        return str(lo) if lo == hi else f"{lo}-{hi}"
+    return f"{major}.{lo}" if lo == hi else f"{major}.{lo}-{hi}"
+
+
+def format_point(major: int, minor: int) -> str:
+    return str(minor) if major == AIDL_MAJOR else f"{major}.{minor}"
+
+
+class VersionIntervals:
+    """Version ranges and provided versions for many owners (HAL entries)."""
+
+    def __init__(self):
+        self.aidl: List[bool] = []
+        # Parallel range columns, and packed point keys
+        self.r_owner = array('q')
+        self.r_major = array('q')
+        self.r_lo = array('q')
+        self.r_hi = array('q')
+        self.points = array('q')
+        self.unparsed: Set[int] = set()
+        self.original: Dict[int, List[Range]] = {}
+
+    def add_owner(self, aidl: bool) -> int:
+        self.aidl.append(aidl)
+        return len(self.aidl) - 1
+
+    def add_ranges(self, owners: Sequence[int], texts: Sequence[str]):
+        """Required ranges (matrix <version> texts), one owner per text."""
+        parsed, bad = parse_batch(texts, [self.aidl[o] for o in owners])
+        for i in bad:
+            self.unparsed.add(owners[i])
+        for owner, ranges in zip(owners, parsed):
+            self.original.setdefault(owner, []).extend(ranges)
+            for major, lo, hi in ranges:
+                self.r_owner.append(owner)
+                self.r_major.append(major)
+                self.r_lo.append(lo)
+                self.r_hi.append(hi)
+
+    def add_points(self, owners: Sequence[int], texts: Sequence[str]):
+        """Provided versions (manifest <version> texts); ranges add both ends."""
+        parsed, _ = parse_batch(texts, [self.aidl[o] for o in owners])
+        for owner, ranges in zip(owners, parsed):
+            for major, lo, hi in ranges:
+                self.points.append(_key(owner, major, lo))
+                if hi != lo:
+                    self.points.append(_key(owner, major, hi))
+
+    def solve(self) -> Tuple[Dict[int, List[Range]], Set[int]]:
+        """Returns (merged ranges per owner, owners whose ranges were widened).
+
+        Owners with an unparsable <version> are left out of both.
+        """
+        mask = (1 << MINOR_BITS) - 1
+        n = len(self.r_owner)
+        keys = [_key(self.r_owner[i], self.r_major[i], self.r_lo[i]) for i in range(n)]
+        order = sorted(range(n), key=keys.__getitem__)
+        points = sorted(set(self.points))
+
+        result: Dict[int, List[Range]] = {}
+        widened: Set[int] = set()
+        # AIDL entries without <version> require the default version
+        for owner, is_aidl in enumerate(self.aidl):
+            if is_aidl and owner not in self.original and owner not in self.unparsed:
+                result[owner] = [(AIDL_MAJOR, DEFAULT_AIDL_VERSION, DEFAULT_AIDL_VERSION)]
+
+        # Sweep 1: merge overlapping / adjacent ranges per (owner, major)
+        for i in order:
+            owner, major, lo, hi = self.r_owner[i], self.r_major[i], self.r_lo[i], self.r_hi[i]
+            ranges = result.setdefault(owner, [])
+            if ranges and ranges[-1][0] == major and lo <= ranges[-1][2] + 1:
+                prev = ranges[-1]
+                ranges[-1] = (major, prev[1], max(prev[2], hi))
+            else:
+                ranges.append((major, lo, hi))
+
+        # Sweep 2: points against merged ranges, both sorted by (owner, major, minor)
+        p = 0
+        while p < len(points):
+            group = points[p] >> MINOR_BITS
+            owner, major = group >> MAJOR_BITS, group & ((1 << MAJOR_BITS) - 1)
+            minors = []
+            while p < len(points) and points[p] >> MINOR_BITS == group:
+                minors.append(points[p] & mask)
+                p += 1
+            if owner in self.unparsed:
+                continue
+            ranges = result.setdefault(owner, [])
+            if self._widen(ranges, major, minors):
+                widened.add(owner)
+
+        for owner in self.unparsed:
+            result.pop(owner, None)
+        return result, widened
+
+    @staticmethod
+    def _widen(ranges: List[Range], major: int, minors: List[int]) -> bool:
+        """Widens `ranges` (sorted, merged) in place to satisfy every minor."""
+        at = bisect.bisect_left(ranges, (major, -1, -1))
+        end = at
+        while end < len(ranges) and ranges[end][0] == major:
+            end += 1
+
+        if major != AIDL_MAJOR:
+            lowest = minors[0]
+            if at == end:
+                ranges.insert(at, (major, lowest, lowest))
+                return True
+            if lowest < ranges[at][1]:
+                ranges[at] = (major, lowest, ranges[at][2])
+                return True
+            return False
+
+        group = ranges[at:end]
+        changed = False
+        for v in minors:
+            k = bisect.bisect_right(group, (major, v, 1 << MINOR_BITS)) - 1
+            if k >= 0 and group[k][2] >= v:
+                continue
+            changed = True
+            if not group:
+                group.append((major, v, v))
+            elif k < 0:
+                group[0] = (major, v, group[0][2])
+            else:
+                # Above group[k]: extend whichever neighbour is closer
+                nxt = group[k + 1] if k + 1 < len(group) else None
+                if nxt is not None and nxt[1] - v < v - group[k][2]:
+                    group[k + 1] = (major, v, nxt[2])
+                else:
+                    group[k] = (major, group[k][1], v)
+            merged: List[Range] = []
+            for r in group:
+                if merged and r[1] <= merged[-1][2] + 1:
+                    merged[-1] = (major, merged[-1][1], max(merged[-1][2], r[2]))
+                else:
+                    merged.append(r)
+            group = merged
+        ranges[at:end] = group
+        return changed
+
+
+def provided_points(texts: Iterable[str], aidl: bool) -> List[str]:
+    """Normalized provided versions, for reports."""
+    texts = list(texts)
+    parsed, _ = parse_batch(texts, [aidl] * len(texts))
+    out = []
+    for ranges in parsed:
+        for major, lo, hi in ranges:
+            for minor in ((lo,) if lo == hi else (lo, hi)):
+                s = format_point(major, minor)
+                if s not in out:
+                    out.append(s)
+    return out
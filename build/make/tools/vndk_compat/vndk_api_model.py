@@ -6,6 +6,8 @@ import argparse
 import subprocess
 from typing import Dict, List, Set
 
+from elf_discovery import discover_libraries
+
 def run_readelf(file_path: str, args: List[str]) -> str:
     try:
         return subprocess.check_output(['readelf'] + args + [file_path], stderr=subprocess.DEVNULL).decode()
@@ -38,20 +40,20 @@ def generate_model(api_level: int, scan_dir: str) -> Dict:
         "libraries": []
     }
     
-    for root, _, files in os.walk(scan_dir):
-        for f in files:
-            if f.endswith('.so'):
-                full_path = os.path.join(root, f)
-                lib_name = os.path.basename(f)
-                
-                # Basic metadata
-                lib_info = {
-                    "name": lib_name,
-                    "stability": "stable" if "vndk" in root else "unstable",
-                    "owner": "platform", # Default, can be refined with APEX info
-                    "symbols": extract_symbols(full_path)
-                }
-                model["libraries"].append(lib_info)
+    for lib in discover_libraries(scan_dir):
+        names = lib.names
+
+        # Basic metadata
+        lib_info = {
+            "name": names[0],
+            "stability": "stable" if "vndk" in os.path.dirname(lib.path) else "unstable",
+            "owner": "platform", # Default, can be refined with APEX info
+            "symbols": extract_symbols(lib.path)
+        }
+        if len(names) > 1:
+            # Other file names (symlinks, versioned names, copies) of the same library
+            lib_info["aliases"] = names[1:]
+        model["libraries"].append(lib_info)
                 
     return model
 
@@ -4,7 +4,12 @@ import sys
 import json
 import argparse
 import subprocess
-from typing import Dict, List, Set
+from typing import Dict, List, Optional, Set, Tuple
+
+from elf_discovery import discover_libraries
+from plan_io import write_plan
+from plan_table import PlanTable
+from symbol_suggest import SymbolIndex, draft_policy, save_draft
 
 class VndkPolicy:
     def __init__(self, data: Dict):
@@ -21,38 +26,115 @@ def run_readelf(file_path: str, args: List[str]) -> str:
     except Exception:
         return ""
 
-def get_elf_symbols(file_path: str, defined: bool = True) -> Set[str]:
-    """Extracts defined or undefined symbols from an ELF file."""
-    symbols = set()
-    output = run_readelf(file_path, ['-W', '-s'])
+class ElfDynInfo:
+    """Dynamic symbols (with GNU versions) and DT_NEEDED of one library."""
+    __slots__ = ('needed', 'exports', 'imports')
+
+    def __init__(self):
+        self.needed = []
+        # (name, version or None); version None == unversioned
+        self.exports = []
+        self.imports = []
+
+def _split_version(sym: str) -> Tuple[str, Optional[str], bool]:
+    """'foo@@V1' -> (foo, V1, default), 'foo@V1' -> (foo, V1, hidden), 'foo' -> (foo, None, True)."""
+    if '@@' in sym:
+        name, ver = sym.split('@@', 1)
+        return name, ver, True
+    if '@' in sym:
+        name, ver = sym.split('@', 1)
+        return name, ver, False
+    return sym, None, True
+
+def get_elf_dyn_info(file_path: str) -> ElfDynInfo:
+    """Reads DT_NEEDED plus versioned .dynsym imports/exports in one readelf call."""
+    info = ElfDynInfo()
+    output = run_readelf(file_path, ['-W', '-d', '--dyn-syms'])
     for line in output.splitlines():
-        # Simple parser for readelf -s output
+        if '(NEEDED)' in line and '[' in line:
+            info.needed.append(line.split('[')[1].split(']')[0])
+            continue
         parts = line.split()
-        if len(parts) < 8:
+        if len(parts) < 8 or not parts[0].endswith(':'):
+            continue
+
+        sym_type, bind, ndx = parts[3], parts[4], parts[6]
+        if bind not in ('GLOBAL', 'WEAK'):
             continue
-        
-        bind = parts[4]
-        ndx = parts[6]
-        name = parts[7]
-        
-        if defined:
-            if bind in ['GLOBAL', 'WEAK'] and ndx != 'UND':
-                symbols.add(name)
-        else:
-            if ndx == 'UND':
-                symbols.add(name)
-    return symbols
+        name, ver, is_default = _split_version(parts[7])
+
+        if ndx == 'UND':
+            # Weak references may legitimately stay unresolved
+            if bind == 'GLOBAL':
+                info.imports.append((name, ver))
+        elif not (ndx == 'ABS' and sym_type == 'OBJECT' and name == ver):
+            # (ABS version-definition markers are not real exports)
+            info.exports.append((name, ver))
+            if is_default:
+                # Unversioned references bind to the default version
+                info.exports.append((name, None))
+    return info
+
+class ExportIndex:
+    """(symbol, version) -> bitset of providing library ids.
+
+    Library ids are positions in `libs`; a bitset is a plain int, so lookups
+    stay O(1) and intersecting with a scope mask is a single AND.
+    """
+
+    def __init__(self):
+        self.libs: List[str] = []
+        self.lib_ids: Dict[str, int] = {}
+        self.providers: Dict[Tuple[str, Optional[str]], int] = {}
+
+    def add_library(self, names: List[str], exports: List[Tuple[str, Optional[str]]]) -> int:
+        lib_id = len(self.libs)
+        self.libs.append(names[0])
+        for n in names:
+            self.lib_ids.setdefault(n, lib_id)
+        bit = 1 << lib_id
+        providers = self.providers
+        for key in exports:
+            providers[key] = providers.get(key, 0) | bit
+        return lib_id
+
+    def mask_of(self, lib_names: Set[str]) -> int:
+        mask = 0
+        for n in lib_names:
+            lib_id = self.lib_ids.get(n)
+            if lib_id is not None:
+                mask |= 1 << lib_id
+        return mask
+
+    def resolves(self, symbol: Tuple[str, Optional[str]], scope: int) -> bool:
+        return bool(self.providers.get(symbol, 0) & scope)
+
+    def names_in(self, mask: int) -> List[str]:
+        out, i = [], 0
+        while mask:
+            if mask & 1:
+                out.append(self.libs[i])
+            mask >>= 1
+            i += 1
+        return out
 
 class VndkCompatEngine:
-    def __init__(self, vendor_api: int, system_api: int, policy_dir: str):
+    def __init__(self, vendor_api: int, system_api: int, policy_dir: str,
+                 system_visible: Optional[Set[str]] = None, suggest: bool = False):
         self.vendor_api = vendor_api
         self.system_api = system_api
         self.policy = self._load_policy(policy_dir)
+        # System libraries exported across the vendor namespace boundary
+        # (e.g. LLNDK/VNDK list). None means every system library is visible.
+        self.system_visible = system_visible
+        # Similarity index over system exports, filled by analyze() on request
+        self.suggest_index: Optional[SymbolIndex] = SymbolIndex() if suggest else None
+        self.uncovered: List[Tuple[str, str]] = []
         self.plan = {
             "version": "1.0",
             "vendor_api_level": vendor_api,
             "system_api_level": system_api,
-            "actions": []
+            "actions": PlanTable()
         }
 
     def _load_policy(self, policy_dir: str) -> VndkPolicy:
@@ -64,49 +146,111 @@ class VndkCompatEngine:
             return VndkPolicy(json.load(f))
 
     def analyze(self, vendor_path: str, system_path: str):
-        """Analyzes dependencies and matches against policy."""
-        # 1. Build System Symbol Map
-        system_provided = set()
-        for root, _, files in os.walk(system_path):
-            for f in files:
-                if f.endswith('.so'):
-                    system_provided.update(get_elf_symbols(os.path.join(root, f), defined=True))
-
-        # 2. Analyze Vendor Libraries
-        for root, _, files in os.walk(vendor_path):
-            for f in files:
-                if f.endswith('.so'):
-                    vendor_lib = os.path.join(root, f)
-                    lib_name = os.path.basename(f)
-                    undefined = get_elf_symbols(vendor_lib, defined=False)
-                    
-                    unresolved = undefined - system_provided
-                    if unresolved:
-                        self._process_unresolved(lib_name, unresolved)
-
-    def _process_unresolved(self, lib_name: str, symbols: Set[str]):
-        """Matches unresolved symbols against policy rules."""
-        rules = self.policy.get_rules_for_lib(lib_name)
-        
-        for sym in symbols:
+        """Analyzes dependencies and matches against policy.
+
+        Each undefined (symbol, version) of a vendor library must be exported
+        by a library inside that library's DT_NEEDED closure; a definition in
+        an unrelated library does not count.
+        """
+        index = ExportIndex()
+        needed: Dict[str, List[str]] = {}
+        system_names: Set[str] = set()
+
+        # 1. Build the export index over system and vendor libraries
+        for lib in discover_libraries(system_path):
+            info = get_elf_dyn_info(lib.path)
+            index.add_library(lib.names, info.exports)
+            for n in lib.names:
+                needed.setdefault(n, info.needed)
+                system_names.add(n)
+            if self.suggest_index is not None:
+                for sym in set(name for name, _ in info.exports):
+                    self.suggest_index.add(sym, lib.name)
+
+        vendor_libs = []
+        for lib in discover_libraries(vendor_path):
+            info = get_elf_dyn_info(lib.path)
+            index.add_library(lib.names, info.exports)
+            for n in lib.names:
+                # Vendor copies shadow same-named system libs in the vendor namespace
+                needed[n] = info.needed
+                system_names.discard(n)
+            vendor_libs.append((lib, info))
+
+        # 2. Resolve each vendor library's imports within its own scope
+        for lib, info in vendor_libs:
+            scope = index.mask_of(self._closure(info.needed, needed, system_names))
+
+            unresolved = set()
+            for sym in info.imports:
+                if not index.resolves(sym, scope):
+                    unresolved.add(sym)
+            if unresolved:
+                self._process_unresolved(lib.names, unresolved)
+
+    def _closure(self, roots: List[str], needed: Dict[str, List[str]],
+                 system_names: Set[str]) -> Set[str]:
+        seen: Set[str] = set()
+        todo = list(roots)
+        while todo:
+            name = todo.pop()
+            if name in seen:
+                continue
+            if (self.system_visible is not None and name in system_names
+                    and name not in self.system_visible):
+                continue  # not reachable across the namespace boundary
+            seen.add(name)
+            todo.extend(needed.get(name, ()))
+        return seen
+
+    def _process_unresolved(self, lib_names: List[str], symbols: Set[Tuple[str, Optional[str]]]):
+        """Matches unresolved symbols against policy rules.
+
+        Rules are keyed by name, so each symbol is checked against every alias;
+        the action (or warning) is emitted once, under the alias whose rule
+        matched, or under the primary name (lib_names[0]) if none did.
+        """
+        rules = [(name, self.policy.get_rules_for_lib(name)) for name in lib_names]
+
+        for sym, ver in sorted(symbols, key=lambda s: (s[0], s[1] or '')):
             matched = False
-            for rule in rules:
-                if sym in rule.get('symbols', []):
-                    self.plan['actions'].append({
-                        "type": rule['action'],
-                        "target_lib": lib_name,
-                        "symbol": sym,
-                        "remap": rule.get('remap', {}).get(sym)
-                    })
-                    matched = True
+            for lib_name, lib_rules in rules:
+                for rule in lib_rules:
+                    if sym in rule.get('symbols', []):
+                        action = {
+                            "type": rule['action'],
+                            "target_lib": lib_name,
+                            "symbol": sym,
+                            "remap": rule.get('remap', {}).get(sym)
+                        }
+                        if ver:
+                            action["version"] = ver
+                        forward = rule.get('forward', {}).get(sym)
+                        if forward:
+                            action["forward"] = forward
+                        self.plan['actions'].append(action)
+                        matched = True
+                        break
+                if matched:
                     break
-            
+
             if not matched:
-                print(f"Build Warning: Unresolved symbol '{sym}' in '{lib_name}' not covered by policy.")
+                label = f"{sym}@{ver}" if ver else sym
+                print(f"Build Warning: Unresolved symbol '{label}' in '{lib_names[0]}' not covered by policy.")
+                self.uncovered.append((lib_names[0], sym))
+
+    def suggest_rules(self) -> Dict:
+        """Draft policy rules for unresolved symbols no rule covers (needs suggest=True)."""
+        return draft_policy(self.suggest_index, self.uncovered, self.vendor_api)
 
     def save_plan(self, output_path: str):
-        with open(output_path, 'w') as f:
-            json.dump(self.plan, f, indent=2)
+        # JSON unless output_path ends in .vcplan
+        header = {k: v for k, v in self.plan.items() if k != 'actions'}
+        write_plan(output_path, self.plan['actions'], header)
+
+def load_lib_list(path: str) -> Set[str]:
+    with open(path, 'r') as f:
+        return set(line.strip() for line in f if line.strip() and not line.startswith('#'))
 
 def main():
     parser = argparse.ArgumentParser(description='VNDK Compatibility Engine')
@@ -115,13 +259,19 @@ def main():
     parser.add_argument('--vendor-dir', required=True)
     parser.add_argument('--system-dir', required=True)
     parser.add_argument('--policy-dir', required=True)
+    parser.add_argument('--system-visible', help='File listing system libs visible to vendor (LLNDK/VNDK)')
     parser.add_argument('--output', required=True)
+    parser.add_argument('--suggest-rules', help='Write draft policy rules for uncovered symbols here')
 
     args = parser.parse_args()
 
-    engine = VndkCompatEngine(args.vendor_api, args.system_api, args.policy_dir)
+    visible = load_lib_list(args.system_visible) if args.system_visible else None
+    engine = VndkCompatEngine(args.vendor_api, args.system_api, args.policy_dir, visible,
+                              suggest=bool(args.suggest_rules))
     engine.analyze(args.vendor_dir, args.system_dir)
     engine.save_plan(args.output)
+    if args.suggest_rules:
+        save_draft(engine.suggest_rules(), args.suggest_rules)
 
 if __name__ == '__main__':
     main()
@@ -3,15 +3,24 @@ import json
 import argparse
 import sys
 import os
-from typing import Dict, List, Set
+from typing import Dict, List, Optional, Set
+
+from plan_io import write_plan
+from plan_table import PlanTable
+from symbol_suggest import SymbolIndex, draft_policy, save_draft
 
 class VndkDiffEngine:
-    def __init__(self, system_model: Dict, vendor_footprint: Dict, policy: Dict):
+    def __init__(self, system_model: Dict, vendor_footprint: Dict, policy: Dict,
+                 suggest: bool = False):
         self.system_model = system_model
         self.vendor_footprint = vendor_footprint
         self.policy = policy
+        # Similarity index over the system model, only built when asked for
+        self.suggest_index: Optional[SymbolIndex] = SymbolIndex.from_model(system_model) if suggest else None
+        self.uncovered = []
+        # Actions are interned into columns; huge plans repeat the same keys and libraries
         self.plan = {
-            "actions": [],
+            "actions": PlanTable(),
             "metrics": {
                 "matches": 0,
                 "missing": 0,
@@ -23,7 +32,9 @@ class VndkDiffEngine:
     def _get_system_symbols(self) -> Dict[str, Set[str]]:
         res = {}
         for lib in self.system_model.get('libraries', []):
-            res[lib['name']] = set(s['name'] for s in lib.get('symbols', []))
+            syms = set(s['name'] for s in lib.get('symbols', []))
+            for name in [lib['name']] + lib.get('aliases', []):
+                res[name] = syms
         return res
 
     def compute_diff(self):
@@ -52,6 +63,8 @@ class VndkDiffEngine:
                 self.plan['metrics']['abi_breaks'] += len(missing_syms)
                 for sym in missing_syms:
                     action = self._resolve_via_policy(lib_name, sym)
+                    if action['action'] == 'NONE':
+                        self.uncovered.append((lib_name, sym))
                     self.plan['actions'].append({
                         "type": "ABI_BREAK",
                         "target": lib_name,
@@ -63,15 +76,24 @@ class VndkDiffEngine:
         # Check policy for shim/stub rules
         for rule in self.policy.get('rules', []):
             if rule.get('target') == lib_name and symbol in rule.get('symbols', []):
-                return {
+                resolution = {
                     "action": rule['action'],
                     "remap": rule.get('remap', {}).get(symbol)
                 }
+                forward = rule.get('forward', {}).get(symbol)
+                if forward:
+                    resolution["forward"] = forward
+                return resolution
         return {"action": "NONE", "fallback": "snapshot"}
 
+    def suggest_rules(self) -> Dict:
+        """Draft policy rules for ABI breaks no rule covers (needs suggest=True)."""
+        return draft_policy(self.suggest_index, sorted(self.uncovered), self.policy.get('api_level'))
+
     def save_plan(self, output_path: str):
-        with open(output_path, 'w') as f:
-            json.dump(self.plan, f, indent=2)
+        # JSON unless output_path ends in .vcplan
+        header = {k: v for k, v in self.plan.items() if k != 'actions'}
+        write_plan(output_path, self.plan['actions'], header)
 
 def main():
     parser = argparse.ArgumentParser(description='Advanced VNDK Diff Engine')
@@ -79,6 +101,7 @@ def main():
     parser.add_argument('--vendor-footprint', required=True)
     parser.add_argument('--policy', required=True)
     parser.add_argument('--output', required=True)
+    parser.add_argument('--suggest-rules', help='Write draft policy rules for uncovered ABI breaks here')
 
     args = parser.parse_args()
 
@@ -86,9 +109,11 @@ def main():
     with open(args.vendor_footprint, 'r') as f: v_footprint = json.load(f)
     with open(args.policy, 'r') as f: policy = json.load(f)
 
-    engine = VndkDiffEngine(sys_model, v_footprint, policy)
+    engine = VndkDiffEngine(sys_model, v_footprint, policy, suggest=bool(args.suggest_rules))
     engine.compute_diff()
     engine.save_plan(args.output)
+    if args.suggest_rules:
+        save_draft(engine.suggest_rules(), args.suggest_rules)
 
 if __name__ == '__main__':
     main()
@@ -1,6 +1,10 @@
 #!/bin/bash
 # apply_patches.sh
 # Applies patches from the patches directory to the AOSP source tree.
+#
+# With python3 available, projects are patched in parallel (in order
+# within each project) by tools/patch_engine/patch_series.py.
+# Set PATCHES_SHELL=1 to force the serial loop below.
 
 ROOT_DIR=$1
 PATCHES_DIR=$2
@@ -10,6 +14,11 @@ if [ -z "$ROOT_DIR" ] || [ -z "$PATCHES_DIR" ]; then
     exit 1
 fi
 
+ENGINE="$(cd "$(dirname "${BASH_SOURCE[0]}")/.." && pwd)/tools/patch_engine/patch_series.py"
+if [ -z "${PATCHES_SHELL:-}" ] && command -v python3 >/dev/null 2>&1 && [ -f "$ENGINE" ]; then
+    exec python3 "$ENGINE" apply "$ROOT_DIR" "$PATCHES_DIR"
+fi
+
 echo "Applying patches from $PATCHES_DIR to $ROOT_DIR"
 
 # Navigate to AOSP root
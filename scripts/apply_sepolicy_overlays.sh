@@ -18,6 +18,9 @@ set -euo pipefail
 #   permissive  — No policy overlay, just flag for permissive
 #   debug       — Same as permissive + AVC logging enabled
 #
+#   VNDK_COMPAT_INSTRUMENT=1 also installs shim_counters.te (and its
+#   file_contexts) in minimal/hal mode, for instrumented compat shims.
+#
 # Safety:
 #   - Never modifies original AOSP sepolicy files
 #   - Adds overlay files to a dedicated directory
@@ -107,6 +110,13 @@ case "$MODE" in
         ;;
 esac
 
+# Instrumented compat shims need their counter directory labelled
+if [ "${VNDK_COMPAT_INSTRUMENT:-0}" = "1" ] && { [ "$MODE" = "minimal" ] || [ "$MODE" = "hal" ]; }; then
+    echo "Adding shim counter overlay (VNDK_COMPAT_INSTRUMENT=1)..."
+    cp -v "$OVERLAY_SRC/shim_counters.te" "$OVERLAY_DST/"
+    cp -v "$OVERLAY_SRC/shim_counters.file_contexts" "$OVERLAY_DST/file_contexts"
+fi
+
 # Validate .te file syntax (basic check)
 echo ""
 echo "Validating overlay syntax..."
@@ -13,6 +13,12 @@ set -euo pipefail
 #   bash scripts/parse_avc_denials.sh              # from live device
 #   bash scripts/parse_avc_denials.sh <logfile>    # from saved log
 #
+#   With python3, denials already granted by sepolicy/ are dropped
+#   and rules are grouped by owning overlay (tools/sepolicy_index).
+#   AVC_DIFF=<file> also writes a patch, AVC_JSON=<file> a report;
+#   AVC_SHELL=1 forces the plain shell parser. With AOSP_ROOT (or
+#   ANDROID_BUILD_TOP) set, system/sepolicy is indexed too.
+#
 # Output:
 #   Suggested allow rules printed to stdout.
 #   Does NOT apply any changes.
@@ -72,6 +78,39 @@ if [ "$TOTAL_DENIALS" -eq 0 ]; then
     exit 0
 fi
 
+# Indexed path: drop denials the overlays already grant and assign the
+# remaining rules to their owning overlay (set AVC_SHELL=1 to skip)
+ENGINE="$(cd "$(dirname "${BASH_SOURCE[0]}")/.." && pwd)/tools/sepolicy_index/te_index.py"
+if [ "${AVC_SHELL:-0}" != "1" ] && command -v python3 &>/dev/null && [ -f "$ENGINE" ]; then
+    echo ""
+    echo -e "${BOLD}=== Suggested Allow Rules (not yet granted by sepolicy/) ===${NC}"
+    echo ""
+    # AOSP policy resolves the attributes the overlays use (domain,
+    # coredomain, hal_*_server, ...) but do not declare
+    TE_ARGS=()
+    AOSP_SEPOLICY="${AOSP_ROOT:-${ANDROID_BUILD_TOP:-}}/system/sepolicy"
+    for d in public private vendor; do
+        if [ -d "$AOSP_SEPOLICY/$d" ]; then
+            TE_ARGS+=(--te "$AOSP_SEPOLICY/$d")
+        fi
+    done
+    RC=0
+    python3 "$ENGINE" --avc "$TMPFILE" "${TE_ARGS[@]+"${TE_ARGS[@]}"}" \
+        ${AVC_JSON:+--json "$AVC_JSON"} ${AVC_DIFF:+--diff "$AVC_DIFF"} || RC=$?
+    if [ "$RC" -gt 1 ]; then
+        exit "$RC"
+    fi
+    echo ""
+    if [ "$RC" -eq 0 ]; then
+        echo -e "${GREEN}All denials are already covered by the project overlays.${NC}"
+    else
+        echo -e "${YELLOW}⚠  These rules are SUGGESTIONS only.${NC}"
+        echo "  Add them to the overlay named above each group after review."
+        [ -n "${AVC_DIFF:-}" ] && echo "  Patch written to: $AVC_DIFF"
+    fi
+    exit 0
+fi
+
 # ============================================================
 # 2. Parse and deduplicate
 # ============================================================
@@ -10,6 +10,12 @@
 # Performs a dry-run (--check) of every .patch file to detect
 # stale or broken patches before committing to a full build.
 #
+# When python3 is available, validation runs through
+# tools/patch_engine/patch_series.py: projects in parallel,
+# patches stacked in order on a private index (later patches are
+# checked against earlier ones), results cached by project HEAD.
+# Set PATCHES_SHELL=1 to force the serial checks below.
+#
 # Exit codes:
 #   0 = all patches apply cleanly
 #   1 = one or more patches failed
@@ -35,6 +41,11 @@ if [ ! -d "$PATCHES_DIR" ]; then
     exit 1
 fi
 
+ENGINE="$(cd "$(dirname "${BASH_SOURCE[0]}")/.." && pwd)/tools/patch_engine/patch_series.py"
+if [ -z "${PATCHES_SHELL:-}" ] && command -v python3 >/dev/null 2>&1 && [ -f "$ENGINE" ]; then
+    exec python3 "$ENGINE" validate "$ROOT_DIR" "$PATCHES_DIR"
+fi
+
 echo "=== Patch Validation (dry-run) ==="
 echo "AOSP Root  : $ROOT_DIR"
 echo "Patches Dir: $PATCHES_DIR"
@@ -14,6 +14,11 @@
 # If DEVICE_TREE_ROOT is not specified, auto-detects from
 # device/phh/treble/ relative to CWD.
 #
+# When python3 is available, the checks run through the
+# single-pass scanner in tools/tree_scanner/ (one walk, one
+# read per file, file/line locations). Set AIDL_ONLY_SHELL=1
+# to force the grep-based checks below.
+#
 # Exit codes:
 #   0 = all checks pass (AIDL-only compliant)
 #   1 = one or more HIDL references found
@@ -36,6 +41,11 @@ if [ -z "$DEVICE_TREE" ]; then
     fi
 fi
 
+SCANNER="$(cd "$(dirname "${BASH_SOURCE[0]}")/.." && pwd)/tools/tree_scanner/scan_device_tree.py"
+if [ -z "${AIDL_ONLY_SHELL:-}" ] && command -v python3 >/dev/null 2>&1 && [ -f "$SCANNER" ]; then
+    exec python3 "$SCANNER" "$DEVICE_TREE"
+fi
+
 echo "=== AIDL-Only Compliance Verification ==="
 echo "Device tree: $DEVICE_TREE"
 echo ""
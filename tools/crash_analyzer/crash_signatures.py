@@ -0,0 +1,661 @@
+#!/usr/bin/env python3
+"""
+Streaming Crash Signature Aggregator for Vendor15 Survival Architecture.
+
+Reads logcat dumps, tombstones and ANR traces in one pass and folds every
+crash into a stable signature: crash kind, process, signal / exception and
+the top frames of the crashing thread with addresses, offsets, BuildIds,
+line numbers and abort boilerplate (abort, __android_log_assert,
+LogMessage::~LogMessage, ...) stripped. A crash loop that logs thousands of
+identical tombstones becomes one signature with a count.
+
+Counting uses the Space-Saving algorithm: at most --max-signatures
+signatures (and --max-libraries library counters) are tracked, so memory
+stays bounded on multi-gigabyte soak logs. Each reported count carries its
+maximum overestimate ("error"), which is 0 unless the table overflowed.
+
+Each signature is correlated with the HAL, compat shim and vendor libraries
+in its frames (mapper *-impl-shim libraries, vndk_compat shims, /hw/ HALs,
+/vendor and /odm code), and the first such frame is reported as "culprit".
+
+Recognized inputs (auto-detected, may be mixed and gzip-compressed):
+  logcat (threadtime / brief)  DEBUG tombstones, libc "Fatal signal",
+                               AndroidRuntime FATAL EXCEPTION, ActivityManager ANR
+  tombstone files              /data/tombstones/tombstone_NN
+  ANR traces                   /data/anr/traces.txt, anr_* (first process block)
+
+Usage:
+    adb logcat -d -b all | python3 crash_signatures.py - --json crashes.json
+    python3 crash_signatures.py soak_logcat.txt.gz tombstones/ anr/ \\
+        --json crashes.json --top 20
+
+Exit codes:
+    0 = no crashes found
+    1 = one or more crash signatures
+"""
+
+import argparse
+import gzip
+import hashlib
+import json
+import os
+import re
+import sys
+from collections import OrderedDict
+from dataclasses import dataclass, field
+from typing import Dict, Iterator, List, Optional, TextIO
+
+
+# ============================================================
+# Normalization rules
+# ============================================================
+
+# Frames that only describe how the process died, not where
+ABORT_FRAMES = re.compile(
+    r"^(?:libc\.so!(?:abort|raise|__libc_fatal|__fortify_fatal|pthread_kill|tgkill|"
+    r"__stack_chk_fail|async_safe_fatal\w*)|"
+    r"liblog\.so!__android_log_(?:assert|call_aborter|default_aborter)|"
+    r"libbase\.so!android::base::(?:LogMessage::~LogMessage|DefaultAborter)\w*|"
+    r"libutils\.so!android::CallStack\w*)"
+)
+
+# Library roles for correlation, checked in order
+SHIM_LIB_RE = re.compile(r"(?:-impl-shim\.so|vndk_compat|_shim\.so|-shim\.so)")
+HAL_LIB_RE = re.compile(r"(?:^|/)hw/|^android\.hardware\.|^vendor\.[\w.]+@|^mapper\.")
+VENDOR_PATH_RE = re.compile(r"^/(?:vendor|odm)/")
+
+DEFAULT_TOP_FRAMES = 5
+DEFAULT_MAX_SIGNATURES = 1000
+DEFAULT_MAX_LIBRARIES = 500
+# Fatal signals waiting for their DEBUG tombstone block
+MAX_PENDING_SIGNALS = 256
+
+LOGCAT_THREADTIME_RE = re.compile(
+    r"^(\d\d-\d\d\s+\d\d:\d\d:\d\d\.\d+)\s+(\d+)\s+(\d+)\s+([VDIWEFS])\s+(.*?)\s*: ?(.*)$"
+)
+LOGCAT_BRIEF_RE = re.compile(r"^([VDIWEFS])/(.*?)\s*\(\s*(\d+)\): ?(.*)$")
+
+TOMBSTONE_BANNER = "*** *** *** *** *** *** *** *** *** *** *** *** *** *** *** ***"
+PID_LINE_RE = re.compile(r"^pid: (\d+), tid: (\d+), name: (.*?)\s+>>> (.*?) <<<")
+SIGNAL_LINE_RE = re.compile(r"^signal \d+ \((\w+)\)(?:, code -?\d+ \((\w+)\))?")
+ABORT_LINE_RE = re.compile(r"^Abort message: '(.*)'")
+NATIVE_FRAME_RE = re.compile(
+    r"^\s*(?:native: )?#\d+ pc ([0-9a-f]+)\s+(\S+)(?:\s+\(offset 0x[0-9a-f]+\))?(?:\s+\((?!BuildId:)(.+?)\))?(?:\s+\(BuildId:.*)?$"
+)
+FATAL_SIGNAL_RE = re.compile(r"^Fatal signal \d+ \((\w+)\).*?pid (\d+) \((.*?)\)")
+
+JAVA_FRAME_RE = re.compile(r"^\s*at ([\w$.<>/]+)\(")
+JAVA_EXCEPTION_RE = re.compile(r"^([\w$.]+(?:Exception|Error|Throwable)\w*)(?::|$)")
+CAUSED_BY_RE = re.compile(r"^Caused by: ([\w$.]+)")
+JAVA_PROCESS_RE = re.compile(r"^Process: ([^,\s]+)")
+
+ANR_IN_RE = re.compile(r"^ANR in (\S+)")
+ANR_REASON_RE = re.compile(r"^Reason: (.*)")
+TRACES_START_RE = re.compile(r"^----- pid (\d+) at .* -----$")
+TRACES_END_RE = re.compile(r"^----- end (\d+) -----$")
+TRACES_CMDLINE_RE = re.compile(r"^Cmd line: (\S+)")
+TRACES_THREAD_RE = re.compile(r'^"(.*?)" .*?(?:tid=\d+|sysTid=\d+)\s*(\w*)')
+
+
+def normalize_native_frame(pc: str, path: str, func: Optional[str]) -> str:
+    lib = os.path.basename(path)
+    if func:
+        func = re.sub(r"\+\d+$", "", func)
+        return f"{lib}!{func}"
+    # Unsymbolized: the pc is relative to the mapping, so stable per build
+    return f"{lib}@0x{int(pc, 16):x}"
+
+
+def normalize_java_frame(method: str) -> str:
+    # Lambdas and anonymous classes get compiler-assigned numbers
+    return re.sub(r"\$(?:\d+|lambda\$\w+\$\d+)", "$", method)
+
+
+def normalize_reason(text: str) -> str:
+    text = re.sub(r"0x[0-9a-fA-F]+|\d+", "N", text)
+    return re.sub(r"\s*\(.*\)$", "", text).strip()
+
+
+# ============================================================
+# Events
+# ============================================================
+
+@dataclass
+class CrashEvent:
+    kind: str                       # native | java | anr | signal
+    process: str = ""
+    reason: str = ""                # signal, exception class or ANR reason
+    frames: List[str] = field(default_factory=list)
+    paths: List[str] = field(default_factory=list)
+    detail: str = ""                # abort message / exception text
+    timestamp: str = ""
+    pid: str = ""
+
+    def top_frames(self, n: int) -> List[str]:
+        frames = self.frames
+        i = 0
+        while i < len(frames) - 1 and ABORT_FRAMES.match(frames[i]):
+            i += 1
+        return frames[i:i + n]
+
+    def signature(self, n: int) -> str:
+        key = "|".join([self.kind, self.process, self.reason] + self.top_frames(n))
+        return hashlib.sha1(key.encode()).hexdigest()[:16]
+
+
+def library_role(path: str) -> Optional[str]:
+    name = os.path.basename(path)
+    if SHIM_LIB_RE.search(name):
+        return "shim"
+    if HAL_LIB_RE.search(path) or HAL_LIB_RE.search(name):
+        return "hal"
+    if VENDOR_PATH_RE.match(path):
+        return "vendor"
+    return None
+
+
+# ============================================================
+# Bounded counters
+# ============================================================
+
+class SpaceSaving:
+    """Top-k counter with bounded memory (Metwally et al.).
+
+    When full, a new key replaces the current minimum and inherits its
+    count; `error[key]` records that possible overestimate.
+    """
+
+    def __init__(self, capacity: int):
+        self.capacity = capacity
+        self.counts: Dict[str, int] = {}
+        self.error: Dict[str, int] = {}
+        self.evicted = 0
+
+    def add(self, key: str, n: int = 1) -> Optional[str]:
+        """Counts `key`; returns the evicted key, if any."""
+        if key in self.counts:
+            self.counts[key] += n
+            return None
+        victim = None
+        base = 0
+        if len(self.counts) >= self.capacity:
+            victim = min(self.counts, key=self.counts.__getitem__)
+            base = self.counts.pop(victim)
+            self.error.pop(victim, None)
+            self.evicted += 1
+        self.counts[key] = base + n
+        self.error[key] = base
+        return victim
+
+    def ranked(self) -> List[str]:
+        return sorted(self.counts, key=lambda k: (-self.counts[k], k))
+
+
+@dataclass
+class SignatureInfo:
+    kind: str
+    process: str
+    reason: str
+    top_frames: List[str]
+    detail: str
+    libraries: List[Dict[str, str]]
+    culprit: Optional[str]
+    first_seen: str
+    last_seen: str
+    pids: int = 1
+    last_pid: str = ""
+
+
+class CrashAggregator:
+    def __init__(self, top_frames: int = DEFAULT_TOP_FRAMES,
+                 max_signatures: int = DEFAULT_MAX_SIGNATURES,
+                 max_libraries: int = DEFAULT_MAX_LIBRARIES):
+        self.top_n = top_frames
+        self.signatures = SpaceSaving(max_signatures)
+        self.info: Dict[str, SignatureInfo] = {}
+        self.libraries = SpaceSaving(max_libraries)
+        self.library_roles: Dict[str, str] = {}
+        self.by_kind: Dict[str, int] = {}
+        self.events = 0
+
+    def add(self, event: CrashEvent):
+        self.events += 1
+        self.by_kind[event.kind] = self.by_kind.get(event.kind, 0) + 1
+        sig = event.signature(self.top_n)
+
+        victim = self.signatures.add(sig)
+        if victim is not None:
+            self.info.pop(victim, None)
+
+        info = self.info.get(sig)
+        if info is None:
+            libs, culprit = self._correlate(event)
+            self.info[sig] = SignatureInfo(
+                kind=event.kind, process=event.process, reason=event.reason,
+                top_frames=event.top_frames(self.top_n), detail=event.detail[:300],
+                libraries=libs, culprit=culprit,
+                first_seen=event.timestamp, last_seen=event.timestamp,
+                last_pid=event.pid,
+            )
+        else:
+            info.last_seen = event.timestamp or info.last_seen
+            if event.pid and event.pid != info.last_pid:
+                # A new pid means the process restarted (crash loop)
+                info.pids += 1
+                info.last_pid = event.pid
+
+        for lib in self.info[sig].libraries:
+            victim = self.libraries.add(lib["name"])
+            if victim is not None:
+                self.library_roles.pop(victim, None)
+            self.library_roles[lib["name"]] = lib["role"]
+
+    def _correlate(self, event: CrashEvent):
+        libs: "OrderedDict[str, str]" = OrderedDict()
+        culprit = None
+        for frame, path in zip(event.frames, event.paths):
+            role = library_role(path) if path else None
+            if role is None:
+                continue
+            libs.setdefault(os.path.basename(path), role)
+            if culprit is None and not ABORT_FRAMES.match(frame):
+                culprit = frame
+        return [{"name": n, "role": r} for n, r in libs.items()], culprit
+
+    def report(self, limit: Optional[int] = None) -> Dict:
+        ranked = self.signatures.ranked()
+        sigs = []
+        for sig in ranked[:limit] if limit else ranked:
+            info = self.info[sig]
+            sigs.append({
+                "signature": sig,
+                "count": self.signatures.counts[sig],
+                "error": self.signatures.error.get(sig, 0),
+                "kind": info.kind,
+                "process": info.process,
+                "reason": info.reason,
+                "process_restarts": info.pids,
+                "first_seen": info.first_seen,
+                "last_seen": info.last_seen,
+                "top_frames": info.top_frames,
+                "detail": info.detail,
+                "culprit": info.culprit,
+                "libraries": info.libraries,
+            })
+        libs = [
+            {"name": name, "role": self.library_roles.get(name, ""),
+             "crashes": self.libraries.counts[name],
+             "error": self.libraries.error.get(name, 0)}
+            for name in self.libraries.ranked()
+        ]
+        return {
+            "events": self.events,
+            "by_kind": self.by_kind,
+            "distinct_signatures": len(self.signatures.counts),
+            "truncated": self.signatures.evicted > 0,
+            "signatures": sigs,
+            "libraries": libs,
+        }
+
+
+# ============================================================
+# Parsers (line-driven state machines)
+# ============================================================
+
+class NativeParser:
+    """Tombstone text, from a tombstone file or logcat DEBUG lines."""
+
+    def __init__(self, emit):
+        self.emit = emit
+        self.event: Optional[CrashEvent] = None
+        self.state = "idle"          # idle | header | backtrace | done
+
+    def feed(self, msg: str, ts: str = ""):
+        if msg.startswith(TOMBSTONE_BANNER[:23]):
+            self.flush()
+            self.event = CrashEvent("native", timestamp=ts)
+            self.state = "header"
+            return
+        ev = self.event
+        if ev is None or self.state == "done":
+            return
+
+        stripped = msg.strip()
+        if self.state == "header":
+            m = PID_LINE_RE.match(stripped)
+            if m and not ev.pid:
+                ev.pid = m.group(1)
+                ev.process = os.path.basename(m.group(4).split()[0]) if m.group(4) else m.group(3)
+                return
+            m = SIGNAL_LINE_RE.match(stripped)
+            if m:
+                ev.reason = m.group(1)
+                return
+            m = ABORT_LINE_RE.match(stripped)
+            if m:
+                ev.detail = m.group(1)
+                return
+            if stripped == "backtrace:":
+                self.state = "backtrace"
+            return
+
+        m = NATIVE_FRAME_RE.match(msg)
+        if m:
+            pc, path, func = m.groups()
+            ev.frames.append(normalize_native_frame(pc, path, func))
+            ev.paths.append(path)
+        elif ev.frames or stripped:
+            # First non-frame line ends the crashing thread's backtrace
+            self.state = "done"
+            self.emit(ev)
+            self.event = None
+
+    def flush(self):
+        if self.event is not None and self.event.pid:
+            self.emit(self.event)
+        self.event = None
+        self.state = "idle"
+
+
+class JavaCrashParser:
+    """AndroidRuntime FATAL EXCEPTION blocks from logcat."""
+
+    def __init__(self, emit):
+        self.emit = emit
+        self.event: Optional[CrashEvent] = None
+        self.in_cause = False
+
+    def feed(self, msg: str, ts: str = "", pid: str = ""):
+        if msg.startswith("FATAL EXCEPTION"):
+            self.flush()
+            self.event = CrashEvent("java", timestamp=ts, pid=pid)
+            self.in_cause = False
+            return
+        ev = self.event
+        if ev is None:
+            return
+        stripped = msg.strip()
+        m = JAVA_PROCESS_RE.match(stripped)
+        if m:
+            ev.process = m.group(1)
+            return
+        m = CAUSED_BY_RE.match(stripped)
+        if m:
+            # Root cause joins the reason; its frames are mostly "... N more"
+            ev.reason = f"{ev.reason} <- {m.group(1)}" if ev.reason else m.group(1)
+            self.in_cause = True
+            return
+        m = JAVA_FRAME_RE.match(stripped)
+        if m:
+            if not self.in_cause:
+                ev.frames.append(normalize_java_frame(m.group(1)))
+                ev.paths.append("")
+            return
+        if not ev.reason:
+            m = JAVA_EXCEPTION_RE.match(stripped)
+            if m:
+                ev.reason = m.group(1)
+                ev.detail = stripped
+
+    def flush(self):
+        if self.event is not None:
+            self.emit(self.event)
+        self.event = None
+
+
+class AnrParser:
+    """ActivityManager "ANR in" logcat records and ANR traces files."""
+
+    def __init__(self, emit):
+        self.emit = emit
+        self.logcat_event: Optional[CrashEvent] = None
+        self.trace_event: Optional[CrashEvent] = None
+        self.trace_seen = False      # only the first process block is the ANR subject
+        self.in_main = False
+
+    # -- logcat --
+    def feed_logcat(self, msg: str, ts: str = ""):
+        m = ANR_IN_RE.match(msg)
+        if m:
+            self.flush_logcat()
+            self.logcat_event = CrashEvent("anr", process=m.group(1), timestamp=ts)
+            return
+        ev = self.logcat_event
+        if ev is None:
+            return
+        if msg.startswith("PID: "):
+            ev.pid = msg[5:].strip()
+            return
+        m = ANR_REASON_RE.match(msg)
+        if m:
+            ev.reason = normalize_reason(m.group(1))
+            ev.detail = m.group(1)
+            self.flush_logcat()
+
+    def flush_logcat(self):
+        if self.logcat_event is not None:
+            self.emit(self.logcat_event)
+        self.logcat_event = None
+
+    # -- traces files --
+    def feed_traces(self, line: str):
+        m = TRACES_START_RE.match(line)
+        if m:
+            if not self.trace_seen:
+                self.trace_event = CrashEvent("anr", pid=m.group(1))
+                self.trace_seen = True
+            return
+        ev = self.trace_event
+        if ev is None:
+            return
+        if TRACES_END_RE.match(line):
+            self.flush_traces()
+            return
+        m = TRACES_CMDLINE_RE.match(line)
+        if m:
+            ev.process = m.group(1)
+            return
+        m = TRACES_THREAD_RE.match(line)
+        if m:
+            self.in_main = m.group(1) == "main"
+            if self.in_main:
+                ev.reason = f"main:{m.group(2) or 'unknown'}"
+            return
+        if not self.in_main:
+            return
+        if not line.strip():
+            self.in_main = False
+            return
+        m = JAVA_FRAME_RE.match(line)
+        if m:
+            ev.frames.append(normalize_java_frame(m.group(1)))
+            ev.paths.append("")
+            return
+        m = NATIVE_FRAME_RE.match(line)
+        if m:
+            pc, path, func = m.groups()
+            ev.frames.append(normalize_native_frame(pc, path, func))
+            ev.paths.append(path)
+
+    def flush_traces(self):
+        if self.trace_event is not None:
+            self.emit(self.trace_event)
+        self.trace_event = None
+        self.in_main = False
+
+    def new_file(self):
+        self.flush_traces()
+        self.trace_seen = False
+
+
+class CrashStream:
+    """Routes each input line to the parser it belongs to."""
+
+    def __init__(self, aggregator: CrashAggregator):
+        self.agg = aggregator
+        self.native = NativeParser(self._native)
+        self.java = JavaCrashParser(aggregator.add)
+        self.anr = AnrParser(aggregator.add)
+        # pid -> libc "Fatal signal" event not (yet) followed by a tombstone
+        self.pending: "OrderedDict[str, CrashEvent]" = OrderedDict()
+        self.lines = 0
+
+    def _native(self, event: CrashEvent):
+        self.pending.pop(event.pid, None)
+        self.agg.add(event)
+
+    def feed(self, line: str):
+        self.lines += 1
+        line = line.rstrip("\r\n")
+        m = LOGCAT_THREADTIME_RE.match(line)
+        if m:
+            ts, pid, _, _, tag, msg = m.groups()
+            self._logcat(tag, msg, ts, pid)
+            return
+        m = LOGCAT_BRIEF_RE.match(line)
+        if m:
+            _, tag, pid, msg = m.groups()
+            self._logcat(tag, msg, "", pid)
+            return
+        # Raw tombstone / traces file content
+        self.native.feed(line)
+        self.anr.feed_traces(line)
+
+    def _logcat(self, tag: str, msg: str, ts: str, pid: str):
+        if tag in ("DEBUG", "crash_dump64", "crash_dump32"):
+            self.native.feed(msg, ts)
+        elif tag == "libc":
+            m = FATAL_SIGNAL_RE.match(msg)
+            if m:
+                sig, crash_pid, name = m.groups()
+                self.pending[crash_pid] = CrashEvent(
+                    "signal", process=name, reason=sig, timestamp=ts, pid=crash_pid)
+                while len(self.pending) > MAX_PENDING_SIGNALS:
+                    self.agg.add(self.pending.popitem(last=False)[1])
+        elif tag == "AndroidRuntime":
+            self.java.feed(msg, ts, pid)
+        elif tag == "ActivityManager":
+            self.anr.feed_logcat(msg, ts)
+
+    def end_of_file(self):
+        self.native.flush()
+        self.anr.new_file()
+
+    def finish(self):
+        self.native.flush()
+        self.java.flush()
+        self.anr.flush_logcat()
+        self.anr.flush_traces()
+        # Fatal signals whose tombstone never made it into the log
+        for event in self.pending.values():
+            self.agg.add(event)
+        self.pending.clear()
+
+
+# ============================================================
+# Input handling
+# ============================================================
+
+def iter_input_files(paths: List[str]) -> Iterator[str]:
+    for p in paths:
+        if p == "-" or not os.path.isdir(p):
+            yield p
+            continue
+        for root, dirs, files in os.walk(p):
+            dirs.sort()
+            for name in sorted(files):
+                if not name.endswith(".pb"):   # protobuf tombstones duplicate the text ones
+                    yield os.path.join(root, name)
+
+
+def open_input(path: str) -> TextIO:
+    if path == "-":
+        return sys.stdin
+    if path.endswith(".gz"):
+        return gzip.open(path, "rt", errors="replace")
+    return open(path, "r", errors="replace")
+
+
+def analyze(paths: List[str], aggregator: CrashAggregator) -> CrashStream:
+    stream = CrashStream(aggregator)
+    for path in iter_input_files(paths):
+        try:
+            f = open_input(path)
+        except OSError as e:
+            print(f"Warning: cannot read {path}: {e}", file=sys.stderr)
+            continue
+        try:
+            for line in f:
+                stream.feed(line)
+        finally:
+            if f is not sys.stdin:
+                f.close()
+        stream.end_of_file()
+    stream.finish()
+    return stream
+
+
+def print_summary(report: Dict, top: int):
+    print("=== Crash Signatures ===")
+    print(f"  Events     : {report['events']} "
+          f"({', '.join(f'{k}={v}' for k, v in sorted(report['by_kind'].items())) or 'none'})")
+    print(f"  Signatures : {report['distinct_signatures']}"
+          f"{' (table full, counts approximate)' if report['truncated'] else ''}")
+    for s in report["signatures"][:top]:
+        where = s["culprit"] or (s["top_frames"][0] if s["top_frames"] else "-")
+        print(f"  {s['count']:>7}  {s['signature']}  {s['kind']:<6} {s['process']} "
+              f"{s['reason']}  @ {where}")
+    shims = [l for l in report["libraries"] if l["role"] in ("shim", "hal")]
+    if shims:
+        print("  HAL / shim libraries in crashing frames:")
+        for l in shims[:top]:
+            print(f"  {l['crashes']:>7}  {l['name']} ({l['role']})")
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description="Aggregate crashes from logcat, tombstones and ANR traces into signatures."
+    )
+    parser.add_argument(
+        "inputs",
+        nargs="+",
+        help="Logcat dumps, tombstone files, ANR traces or directories ('-' for stdin)",
+    )
+    parser.add_argument("--json", help="Write the ranked report to this path")
+    parser.add_argument(
+        "--top-frames",
+        type=int,
+        default=DEFAULT_TOP_FRAMES,
+        help=f"Frames that form a signature (default: {DEFAULT_TOP_FRAMES})",
+    )
+    parser.add_argument(
+        "--max-signatures",
+        type=int,
+        default=DEFAULT_MAX_SIGNATURES,
+        help="Signatures tracked before the least frequent are evicted",
+    )
+    parser.add_argument(
+        "--max-libraries",
+        type=int,
+        default=DEFAULT_MAX_LIBRARIES,
+        help="Library counters tracked before the least frequent are evicted",
+    )
+    parser.add_argument("--top", type=int, default=10, help="Signatures shown in the summary")
+
+    args = parser.parse_args()
+
+    agg = CrashAggregator(args.top_frames, args.max_signatures, args.max_libraries)
+    stream = analyze(args.inputs, agg)
+    report = agg.report()
+    report["lines"] = stream.lines
+
+    print_summary(report, args.top)
+    if args.json:
+        with open(args.json, "w") as f:
+            json.dump(report, f, indent=2)
+
+    sys.exit(1 if report["events"] else 0)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,538 @@
+#!/usr/bin/env python3
+"""
+Device Farm Runner for Vendor15 Survival Architecture.
+
+Runs the HAL liveness probes (tools/hal_prober/hal_probe.sh), the survival
+test checks (tools/test_harness/survival_test.sh) and the AVC denial scan
+(scripts/parse_avc_denials.sh) against many adb devices concurrently.
+
+Instead of one `adb shell` round-trip per property / process / HAL, every
+probe phase is a single batched `adb shell` invocation whose output is
+tagged line by line and parsed on the host. Each device runs its phases in
+order; devices run in parallel, bounded by --jobs.
+
+Usage:
+    python3 device_farm.py --all --json farm_report.json --junit farm_report.xml
+
+    python3 device_farm.py \
+        --serial emulator-5554 --serial 0123456789ABCDEF \
+        --phases boot,survival,probe,avc \
+        --timeout 60 --retries 2 \
+        --json farm_report.json
+
+    # Use a different adb (e.g. the fake_adb.py simulator, as CI does):
+    ADB=tools/device_farm/fake_adb.py python3 device_farm.py --all --json out.json
+
+The adb binary is taken from --adb, then $ADB, then "adb" on PATH.
+"""
+
+import argparse
+import asyncio
+import json
+import os
+import re
+import shlex
+import sys
+import time
+import xml.etree.ElementTree as ET
+from dataclasses import dataclass, field, asdict
+from typing import Dict, List, Optional
+
+
+# ============================================================
+# Check definitions (kept in sync with the shell harnesses)
+# ============================================================
+
+# (short name, candidate service names) — mirrors hal_probe.sh
+HAL_PROBES = [
+    ("composer", ["android.hardware.graphics.composer3.IComposer/default",
+                  "android.hardware.graphics.composer@2.4::IComposer/default",
+                  "android.hardware.graphics.composer@2.3::IComposer/default"]),
+    ("allocator", ["android.hardware.graphics.allocator.IAllocator/default",
+                   "android.hardware.graphics.allocator@4.0::IAllocator/default"]),
+    ("power", ["android.hardware.power.IPower/default",
+               "android.hardware.power@1.3::IPower/default"]),
+    ("audio", ["android.hardware.audio.core.IModule/default",
+               "android.hardware.audio@7.1::IDevicesFactory/default",
+               "android.hardware.audio@7.0::IDevicesFactory/default"]),
+    ("camera", ["android.hardware.camera.provider.ICameraProvider/internal/0",
+                "android.hardware.camera.provider@2.7::ICameraProvider/internal/0",
+                "android.hardware.camera.provider@2.6::ICameraProvider/internal/0"]),
+    ("wifi", ["android.hardware.wifi.IWifi/default",
+              "android.hardware.wifi@1.6::IWifi/default"]),
+    ("bluetooth", ["android.hardware.bluetooth.IBluetoothHci/default",
+                   "android.hardware.bluetooth@1.1::IBluetoothHci/default"]),
+    ("sensors", ["android.hardware.sensors.ISensors/default",
+                 "android.hardware.sensors@2.1::ISensors/default"]),
+    ("health", ["android.hardware.health.IHealth/default",
+                "android.hardware.health@2.1::IHealth/default"]),
+    ("thermal", ["android.hardware.thermal.IThermal/default",
+                 "android.hardware.thermal@2.0::IThermal/default"]),
+    ("keymint", ["android.hardware.security.keymint.IKeyMintDevice/default",
+                 "android.hardware.keymaster@4.1::IKeymasterDevice/default"]),
+    ("vibrator", ["android.hardware.vibrator.IVibrator/default",
+                  "android.hardware.vibrator@1.3::IVibratorService/default"]),
+    ("radio", ["android.hardware.radio.config.IRadioConfig/default",
+               "android.hardware.radio.config@1.3::IRadioConfig/default"]),
+    ("gatekeeper", ["android.hardware.gatekeeper.IGatekeeper/default",
+                    "android.hardware.gatekeeper@1.0::IGatekeeper/default"]),
+    ("drm", ["android.hardware.drm.IDrmFactory/widevine",
+             "android.hardware.drm.IDrmFactory/clearkey",
+             "android.hardware.drm@1.4::IDrmFactory/widevine"]),
+    ("bootctrl", ["android.hardware.boot.IBootControl/default",
+                  "android.hardware.boot@1.2::IBootControl/default"]),
+]
+
+CRITICAL_HALS = {"composer", "allocator"}
+
+# (property, expected, status on mismatch, label) — mirrors survival_test.sh
+PROP_CHECKS = [
+    ("ro.gsi.compat.survival_mode", "true", "fail", "Survival mode enabled"),
+    ("ro.gsi.compat.vendor_level", "15", "fail", "Vendor level is 15"),
+    ("persist.sys.disable_rescue", "true", "warn", "Rescue Party disabled"),
+    ("sys.gsi.boot_safety_done", "1", "fail", "Boot Safety completed"),
+    ("sys.gsi.gpu_stability_done", "1", "fail", "GPU Stability completed"),
+    ("sys.gsi.hal_mitigations_done", "1", "fail", "HAL Gap Mitigations completed"),
+    ("sys.gsi.app_compat_done", "1", "fail", "App Compatibility completed"),
+    ("sys.gsi.forward_compat_done", "1", "fail", "Forward Compatibility completed"),
+    ("sys.gsi.all_mitigations_done", "1", "fail", "All Mitigations Chain completed"),
+    ("ro.power.hint_session.enabled", "false", "warn", "Power hint sessions disabled"),
+    ("debug.nn.cpuonly", "1", "warn", "NNAPI CPU-only mode"),
+    ("debug.sf.hw", "0", "warn", "HWC bypass (GPU composition)"),
+]
+
+EXTRA_PROPS = ["ro.product.model", "ro.build.version.sdk", "ro.vintf.enforce",
+               "sys.gsi.boot_decision", "sys.gsi.probe.done", "sys.gsi.probe.summary"]
+
+PROCESSES = ["system_server", "surfaceflinger", "servicemanager", "hwservicemanager",
+             "vold", "installd", "zygote64"]
+
+# (label, regex, warn_at, fail_at) — counts over `logcat -d -b all`
+LOGCAT_COUNTERS = [
+    ("DeadObjectException", r"DeadObjectException", 5, 20),
+    ("UNKNOWN_TRANSACTION", r"UNKNOWN_TRANSACTION", 3, 10),
+    ("Service not found", r"ServiceManager.*not found", 5, None),
+    ("Fatal crashes", r"LOG\(FATAL\)|SIGABRT|F DEBUG", 1, 3),
+    ("system_server deaths", r"system_server.*died", None, 1),
+    ("Watchdog kills", r"Watchdog.*KILLED", None, 1),
+]
+
+AVC_RE = re.compile(r"avc: *denied *\{ *([^}]*?) *\}.*?scontext=(\S+).*?tcontext=(\S+).*?tclass=(\S+)")
+
+END_MARKER = "@@END@@"
+
+
+# ============================================================
+# Results
+# ============================================================
+
+@dataclass
+class CheckResult:
+    """One reportable check (maps to a JUnit testcase)."""
+    phase: str
+    name: str
+    status: str  # "pass", "warn", "fail", "skip"
+    detail: str = ""
+
+
+@dataclass
+class DeviceResult:
+    serial: str
+    checks: List[CheckResult] = field(default_factory=list)
+    info: Dict[str, str] = field(default_factory=dict)
+    phase_seconds: Dict[str, float] = field(default_factory=dict)
+    error: str = ""
+
+    def counts(self) -> Dict[str, int]:
+        c = {"pass": 0, "warn": 0, "fail": 0, "skip": 0}
+        for chk in self.checks:
+            c[chk.status] += 1
+        return c
+
+
+class AdbError(Exception):
+    pass
+
+
+# ============================================================
+# adb transport
+# ============================================================
+
+class Adb:
+    def __init__(self, binary: str, timeout: float, retries: int):
+        self.binary = binary
+        self.timeout = timeout
+        self.retries = retries
+
+    async def run(self, *args: str, timeout: Optional[float] = None) -> str:
+        try:
+            proc = await asyncio.create_subprocess_exec(
+                self.binary, *args,
+                stdout=asyncio.subprocess.PIPE,
+                stderr=asyncio.subprocess.PIPE,
+            )
+        except OSError as e:
+            # Missing or non-executable --adb / $ADB
+            raise AdbError(f"cannot run {self.binary}: {e.strerror or e}")
+        try:
+            out, err = await asyncio.wait_for(proc.communicate(), timeout or self.timeout)
+        except asyncio.TimeoutError:
+            proc.kill()
+            await proc.wait()
+            raise AdbError(f"adb {' '.join(args[:3])} timed out")
+        if proc.returncode != 0:
+            raise AdbError(err.decode(errors="replace").strip() or f"adb exit {proc.returncode}")
+        return out.decode(errors="replace").replace("\r", "")
+
+    async def shell_batch(self, serial: str, script: str) -> str:
+        """Runs `script` in one `adb shell`; retries until the end marker is seen."""
+        last = None
+        for attempt in range(self.retries + 1):
+            try:
+                out = await self.run("-s", serial, "shell", f"{script}\necho {END_MARKER}")
+                if END_MARKER in out:
+                    return out
+                last = AdbError("truncated shell output")
+            except AdbError as e:
+                last = e
+            if attempt < self.retries:
+                await asyncio.sleep(min(2 ** attempt, 10))
+        raise last
+
+    async def devices(self) -> List[str]:
+        out = await self.run("devices")
+        serials = []
+        for line in out.splitlines()[1:]:
+            parts = line.split()
+            if len(parts) >= 2 and parts[1] == "device":
+                serials.append(parts[0])
+        return serials
+
+
+def parse_tagged(output: str) -> Dict[str, Dict[str, str]]:
+    """Parses `TAG|key|value` lines into {TAG: {key: value}}."""
+    tagged: Dict[str, Dict[str, str]] = {}
+    for line in output.splitlines():
+        parts = line.split("|", 2)
+        if len(parts) == 3:
+            tagged.setdefault(parts[0], {})[parts[1]] = parts[2].strip()
+    return tagged
+
+
+# ============================================================
+# Phases
+# ============================================================
+
+def build_survival_script() -> str:
+    props = [p for p, _, _, _ in PROP_CHECKS] + EXTRA_PROPS
+    pattern = "|".join(rx for _, rx, _, _ in LOGCAT_COUNTERS)
+    return "\n".join([
+        f"for p in {' '.join(props)}; do echo \"P|$p|$(getprop $p)\"; done",
+        f"for p in {' '.join(PROCESSES)}; do echo \"I|$p|$(pidof $p)\"; done",
+        "echo \"S|lshal|$(lshal -its 2>/dev/null | head -30 | wc -l)\"",
+        "echo \"S|sf_displays|$(dumpsys SurfaceFlinger 2>/dev/null | grep -c Display)\"",
+        f"logcat -d -b all 2>/dev/null | grep -E {shlex.quote(pattern)} | sed 's/^/L|-|/'",
+    ])
+
+
+def build_probe_script() -> str:
+    lines = []
+    for short, fqdns in HAL_PROBES:
+        names = " ".join(shlex.quote(f) for f in fqdns)
+        lines.append(
+            f"s=dead; for f in {names}; do "
+            f"r=$(timeout 2 service check \"$f\" 2>/dev/null); "
+            f"if [ -z \"$r\" ]; then [ \"$s\" = dead ] && s=timeout; "
+            f"elif echo \"$r\" | grep -q ': found'; then s=alive; break; fi; "
+            f"done; echo \"H|{short}|$s\"")
+    return "\n".join(lines)
+
+
+AVC_SCRIPT = "\n".join([
+    "logcat -d 2>/dev/null | grep 'avc: *denied' | sed 's/^/A|-|/'",
+    "dmesg 2>/dev/null | grep 'avc: *denied' | sed 's/^/A|-|/'",
+])
+
+
+def _threshold(count: int, warn_at: Optional[int], fail_at: Optional[int]) -> str:
+    if fail_at is not None and count >= fail_at:
+        return "fail"
+    if warn_at is not None and count >= warn_at:
+        return "warn"
+    return "pass"
+
+
+def evaluate_survival(res: DeviceResult, tagged: Dict[str, Dict[str, str]],
+                      log_counts: Dict[str, int]):
+    props = tagged.get("P", {})
+    pids = tagged.get("I", {})
+    stats = tagged.get("S", {})
+    res.info["model"] = props.get("ro.product.model", "")
+    res.info["sdk"] = props.get("ro.build.version.sdk", "")
+
+    for prop, expected, on_mismatch, label in PROP_CHECKS:
+        actual = props.get(prop, "")
+        status = "pass" if actual == expected else on_mismatch
+        res.checks.append(CheckResult("survival", label, status, f"{prop}='{actual}'"))
+
+    vintf = props.get("ro.vintf.enforce", "")
+    res.checks.append(CheckResult("survival", "VINTF enforcement disabled",
+                                  "pass" if vintf in ("", "false") else "warn",
+                                  f"ro.vintf.enforce='{vintf}'"))
+
+    for proc in PROCESSES:
+        pid = pids.get(proc, "")
+        res.checks.append(CheckResult("survival", f"{proc} running",
+                                      "pass" if pid else "fail", f"pid={pid}"))
+
+    res.checks.append(CheckResult("survival", "lshal returns data",
+                                  "pass" if stats.get("lshal", "0").strip() not in ("", "0") else "warn"))
+    if pids.get("surfaceflinger"):
+        displays = stats.get("sf_displays", "0")
+        res.checks.append(CheckResult("survival", "SurfaceFlinger has active display(s)",
+                                      "pass" if displays.isdigit() and int(displays) > 0 else "warn"))
+
+    for label, _, warn_at, fail_at in LOGCAT_COUNTERS:
+        count = log_counts.get(label, 0)
+        res.checks.append(CheckResult("survival", label, _threshold(count, warn_at, fail_at),
+                                      f"count={count}"))
+
+    decision = props.get("sys.gsi.boot_decision", "")
+    if decision in ("normal", "first_boot", "upgrade"):
+        status = "pass"
+    elif decision == "downgrade":
+        status = "fail"
+    else:
+        status = "skip"
+    res.checks.append(CheckResult("survival", "Boot decision", status, decision))
+
+    if props.get("sys.gsi.probe.done") == "1":
+        res.info["probe_summary"] = props.get("sys.gsi.probe.summary", "")
+
+
+def count_logcat(output: str) -> Dict[str, int]:
+    """Counts each LOGCAT_COUNTERS pattern over the pre-filtered L| lines."""
+    compiled = [(label, re.compile(rx)) for label, rx, _, _ in LOGCAT_COUNTERS]
+    counts = {label: 0 for label, _ in compiled}
+    for line in output.splitlines():
+        if not line.startswith("L|-|"):
+            continue
+        for label, rx in compiled:
+            if rx.search(line):
+                counts[label] += 1
+    return counts
+
+
+def evaluate_probe(res: DeviceResult, tagged: Dict[str, Dict[str, str]]):
+    hals = tagged.get("H", {})
+    alive = 0
+    for short, _ in HAL_PROBES:
+        status = hals.get(short, "dead")
+        if status == "alive":
+            alive += 1
+            check = "pass"
+        elif status == "timeout":
+            check = "warn"
+        else:
+            check = "fail" if short in CRITICAL_HALS else "warn"
+        res.checks.append(CheckResult("probe", f"HAL {short}", check, status))
+    res.info["hal_alive"] = f"{alive}/{len(HAL_PROBES)}"
+
+
+def evaluate_avc(res: DeviceResult, output: str):
+    unique: Dict[tuple, int] = {}
+    for line in output.splitlines():
+        if not line.startswith("A|-|"):
+            continue
+        m = AVC_RE.search(line)
+        if not m:
+            continue
+        perms, scon, tcon, tclass = m.groups()
+        key = (scon.split(":")[2] if scon.count(":") >= 2 else scon,
+               tcon.split(":")[2] if tcon.count(":") >= 2 else tcon,
+               tclass, perms)
+        unique[key] = unique.get(key, 0) + 1
+    total = sum(unique.values())
+    res.info["avc_denials"] = str(total)
+    res.info["avc_unique"] = str(len(unique))
+    detail = "; ".join(f"{c}x {s} {t}:{k} {{ {p} }}"
+                       for (s, t, k, p), c in sorted(unique.items(), key=lambda kv: -kv[1])[:20])
+    res.checks.append(CheckResult("avc", "AVC denials", "pass" if not unique else "warn",
+                                  detail or "none"))
+
+
+async def wait_for_boot(adb: Adb, serial: str, boot_timeout: float, res: DeviceResult):
+    deadline = time.monotonic() + boot_timeout
+    while True:
+        try:
+            out = await adb.run("-s", serial, "shell", "getprop sys.boot_completed")
+            if out.strip() == "1":
+                res.checks.append(CheckResult("boot", "sys.boot_completed=1", "pass"))
+                return True
+        except AdbError:
+            pass
+        if time.monotonic() >= deadline:
+            res.checks.append(CheckResult("boot", "sys.boot_completed=1", "fail",
+                                          f"not booted within {boot_timeout:.0f}s"))
+            return False
+        await asyncio.sleep(5)
+
+
+async def run_device(adb: Adb, serial: str, phases: List[str], boot_timeout: float) -> DeviceResult:
+    res = DeviceResult(serial=serial)
+    for phase in phases:
+        start = time.monotonic()
+        try:
+            if phase == "boot":
+                await wait_for_boot(adb, serial, boot_timeout, res)
+            elif phase == "survival":
+                out = await adb.shell_batch(serial, build_survival_script())
+                evaluate_survival(res, parse_tagged(out), count_logcat(out))
+            elif phase == "probe":
+                out = await adb.shell_batch(serial, build_probe_script())
+                evaluate_probe(res, parse_tagged(out))
+            elif phase == "avc":
+                out = await adb.shell_batch(serial, AVC_SCRIPT)
+                evaluate_avc(res, out)
+        except AdbError as e:
+            res.error = f"{phase}: {e}"
+            res.checks.append(CheckResult(phase, "adb", "fail", str(e)))
+            break
+        finally:
+            res.phase_seconds[phase] = round(time.monotonic() - start, 3)
+    return res
+
+
+# ============================================================
+# Reports
+# ============================================================
+
+def device_to_json(res: DeviceResult) -> Dict:
+    data = asdict(res)
+    data["counts"] = res.counts()
+    return data
+
+
+def write_junit(results: List[DeviceResult], path: str):
+    suites = ET.Element("testsuites", name="vendor15_device_farm")
+    for res in results:
+        counts = res.counts()
+        suite = ET.SubElement(suites, "testsuite", {
+            "name": res.serial,
+            "tests": str(len(res.checks)),
+            "failures": str(counts["fail"]),
+            "skipped": str(counts["skip"]),
+            "time": str(round(sum(res.phase_seconds.values()), 3)),
+        })
+        for chk in res.checks:
+            case = ET.SubElement(suite, "testcase", {
+                "classname": f"{res.serial}.{chk.phase}",
+                "name": chk.name,
+            })
+            if chk.status == "fail":
+                ET.SubElement(case, "failure", message=chk.detail or "failed")
+            elif chk.status == "skip":
+                ET.SubElement(case, "skipped", message=chk.detail)
+            elif chk.status == "warn":
+                ET.SubElement(case, "system-out").text = f"WARN: {chk.detail}"
+    tree = ET.ElementTree(suites)
+    try:
+        ET.indent(tree, space="  ")
+    except AttributeError:
+        pass
+    tree.write(path, encoding="unicode", xml_declaration=True)
+
+
+async def run_farm(args) -> List[DeviceResult]:
+    adb = Adb(args.adb, args.timeout, args.retries)
+    serials = list(args.serial)
+    if args.all:
+        try:
+            serials += [s for s in await adb.devices() if s not in serials]
+        except AdbError as e:
+            print(f"ERROR: adb devices failed: {e}", file=sys.stderr)
+            return []
+    if not serials:
+        print("ERROR: No devices (use --serial or --all)", file=sys.stderr)
+        return []
+
+    phases = [p.strip() for p in args.phases.split(",") if p.strip()]
+    sem = asyncio.Semaphore(args.jobs)
+
+    async def one(serial: str) -> DeviceResult:
+        async with sem:
+            return await run_device(adb, serial, phases, args.boot_timeout)
+
+    stream = open(args.stream, "w") if args.stream else None
+    results = []
+    try:
+        for fut in asyncio.as_completed([one(s) for s in serials]):
+            res = await fut
+            results.append(res)
+            c = res.counts()
+            print(f"[{res.serial}] pass={c['pass']} warn={c['warn']} fail={c['fail']}"
+                  f"{'  ERROR: ' + res.error if res.error else ''}")
+            if stream:
+                stream.write(json.dumps(device_to_json(res)) + "\n")
+                stream.flush()
+    finally:
+        if stream:
+            stream.close()
+
+    results.sort(key=lambda r: r.serial)
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description="Run Vendor15 HAL probes and survival checks across many adb devices."
+    )
+    parser.add_argument("--serial", action="append", default=[],
+                        help="Device serial (repeatable)")
+    parser.add_argument("--all", action="store_true",
+                        help="Add every device listed by `adb devices`")
+    parser.add_argument("--phases", default="boot,survival,probe,avc",
+                        help="Comma-separated phases: boot,survival,probe,avc")
+    parser.add_argument("--adb", default=os.environ.get("ADB", "adb"),
+                        help="adb executable (default: $ADB or adb)")
+    parser.add_argument("--jobs", type=int, default=32,
+                        help="Maximum devices processed concurrently (default: 32)")
+    parser.add_argument("--timeout", type=float, default=60,
+                        help="Per adb invocation timeout in seconds (default: 60)")
+    parser.add_argument("--retries", type=int, default=2,
+                        help="Retries per probe phase on adb failure (default: 2)")
+    parser.add_argument("--boot-timeout", type=float, default=300,
+                        help="Seconds to wait for sys.boot_completed (default: 300)")
+    parser.add_argument("--json", help="Combined JSON report path")
+    parser.add_argument("--junit", help="Combined JUnit XML report path")
+    parser.add_argument("--stream", help="JSON Lines file, one device result per line as they finish")
+
+    args = parser.parse_args()
+    args.jobs = max(1, args.jobs)
+
+    started = time.time()
+    results = asyncio.run(run_farm(args))
+    if not results:
+        sys.exit(2)
+
+    if args.json:
+        report = {
+            "started": int(started),
+            "duration_s": round(time.time() - started, 3),
+            "phases": args.phases.split(","),
+            "devices": [device_to_json(r) for r in results],
+        }
+        with open(args.json, "w") as f:
+            json.dump(report, f, indent=2)
+        print(f"JSON report written to: {args.json}")
+    if args.junit:
+        write_junit(results, args.junit)
+        print(f"JUnit report written to: {args.junit}")
+
+    failed = [r.serial for r in results if r.counts()["fail"]]
+    print(f"\n{len(results) - len(failed)}/{len(results)} devices passed")
+    sys.exit(1 if failed else 0)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,141 @@
+#!/usr/bin/env python3
+"""
+Fake adb for exercising device_farm.py without hardware.
+
+Answers the subset of adb that the farm uses (`devices` and
+`-s SERIAL shell SCRIPT`) with simulated device responses and latency.
+The batched shell scripts are recognized by their tagged echo lines, so
+every probe phase gets output in the same TAG|key|value form a real
+device would produce.
+
+Environment:
+    FAKE_ADB_DEVICES   Space-separated serials (default: "fake-0 fake-1 fake-2")
+    FAKE_ADB_LATENCY   Mean seconds per invocation, jittered +/-50% (default: 0.1)
+
+Device behaviour follows the serial:
+    *offline*          every shell command fails with "device offline"
+    *degraded*         composer HAL dead, surfaceflinger not running,
+                       extra crash lines in logcat
+    anything else      a healthy survival-mode device
+
+Usage:
+    ADB=tools/device_farm/fake_adb.py python3 tools/device_farm/device_farm.py --all
+"""
+
+import os
+import random
+import re
+import shlex
+import sys
+import time
+
+HEALTHY_PROPS = {
+    "ro.gsi.compat.survival_mode": "true",
+    "ro.gsi.compat.vendor_level": "15",
+    "persist.sys.disable_rescue": "true",
+    "sys.gsi.boot_safety_done": "1",
+    "sys.gsi.gpu_stability_done": "1",
+    "sys.gsi.hal_mitigations_done": "1",
+    "sys.gsi.app_compat_done": "1",
+    "sys.gsi.forward_compat_done": "1",
+    "sys.gsi.all_mitigations_done": "1",
+    "ro.power.hint_session.enabled": "false",
+    "debug.nn.cpuonly": "1",
+    "debug.sf.hw": "0",
+    "ro.product.model": "Fake Device",
+    "ro.build.version.sdk": "36",
+    "ro.vintf.enforce": "false",
+    "sys.gsi.boot_decision": "normal",
+    "sys.gsi.probe.done": "1",
+    "sys.gsi.probe.summary": "alive=15",
+    "sys.boot_completed": "1",
+}
+
+LOGCAT = [
+    "I ActivityManager: Start proc 1234:com.android.settings/1000",
+    "W Binder  : DeadObjectException while notifying listener",
+]
+DEGRADED_LOGCAT = [
+    "F DEBUG   : signal 6 (SIGABRT), code -1 (SI_QUEUE) in tid 812 (composer)",
+    "E ServiceManager: Service android.hardware.graphics.composer3.IComposer/default not found",
+]
+AVC_LINES = [
+    'avc: denied { read } for comm="hal_foo" name="state" scontext=u:r:hal_foo_default:s0 '
+    'tcontext=u:object_r:sysfs:s0 tclass=file permissive=1',
+]
+
+_FOR_RE = re.compile(r'^for p in (.*?); do echo "([A-Z])\|')
+_HAL_RE = re.compile(r'echo "H\|(\w+)\|\$s"')
+_GREP_RE = re.compile(r"grep -E ('(?:[^']|'\\'')*'|\S+)")
+
+
+def shell(serial: str, script: str) -> str:
+    degraded = "degraded" in serial
+    props = dict(HEALTHY_PROPS)
+    out = []
+    for line in script.splitlines():
+        line = line.strip()
+        m = _FOR_RE.match(line)
+        if m:
+            names, tag = m.group(1).split(), m.group(2)
+            for name in names:
+                if tag == "P":
+                    out.append(f"P|{name}|{props.get(name, '')}")
+                elif tag == "I":
+                    dead = degraded and name == "surfaceflinger"
+                    out.append(f"I|{name}|{'' if dead else random.randint(300, 9000)}")
+            continue
+        if line.startswith('echo "S|lshal|'):
+            out.append("S|lshal|30")
+        elif line.startswith('echo "S|sf_displays|'):
+            out.append("S|sf_displays|0" if degraded else "S|sf_displays|2")
+        elif line.startswith("logcat -d -b all"):
+            g = _GREP_RE.search(line)
+            rx = re.compile(shlex.split(g.group(1))[0]) if g else None
+            for entry in LOGCAT + (DEGRADED_LOGCAT if degraded else []):
+                if rx is None or rx.search(entry):
+                    out.append(f"L|-|{entry}")
+        elif "avc: *denied" in line and line.startswith("logcat"):
+            out.extend(f"A|-|{entry}" for entry in AVC_LINES)
+        elif line.startswith("getprop "):
+            out.append(props.get(line.split()[1], ""))
+        elif line.startswith("echo ") and "|" not in line:
+            out.append(line[5:])
+        else:
+            h = _HAL_RE.search(line)
+            if h:
+                short = h.group(1)
+                out.append(f"H|{short}|{'dead' if degraded and short == 'composer' else 'alive'}")
+    return "\n".join(out) + "\n"
+
+
+def main():
+    serials = os.environ.get("FAKE_ADB_DEVICES", "fake-0 fake-1 fake-2").split()
+    latency = float(os.environ.get("FAKE_ADB_LATENCY", "0.1"))
+    time.sleep(latency * random.uniform(0.5, 1.5))
+
+    args = sys.argv[1:]
+    if args == ["devices"]:
+        print("List of devices attached")
+        for serial in serials:
+            print(f"{serial}\t{'offline' if 'offline' in serial else 'device'}")
+        return 0
+
+    if len(args) >= 4 and args[0] == "-s" and args[2] == "shell":
+        serial = args[1]
+        if serial not in serials:
+            print(f"adb: device '{serial}' not found", file=sys.stderr)
+            return 1
+        if "offline" in serial:
+            print("error: device offline", file=sys.stderr)
+            return 1
+        # Real adb shell output uses CRLF on older devices
+        sys.stdout.write(shell(serial, " ".join(args[3:])).replace("\n", "\r\n"))
+        return 0
+
+    print(f"fake_adb: unsupported command: {' '.join(args)}", file=sys.stderr)
+    return 1
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -6,6 +6,7 @@ Reads a vendor VINTF manifest and an upstream AOSP Framework Compatibility Matri
 then outputs an optimized compatibility_matrix.xml where:
   - All HALs are optional="true"
   - Version ranges are widened to include vendor-provided versions
+    ((major, minor) precise, several vendor versions per HAL)
   - Automotive/TV/VR-only HALs are removed
   - Output is valid VINTF XML
 
@@ -25,7 +26,6 @@ Usage:
 import argparse
 import copy
 import os
-import re
 import subprocess
 import sys
 import xml.etree.ElementTree as ET
@@ -33,6 +33,11 @@ from dataclasses import dataclass, field
 from pathlib import Path
 from typing import Optional
 
+sys.path.insert(0, str(Path(__file__).resolve().parents[2] / "build" / "make" / "tools" / "vndk_compat"))
+
+import vintf_model  # noqa: E402
+import vintf_versions  # noqa: E402
+
 
 # HALs that are only relevant for automotive/TV/VR and should be removed
 REMOVE_HALS = {
@@ -69,107 +74,36 @@ class HalInfo:
     transport: str = ""
 
 
-def parse_version_range(version_str: str) -> tuple:
-    """Parse version string like '3-4' or '3' into (min, max) tuple."""
-    version_str = version_str.strip()
-    if not version_str:
-        return (0, 0)
-
-    # Handle ranges like "3-4" or "1.0-5.0"
-    if "-" in version_str:
-        parts = version_str.split("-")
-        lo = parts[0].strip()
-        hi = parts[1].strip()
-        # Strip minor version for comparison
-        lo_major = int(lo.split(".")[0]) if lo else 0
-        hi_major = int(hi.split(".")[0]) if hi else 0
-        return (lo_major, hi_major)
-
-    # Single version like "3" or "5.0"
-    major = int(version_str.split(".")[0])
-    return (major, major)
-
-
-def format_version_range(lo: int, hi: int, use_minor: bool = False) -> str:
-    """Format version range back to string."""
-    if use_minor:
-        if lo == hi:
-            return f"{lo}.0"
-        return f"{lo}.0-{hi}.0"
-    if lo == hi:
-        return str(lo)
-    return f"{lo}-{hi}"
-
-
-def parse_vendor_manifest(manifest_path: str) -> dict:
+def parse_vendor_manifest(manifest_path: str, fragment_dirs: Optional[list] = None) -> dict:
     """
-    Parse vendor VINTF manifest XML.
+    Parse vendor VINTF manifest XML, merging its fragment directory
+    (<dir>/manifest/*.xml) and any extra fragment_dirs in memory.
     Returns dict: {hal_name: HalInfo}
     """
     hals = {}
 
     try:
-        tree = ET.parse(manifest_path)
+        index = vintf_model.load_manifest(manifest_path, fragment_dirs)
     except ET.ParseError as e:
         print(f"ERROR: Failed to parse vendor manifest: {e}", file=sys.stderr)
         return hals
 
-    root = tree.getroot()
-
-    for hal_elem in root.iter("hal"):
-        name_elem = hal_elem.find("name")
-        if name_elem is None or not name_elem.text:
-            continue
-
-        name = name_elem.text.strip()
-        hal_format = hal_elem.get("format", "hidl")
-        transport_elem = hal_elem.find("transport")
-        transport = transport_elem.text.strip() if transport_elem is not None and transport_elem.text else ""
-
-        versions = []
-        for ver_elem in hal_elem.findall("version"):
-            if ver_elem.text:
-                versions.append(ver_elem.text.strip())
-
-        # Also check for fqname which encodes version
-        for fqname_elem in hal_elem.findall("fqname"):
-            if fqname_elem.text:
-                # Format: @1.0::IFoo/default
-                match = re.match(r"@(\d+\.\d+)::", fqname_elem.text)
-                if match:
-                    versions.append(match.group(1))
-
-        interfaces = []
-        for iface_elem in hal_elem.findall("interface"):
-            iface_name_elem = iface_elem.find("name")
-            instances = []
-            for inst_elem in iface_elem.findall("instance"):
-                if inst_elem.text:
-                    instances.append(inst_elem.text.strip())
-            for inst_elem in iface_elem.findall("regex-instance"):
-                if inst_elem.text:
-                    instances.append(inst_elem.text.strip())
-            if iface_name_elem is not None and iface_name_elem.text:
-                interfaces.append({
-                    "name": iface_name_elem.text.strip(),
-                    "instances": instances,
-                })
-
-        info = HalInfo(
+    for name in index.names():
+        records = index.get(name)
+        # Merge if hal name seen more than once (e.g., multiple version entries)
+        hals[name] = HalInfo(
             name=name,
-            format=hal_format,
-            versions=versions,
-            interfaces=interfaces,
-            transport=transport,
+            format=records[0].format,
+            versions=[v for r in records for v in r.versions],
+            interfaces=[
+                {"name": iface, "instances": list(insts)}
+                for r in records for iface, insts in r.interfaces
+            ],
+            optional=records[0].optional,
+            updatable_via_apex=records[0].updatable_via_apex,
+            transport=records[0].transport,
         )
 
-        # Merge if hal name already seen (e.g., multiple version entries)
-        if name in hals:
-            hals[name].versions.extend(versions)
-            hals[name].interfaces.extend(interfaces)
-        else:
-            hals[name] = info
-
     return hals
 
 
@@ -182,17 +116,64 @@ def parse_upstream_matrix(matrix_path: str) -> ET.ElementTree:
         sys.exit(1)
 
 
-def get_vendor_max_version(vendor_hals: dict, hal_name: str) -> int:
-    """Get the maximum version the vendor provides for a HAL."""
-    if hal_name not in vendor_hals:
-        return 0
+def vendor_versions(vendor_hals: dict, hal_name: str, hal_format: str) -> list:
+    """Versions the vendor provides for a HAL in the matrix entry's format family."""
+    info = vendor_hals.get(hal_name)
+    if info is None or (info.format == "aidl") != (hal_format == "aidl"):
+        return []
+    if not info.versions and info.format == "aidl":
+        # AIDL manifest entries without <version> provide version 1
+        return [str(vintf_versions.DEFAULT_AIDL_VERSION)]
+    return list(info.versions)
+
 
-    max_ver = 0
-    for ver_str in vendor_hals[hal_name].versions:
-        _, hi = parse_version_range(ver_str)
-        if hi > max_ver:
-            max_ver = hi
-    return max_ver
+def widen_versions(vendor_hals: dict, hal_elems: list) -> int:
+    """
+    Widens the <version> ranges of all hal_elems in one batch.
+
+    Every (major, minor) version the vendor provides is parsed together with
+    the matrix ranges into sorted interval arrays (see vintf_versions), so
+    minor versions and several disjoint vendor versions are kept. Only
+    entries whose ranges had to grow are rewritten. Returns that count.
+    """
+    intervals = vintf_versions.VersionIntervals()
+    owners, range_owners, range_texts, point_owners, point_texts = [], [], [], [], []
+    for hal_elem in hal_elems:
+        hal_format = hal_elem.get("format", "hidl")
+        owner = intervals.add_owner(hal_format == "aidl")
+        owners.append(owner)
+        for ver_elem in hal_elem.findall("version"):
+            range_owners.append(owner)
+            range_texts.append(ver_elem.text or "")
+        for text in vendor_versions(vendor_hals, hal_elem.find("name").text.strip(), hal_format):
+            point_owners.append(owner)
+            point_texts.append(text)
+
+    intervals.add_ranges(range_owners, range_texts)
+    intervals.add_points(point_owners, point_texts)
+    ranges, widened = intervals.solve()
+
+    for hal_elem, owner in zip(hal_elems, owners):
+        if owner in widened:
+            write_versions(hal_elem, [vintf_versions.format_range(r) for r in ranges[owner]])
+    return len(widened)
+
+
+def write_versions(hal_elem: ET.Element, texts: list):
+    """Replaces the <version> children of hal_elem, keeping their position."""
+    ver_elems = hal_elem.findall("version")
+    children = list(hal_elem)
+    if ver_elems:
+        pos = children.index(ver_elems[0])
+    else:
+        name_elem = hal_elem.find("name")
+        pos = children.index(name_elem) + 1 if name_elem is not None else 0
+    for ver_elem in ver_elems:
+        hal_elem.remove(ver_elem)
+    for i, text in enumerate(texts):
+        ver_elem = ET.Element("version")
+        ver_elem.text = text
+        hal_elem.insert(pos + i, ver_elem)
 
 
 def should_remove_hal(hal_name: str) -> bool:
@@ -226,6 +207,7 @@ def optimize_matrix(
 
     # Process each HAL
     hals_to_remove = []
+    hals_to_widen = []
     for hal_elem in root.findall("hal"):
         name_elem = hal_elem.find("name")
         if name_elem is None or not name_elem.text:
@@ -241,25 +223,10 @@ def optimize_matrix(
         # Rule 3: Make all HALs optional
         hal_elem.set("optional", "true")
 
-        # Rule 4: Widen version range
-        hal_format = hal_elem.get("format", "hidl")
-        use_minor = (hal_format == "native" or hal_format == "hidl")
+        hals_to_widen.append(hal_elem)
 
-        vendor_max = get_vendor_max_version(vendor_hals, hal_name)
-
-        for ver_elem in hal_elem.findall("version"):
-            if ver_elem.text:
-                upstream_lo, upstream_hi = parse_version_range(ver_elem.text.strip())
-
-                if vendor_max > 0 and vendor_max < upstream_lo:
-                    # Vendor version is below upstream minimum — widen downward
-                    new_lo = vendor_max
-                    new_hi = upstream_hi
-                    ver_elem.text = format_version_range(new_lo, new_hi, use_minor)
-                elif vendor_max > upstream_hi:
-                    # Vendor has newer than upstream expects — widen upward (unusual but safe)
-                    ver_elem.text = format_version_range(upstream_lo, vendor_max, use_minor)
-                # else: vendor within range or not present — keep as is
+    # Rule 4: Widen version ranges (all HALs in one batch)
+    widen_versions(vendor_hals, hals_to_widen)
 
     # Remove marked HALs
     for hal_elem in hals_to_remove:
@@ -269,8 +236,14 @@ def optimize_matrix(
 
 
 def pull_vendor_manifest_from_device() -> Optional[str]:
-    """Pull vendor manifest from connected device via adb."""
-    tmp_path = "/tmp/vendor_manifest_pulled.xml"
+    """Pull vendor manifest (and its fragments) from connected device via adb."""
+    pull_dir = "/tmp/vendor15_vintf"
+    tmp_path = os.path.join(pull_dir, "manifest.xml")
+    # Fragments land in <dir>/manifest/, where parse_vendor_manifest looks for them
+    frag_tmp_dir = os.path.join(pull_dir, "manifest")
+    os.makedirs(frag_tmp_dir, exist_ok=True)
+    for stale in os.listdir(frag_tmp_dir):
+        os.remove(os.path.join(frag_tmp_dir, stale))
 
     # Try primary manifest location
     manifest_paths = [
@@ -287,7 +260,7 @@ def pull_vendor_manifest_from_device() -> Optional[str]:
         if result.returncode == 0:
             print(f"Pulled vendor manifest from {remote_path}")
 
-            # Also try to pull fragment manifests and merge
+            # Also pull fragment manifests
             frag_dir = "/vendor/etc/vintf/manifest/"
             frag_result = subprocess.run(
                 ["adb", "shell", f"ls {frag_dir} 2>/dev/null"],
@@ -299,13 +272,10 @@ def pull_vendor_manifest_from_device() -> Optional[str]:
                 for frag in frags:
                     frag = frag.strip()
                     if frag.endswith(".xml"):
-                        frag_tmp = f"/tmp/vendor_manifest_frag_{frag}"
                         subprocess.run(
-                            ["adb", "pull", f"{frag_dir}{frag}", frag_tmp],
+                            ["adb", "pull", f"{frag_dir}{frag}", os.path.join(frag_tmp_dir, frag)],
                             capture_output=True,
                         )
-                        # Merge fragments into main manifest
-                        merge_manifest_fragment(tmp_path, frag_tmp)
 
             return tmp_path
 
@@ -313,23 +283,6 @@ def pull_vendor_manifest_from_device() -> Optional[str]:
     return None
 
 
-def merge_manifest_fragment(main_path: str, frag_path: str):
-    """Merge a manifest fragment into the main manifest."""
-    try:
-        main_tree = ET.parse(main_path)
-        frag_tree = ET.parse(frag_path)
-    except ET.ParseError:
-        return
-
-    main_root = main_tree.getroot()
-    frag_root = frag_tree.getroot()
-
-    for hal_elem in frag_root.findall("hal"):
-        main_root.append(hal_elem)
-
-    main_tree.write(main_path, encoding="unicode", xml_declaration=True)
-
-
 def write_output(tree: ET.ElementTree, output_path: str):
     """Write optimized matrix with proper formatting."""
     root = tree.getroot()
@@ -404,12 +357,14 @@ def print_diff_summary(vendor_hals: dict, upstream_tree: ET.ElementTree, optimiz
         if name_elem is None or not name_elem.text:
             continue
         hal_name = name_elem.text.strip()
-        vendor_max = get_vendor_max_version(vendor_hals, hal_name)
+        hal_format = hal_elem.get("format", "hidl")
+        provided = vintf_versions.provided_points(
+            vendor_versions(vendor_hals, hal_name, hal_format), hal_format == "aidl")
 
-        for ver_elem in hal_elem.findall("version"):
-            if ver_elem.text:
-                print(f"    {hal_name}: {ver_elem.text.strip()}"
-                      f" (vendor provides: v{vendor_max if vendor_max > 0 else '?'})")
+        versions = [v.text.strip() for v in hal_elem.findall("version") if v.text]
+        if versions:
+            print(f"    {hal_name}: {', '.join(versions)}"
+                  f" (vendor provides: {', '.join(provided) if provided else '?'})")
 
     print("")
 
@@ -422,6 +377,13 @@ def main():
         "--vendor-manifest",
         help="Path to vendor VINTF manifest XML",
     )
+    parser.add_argument(
+        "--fragments",
+        action="append",
+        default=[],
+        help="Extra vendor manifest fragment directory (repeatable; "
+             "<manifest dir>/manifest/ is always merged)",
+    )
     parser.add_argument(
         "--from-device",
         action="store_true",
@@ -470,7 +432,7 @@ def main():
 
     # Parse inputs
     print(f"Parsing vendor manifest: {vendor_manifest_path}")
-    vendor_hals = parse_vendor_manifest(vendor_manifest_path)
+    vendor_hals = parse_vendor_manifest(vendor_manifest_path, args.fragments)
     print(f"  Found {len(vendor_hals)} HALs in vendor manifest")
 
     print(f"Parsing upstream matrix: {args.upstream_matrix}")
@@ -0,0 +1,480 @@
+#!/usr/bin/env python3
+"""
+Parallel Patch-Series Engine for Vendor15 Survival Architecture.
+
+Validates (and optionally applies) the patches under patches/ against an
+AOSP tree, as scripts/validate_patches.sh and scripts/apply_patches.sh do,
+but with the patches grouped into per-project series:
+
+  * projects are processed in parallel by a worker pool (--jobs);
+  * inside a project, patches keep their order (file name order, or the
+    order of a quilt-style "series" file next to them);
+  * validation stacks the series virtually: every patch is applied to a
+    private git index seeded from the project's HEAD (git apply --cached),
+    so later patches are checked against the result of earlier ones and
+    neither the worktree nor the real index is touched;
+  * patches git cannot apply fall back to `patch -p1` on a scratch copy of
+    just the files they touch, and the fuzzed result is stacked as well;
+  * results are cached by (project HEAD, hash of the series up to and
+    including the patch), so re-validating an unchanged tree costs one
+    `git rev-parse` per project.
+
+Usage:
+    python3 patch_series.py validate <AOSP_ROOT> <PATCHES_DIR> [--json matrix.json]
+    python3 patch_series.py apply <AOSP_ROOT> <PATCHES_DIR> [--jobs 8]
+
+Cache: --cache, else $VENDOR15_PATCH_CACHE, else
+~/.cache/vendor15/patch_series.json ("" disables it).
+
+Exit codes (validate):
+    0 = all patches apply cleanly
+    1 = one or more patches failed
+Apply keeps apply_patches.sh semantics and exits 0 unless --strict is given.
+"""
+
+import argparse
+import hashlib
+import json
+import os
+import re
+import shutil
+import subprocess
+import sys
+import tempfile
+import time
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import asdict, dataclass, field
+from typing import Dict, List, Optional, Tuple
+
+CACHE_SCHEMA = 1
+SERIES_FILE = "series"
+# Files touched by a patch: "+++ b/path" (git) or "+++ path" (plain diff)
+_TOUCHED_RE = re.compile(r"^(?:\+\+\+|---) (?:[ab]/)?(\S+)", re.M)
+
+
+@dataclass
+class PatchResult:
+    patch: str
+    status: str                    # pass | fuzz | fail | skip
+    method: str = ""               # git-apply | patch
+    cached: bool = False
+    seconds: float = 0.0
+    error: str = ""
+
+
+@dataclass
+class ProjectResult:
+    project: str
+    head: str = ""
+    stacked: bool = True
+    patches: List[PatchResult] = field(default_factory=list)
+    log: List[str] = field(default_factory=list)
+
+
+# ============================================================
+# Discovery
+# ============================================================
+
+def discover_series(patches_dir: str) -> Dict[str, List[str]]:
+    """Maps project path -> ordered patch files (absolute paths)."""
+    series: Dict[str, List[str]] = {}
+    for root, dirs, files in os.walk(patches_dir):
+        dirs.sort()
+        patches = sorted(f for f in files if f.endswith(".patch"))
+        if not patches:
+            continue
+        order_file = os.path.join(root, SERIES_FILE)
+        if os.path.isfile(order_file):
+            with open(order_file, "r") as f:
+                listed = [l.strip() for l in f if l.strip() and not l.startswith("#")]
+            # Listed patches first, in series order; unlisted ones after
+            patches = [p for p in listed if p in patches] + [p for p in patches if p not in listed]
+        project = os.path.relpath(root, patches_dir)
+        series[project] = [os.path.join(os.path.abspath(root), p) for p in patches]
+    return series
+
+
+# ============================================================
+# Cache
+# ============================================================
+
+def default_cache_path() -> Optional[str]:
+    path = os.environ.get("VENDOR15_PATCH_CACHE")
+    if path is None:
+        path = os.path.join(os.path.expanduser("~"), ".cache", "vendor15", "patch_series.json")
+    return path or None
+
+
+class ResultCache:
+    def __init__(self, path: Optional[str]):
+        self.path = path
+        self.entries: Dict[str, Dict] = {}
+        self.dirty = False
+        if path and os.path.exists(path):
+            try:
+                with open(path, "r") as f:
+                    data = json.load(f)
+                if data.get("schema") == CACHE_SCHEMA:
+                    self.entries = data.get("entries", {})
+            except (OSError, ValueError):
+                pass
+
+    def get(self, key: str) -> Optional[Dict]:
+        return self.entries.get(key)
+
+    def put(self, key: str, status: str, method: str, error: str = ""):
+        self.entries[key] = {"status": status, "method": method, "error": error}
+        self.dirty = True
+
+    def save(self):
+        if not self.path or not self.dirty:
+            return
+        os.makedirs(os.path.dirname(os.path.abspath(self.path)), exist_ok=True)
+        fd, tmp = tempfile.mkstemp(dir=os.path.dirname(os.path.abspath(self.path)), suffix=".tmp")
+        with os.fdopen(fd, "w") as f:
+            json.dump({"schema": CACHE_SCHEMA, "entries": self.entries}, f)
+        os.replace(tmp, self.path)
+
+
+def file_digest(path: str) -> str:
+    h = hashlib.sha256()
+    with open(path, "rb") as f:
+        for block in iter(lambda: f.read(1 << 16), b""):
+            h.update(block)
+    return h.hexdigest()
+
+
+# ============================================================
+# Git helpers
+# ============================================================
+
+def run(cmd: List[str], cwd: str, env: Optional[Dict[str, str]] = None,
+        stdin: Optional[bytes] = None) -> Tuple[int, str]:
+    try:
+        proc = subprocess.run(cmd, cwd=cwd, env=env, input=stdin,
+                              stdout=subprocess.PIPE, stderr=subprocess.STDOUT)
+    except OSError as e:
+        return 127, str(e)
+    return proc.returncode, proc.stdout.decode(errors="replace")
+
+
+def project_head(project_dir: str) -> Optional[str]:
+    rc, out = run(["git", "rev-parse", "--verify", "-q", "HEAD"], project_dir)
+    return out.strip() if rc == 0 else None
+
+
+def first_error(output: str) -> str:
+    for line in output.splitlines():
+        if line.strip():
+            return line.strip()[:200]
+    return ""
+
+
+class VirtualStack:
+    """A private git index seeded from HEAD; patches stack in it."""
+
+    def __init__(self, project_dir: str, head: str):
+        self.dir = project_dir
+        fd, self.index = tempfile.mkstemp(prefix="patch_series.", suffix=".index")
+        os.close(fd)
+        os.unlink(self.index)
+        self.env = dict(os.environ, GIT_INDEX_FILE=self.index)
+        rc, out = run(["git", "read-tree", head], project_dir, self.env)
+        if rc != 0:
+            raise RuntimeError(first_error(out))
+
+    def close(self):
+        if os.path.exists(self.index):
+            os.unlink(self.index)
+
+    def apply(self, patch: str) -> Tuple[str, str]:
+        """Returns (status, error) and stacks the patch on success."""
+        rc, out = run(["git", "apply", "--cached", patch], self.dir, self.env)
+        if rc == 0:
+            return "pass", ""
+        err = first_error(out)
+        if self._apply_with_patch(patch):
+            return "fuzz", ""
+        return "fail", err
+
+    def _apply_with_patch(self, patch: str) -> bool:
+        with open(patch, "rb") as f:
+            data = f.read()
+        touched = sorted({p for p in _TOUCHED_RE.findall(data.decode(errors="replace"))
+                          if p != "/dev/null"})
+        scratch = tempfile.mkdtemp(prefix="patch_series.")
+        try:
+            for path in touched:
+                rc, blob = self._show(path)
+                if rc == 0:
+                    dest = os.path.join(scratch, path)
+                    os.makedirs(os.path.dirname(dest), exist_ok=True)
+                    with open(dest, "wb") as f:
+                        f.write(blob)
+            rc, _ = run(["patch", "-p1", "-s", "--no-backup-if-mismatch", "-r", "-"],
+                        scratch, stdin=data)
+            if rc != 0:
+                return False
+            # Stack the fuzzed result so later patches see it
+            for path in touched:
+                src = os.path.join(scratch, path)
+                if os.path.exists(src):
+                    rc, sha = run(["git", "hash-object", "-w", "--", src], self.dir)
+                    if rc != 0:
+                        return False
+                    run(["git", "update-index", "--add", "--cacheinfo",
+                         f"100644,{sha.strip()},{path}"], self.dir, self.env)
+                else:
+                    run(["git", "update-index", "--force-remove", "--", path], self.dir, self.env)
+            return True
+        finally:
+            shutil.rmtree(scratch, ignore_errors=True)
+
+    def _show(self, path: str) -> Tuple[int, bytes]:
+        try:
+            proc = subprocess.run(["git", "show", f":{path}"], cwd=self.dir, env=self.env,
+                                  stdout=subprocess.PIPE, stderr=subprocess.DEVNULL)
+        except OSError:
+            return 127, b""
+        return proc.returncode, proc.stdout
+
+
+# ============================================================
+# Per-project workers
+# ============================================================
+
+def validate_project(root: str, patches_dir: str, project: str, patches: List[str],
+                     cache: ResultCache) -> ProjectResult:
+    result = ProjectResult(project)
+    project_dir = os.path.join(root, project)
+    rel = lambda p: os.path.relpath(p, patches_dir)
+
+    if not os.path.isdir(project_dir):
+        for p in patches:
+            result.patches.append(PatchResult(rel(p), "skip", error="target dir not in tree"))
+            result.log.append(f"  SKIP: {rel(p)} (target dir '{project}' not in tree)")
+        return result
+
+    head = project_head(project_dir)
+    if head is None:
+        return validate_unstacked(project_dir, patches, rel, result)
+    result.head = head
+
+    chain = hashlib.sha256(head.encode())
+    stack: Optional[VirtualStack] = None
+    replay: List[Tuple[str, str]] = []   # cached passes not yet applied to the stack
+    try:
+        for p in patches:
+            start = time.monotonic()
+            chain.update(file_digest(p).encode())
+            key = chain.hexdigest()
+            hit = cache.get(key)
+            if hit is not None:
+                pr = PatchResult(rel(p), hit["status"], hit["method"], cached=True,
+                                 error=hit.get("error", ""))
+                if pr.status in ("pass", "fuzz"):
+                    replay.append((p, pr.status))
+            else:
+                if stack is None:
+                    stack = VirtualStack(project_dir, head)
+                for earlier, _ in replay:
+                    stack.apply(earlier)
+                replay = []
+                status, err = stack.apply(p)
+                method = "git-apply" if status == "pass" else "patch" if status == "fuzz" else ""
+                cache.put(key, status, method, err)
+                pr = PatchResult(rel(p), status, method, error=err)
+            pr.seconds = round(time.monotonic() - start, 3)
+            result.patches.append(pr)
+            result.log.append(_line(pr))
+    except RuntimeError as e:
+        result.log.append(f"  FAIL: {project} (cannot stage HEAD: {e})")
+        done = {pr.patch for pr in result.patches}
+        result.patches.extend(PatchResult(rel(p), "fail", error=str(e))
+                              for p in patches if rel(p) not in done)
+    finally:
+        if stack is not None:
+            stack.close()
+    return result
+
+
+def validate_unstacked(project_dir: str, patches: List[str], rel, result: ProjectResult) -> ProjectResult:
+    """Not a git checkout: check each patch against the worktree on its own."""
+    result.stacked = False
+    for p in patches:
+        start = time.monotonic()
+        with open(p, "rb") as f:
+            rc, out = run(["patch", "-p1", "--dry-run", "-s"], project_dir, stdin=f.read())
+        pr = PatchResult(rel(p), "fuzz" if rc == 0 else "fail", "patch" if rc == 0 else "",
+                         error="" if rc == 0 else first_error(out))
+        pr.seconds = round(time.monotonic() - start, 3)
+        result.patches.append(pr)
+        result.log.append(_line(pr))
+    return result
+
+
+def apply_project(root: str, patches_dir: str, project: str, patches: List[str]) -> ProjectResult:
+    result = ProjectResult(project, stacked=False)
+    project_dir = os.path.join(root, project)
+    rel = lambda p: os.path.relpath(p, patches_dir)
+
+    if not os.path.isdir(project_dir):
+        for p in patches:
+            result.patches.append(PatchResult(rel(p), "skip", error="target dir not in tree"))
+        result.log.append(f"Warning: Directory {project} does not exist in AOSP tree. Skipping patch.")
+        return result
+
+    result.head = project_head(project_dir) or ""
+    for p in patches:
+        start = time.monotonic()
+        rc, out = run(["git", "apply", "--check", p], project_dir)
+        if rc == 0:
+            rc, out = run(["git", "apply", p], project_dir)
+        if rc == 0:
+            pr = PatchResult(rel(p), "pass", "git-apply")
+            result.log.append(f"Success: Applied {rel(p)}")
+        else:
+            with open(p, "rb") as f:
+                rc, out2 = run(["patch", "-p1", "-s"], project_dir, stdin=f.read())
+            if rc == 0:
+                pr = PatchResult(rel(p), "fuzz", "patch")
+                result.log.append(f"Success: Applied {rel(p)} with patch command")
+            else:
+                pr = PatchResult(rel(p), "fail", error=first_error(out2 or out))
+                result.log.append(f"Error: Failed to apply {rel(p)}")
+        pr.seconds = round(time.monotonic() - start, 3)
+        result.patches.append(pr)
+    return result
+
+
+def _line(pr: PatchResult) -> str:
+    if pr.status == "pass":
+        note = " (cached)" if pr.cached else ""
+        return f"  PASS: {pr.patch}{note}"
+    if pr.status == "fuzz":
+        return f"  PASS: {pr.patch} (via patch --dry-run{', cached' if pr.cached else ''})"
+    note = f": {pr.error}" if pr.error else ""
+    return f"  FAIL: {pr.patch}{note}{' (cached)' if pr.cached else ''}"
+
+
+# ============================================================
+# Driver
+# ============================================================
+
+def run_series(mode: str, root: str, patches_dir: str, jobs: int,
+               cache: Optional[ResultCache]) -> List[ProjectResult]:
+    series = discover_series(patches_dir)
+    # Longest series first so the pool does not end on one big project
+    order = sorted(series, key=lambda proj: (-len(series[proj]), proj))
+    with ThreadPoolExecutor(max_workers=max(1, jobs)) as pool:
+        if mode == "validate":
+            futures = {proj: pool.submit(validate_project, root, patches_dir, proj,
+                                         series[proj], cache) for proj in order}
+        else:
+            futures = {proj: pool.submit(apply_project, root, patches_dir, proj, series[proj])
+                       for proj in order}
+        results = [futures[proj].result() for proj in sorted(series)]
+    if cache is not None:
+        cache.save()
+    return results
+
+
+def summarize(results: List[ProjectResult]) -> Dict[str, int]:
+    counts = {"total": 0, "pass": 0, "fuzz": 0, "fail": 0, "skip": 0, "cached": 0}
+    for proj in results:
+        for pr in proj.patches:
+            counts["total"] += 1
+            counts[pr.status] += 1
+            counts["cached"] += pr.cached
+    return counts
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description="Validate or apply per-project patch series in parallel."
+    )
+    parser.add_argument("mode", choices=["validate", "apply"])
+    parser.add_argument("root", help="AOSP root")
+    parser.add_argument("patches_dir", help="Patches directory mirroring the AOSP tree")
+    parser.add_argument(
+        "--jobs",
+        type=int,
+        default=min(16, os.cpu_count() or 1),
+        help="Projects processed in parallel",
+    )
+    parser.add_argument("--json", help="Write the per-project result matrix to this path")
+    parser.add_argument(
+        "--cache",
+        default=default_cache_path(),
+        help="Validation result cache ('' disables)",
+    )
+    parser.add_argument(
+        "--strict",
+        action="store_true",
+        help="apply: exit 1 if any patch failed",
+    )
+
+    args = parser.parse_args()
+    for path, what in ((args.root, "AOSP root"), (args.patches_dir, "Patches directory")):
+        if not os.path.isdir(path):
+            print(f"Error: {what} '{path}' does not exist.")
+            sys.exit(1)
+    root = os.path.abspath(args.root)
+    patches_dir = os.path.abspath(args.patches_dir)
+
+    if args.mode == "validate":
+        print("=== Patch Validation (virtual stack) ===")
+        print(f"AOSP Root  : {args.root}")
+        print(f"Patches Dir: {args.patches_dir}")
+        print("")
+        cache = ResultCache(args.cache)
+    else:
+        print(f"Applying patches from {args.patches_dir} to {args.root}")
+        cache = None
+
+    results = run_series(args.mode, root, patches_dir, args.jobs, cache)
+    for proj in results:
+        for line in proj.log:
+            print(line)
+
+    counts = summarize(results)
+    failed = counts["fail"]
+    if args.json:
+        with open(args.json, "w") as f:
+            json.dump({
+                "mode": args.mode,
+                "root": root,
+                "patches_dir": patches_dir,
+                "summary": counts,
+                "projects": [asdict(p) for p in results],
+            }, f, indent=2)
+
+    if args.mode == "apply":
+        print(f"Applied {counts['pass'] + counts['fuzz']}/{counts['total']} patch(es), "
+              f"{failed} failed, {counts['skip']} skipped")
+        sys.exit(1 if failed and args.strict else 0)
+
+    print("")
+    print("=== Validation Summary ===")
+    print(f"  Total : {counts['total']}")
+    print(f"  Pass  : {counts['pass'] + counts['fuzz']}")
+    print(f"  Fail  : {failed}")
+    print(f"  Skip  : {counts['skip']}")
+    print(f"  Cached: {counts['cached']}")
+
+    if failed:
+        print("")
+        print(f"ERROR: {failed} patch(es) failed validation.")
+        print("These patches may be stale or incompatible with the current AOSP tree.")
+        sys.exit(1)
+    if counts["total"] == 0:
+        print("")
+        print(f"WARNING: No .patch files found in {args.patches_dir}")
+        sys.exit(0)
+    print("")
+    print("All patches validated successfully.")
+    sys.exit(0)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,798 @@
+#!/usr/bin/env python3
+"""
+SELinux Rule Index and AVC Suggestion Filter for Vendor15 Survival Architecture.
+
+Parses the project's type enforcement files (sepolicy/vendor15_survival.te
+and sepolicy/overlays/*.te by default, plus any extra policy given with
+--te) into an index keyed by (source, target, class) whose values are
+permission bitsets. Type and attribute declarations, typeattribute,
+brace sets with exclusions ({ a b -c }), complements (~{ ... }), "*",
+"self" and the common global_macros permission sets / binder_call,
+set_prop, get_prop macros are understood.
+
+Process types in a denial log count as members of AOSP's `domain`. Rules
+on other AOSP attributes the loaded files never declare (coredomain,
+hal_foo_server, ...) cannot be resolved; denials they may cover are
+listed as "possibly covered" rather than suggested again. Pass the AOSP
+policy with --te (parse_avc_denials.sh does when $AOSP_ROOT is set) to
+resolve them.
+
+Each AVC denial is then checked against the index in O(1) (per distinct
+source/target/class, granted masks are memoized), and only permissions
+no rule grants yet are kept. The remaining permissions are merged into
+minimal allow rules (shared targets and classes folded into sets) and
+assigned to the overlay file that already owns the most related rules,
+so a million-line denial log becomes a short, non-redundant diff.
+
+Usage:
+    python3 te_index.py --avc denials.log
+    python3 te_index.py --avc denials.log --diff new_rules.patch --json avc.json
+    python3 te_index.py --query hal_camera_default gpu_device chr_file
+
+Exit codes:
+    0 = every denial is already covered (or no denials)
+    1 = rules are suggested
+"""
+
+import argparse
+import difflib
+import json
+import os
+import re
+import sys
+from collections import OrderedDict
+from dataclasses import dataclass, field
+from typing import Dict, Iterable, List, Optional, Set, Tuple
+
+SCRIPT_DIR = os.path.dirname(os.path.abspath(__file__))
+PROJECT_ROOT = os.path.dirname(os.path.dirname(SCRIPT_DIR))
+DEFAULT_OVERLAYS = [
+    os.path.join(PROJECT_ROOT, "sepolicy", "vendor15_survival.te"),
+    os.path.join(PROJECT_ROOT, "sepolicy", "overlays"),
+]
+# Owner of suggestions that match no existing overlay
+FALLBACK_OWNER = "minimal_compat.te"
+HAL_FALLBACK_OWNER = "hal_relax.te"
+BINDER_OWNER = "binder_relax.te"
+
+ALL_PERMS = -1   # "*": every bit set, also for permissions interned later
+
+# Every process type is a member of this AOSP attribute
+DOMAIN = "domain"
+# Undeclared names that look like AOSP attributes (domain, coredomain,
+# file_type, hal_foo, hal_foo_server, ...) rather than concrete types
+# (hal_foo_default, gpu_device, sysfs_foo, ...)
+AOSP_ATTRIBUTE_RE = re.compile(
+    r"^(?:\w*domain|\w+_type|mlstrustedsubject|\w+_violators"
+    r"|hal_\w+_(?:server|client)"
+    r"|hal_(?!\w*_(?:default|exec|service|hwservice|prop|device|file|socket|tmpfs)$)\w+)$"
+)
+
+# Subset of system/sepolicy/public/global_macros
+PERM_MACROS = {
+    "r_file_perms": "getattr open read ioctl lock map watch watch_reads",
+    "w_file_perms": "open append write lock map",
+    "rw_file_perms": "getattr open read ioctl lock map watch watch_reads append write",
+    "x_file_perms": "getattr execute execute_no_trans map",
+    "rx_file_perms": "getattr open read ioctl lock map watch watch_reads execute execute_no_trans",
+    "ra_file_perms": "getattr open read ioctl lock map watch watch_reads append",
+    "create_file_perms": "getattr open read ioctl lock map watch watch_reads append write "
+                         "create rename setattr unlink",
+    "r_dir_perms": "open getattr read search ioctl lock watch watch_reads",
+    "w_dir_perms": "open search write add_name remove_name lock",
+    "ra_dir_perms": "open getattr read search ioctl lock watch watch_reads add_name write",
+    "rw_dir_perms": "open getattr read search ioctl lock watch watch_reads add_name write remove_name",
+    "create_dir_perms": "open getattr read search ioctl lock watch watch_reads add_name write "
+                        "remove_name create reparent rename rmdir setattr",
+    "rw_socket_perms": "ioctl read getattr write setattr lock append bind connect getopt "
+                       "setopt shutdown map",
+}
+
+TOKEN_RE = re.compile(r"[{}();:,~*]|[^\s{}();:,~*]+")
+AVC_RE = re.compile(
+    r"avc: +denied +\{ ([^}]*) \} for .*?scontext=(\S+) tcontext=(\S+) tclass=(\S+)"
+)
+
+Key = Tuple[str, str, str]
+
+
+# ============================================================
+# Parsing
+# ============================================================
+
+@dataclass
+class AllowRule:
+    sources: List[str]
+    targets: List[str]
+    classes: List[str]
+    perms: List[str]          # may contain "*" or "~name" entries
+    path: str
+    line: int
+
+
+@dataclass
+class PolicyFile:
+    path: str
+    rules: List[AllowRule] = field(default_factory=list)
+
+
+def _strip_comments(text: str) -> str:
+    return re.sub(r"#[^\n]*", "", text)
+
+
+def tokenize(text: str) -> List[Tuple[str, int]]:
+    tokens = []
+    for lineno, line in enumerate(_strip_comments(text).split("\n"), 1):
+        tokens.extend((t, lineno) for t in TOKEN_RE.findall(line))
+    return tokens
+
+
+class TeParser:
+    """Recursive-descent parser for the subset of TE syntax used here."""
+
+    def __init__(self, path: str, tokens: List[Tuple[str, int]]):
+        self.path = path
+        self.tokens = tokens
+        self.pos = 0
+        self.rules: List[AllowRule] = []
+        self.types: Dict[str, Set[str]] = {}        # type -> attributes
+        self.attributes: Set[str] = set()
+        self.unparsed = 0
+
+    def peek(self) -> str:
+        return self.tokens[self.pos][0] if self.pos < len(self.tokens) else ""
+
+    def next(self) -> str:
+        tok = self.peek()
+        self.pos += 1
+        return tok
+
+    def line(self) -> int:
+        return self.tokens[min(self.pos, len(self.tokens) - 1)][1] if self.tokens else 0
+
+    def skip_statement(self):
+        depth = 0
+        while self.pos < len(self.tokens):
+            tok = self.next()
+            if tok in "({":
+                depth += 1
+            elif tok in ")}":
+                depth -= 1
+                if depth <= 0 and tok == ")" and self.peek() != ";":
+                    return
+            elif tok == ";" and depth <= 0:
+                return
+
+    def names(self) -> List[str]:
+        """NAME | { a b -c } | ~{ ... } | * ; negations come back as '~x'."""
+        tok = self.next()
+        if tok == "~":
+            return ["~" + n for n in self.names() if not n.startswith("~")]
+        if tok == "*":
+            return ["*"]
+        if tok != "{":
+            return [tok]
+        out = []
+        while self.peek() not in ("}", ""):
+            t = self.next()
+            if t == "~":
+                out.extend("~" + n for n in self.names())
+            elif t.startswith("-"):
+                out.append("~" + t[1:])
+            else:
+                out.append(t)
+        self.next()
+        return out
+
+    def parse(self):
+        while self.pos < len(self.tokens):
+            tok = self.peek()
+            start = self.pos
+            try:
+                if tok == "allow":
+                    self.parse_allow()
+                elif tok == "type":
+                    self.parse_type()
+                elif tok == "attribute":
+                    self.next()
+                    self.attributes.add(self.next())
+                    self.skip_statement()
+                elif tok == "typeattribute":
+                    self.next()
+                    t = self.next()
+                    attrs = [a for a in self.comma_list() if a]
+                    self.types.setdefault(t, set()).update(attrs)
+                    self.attributes.update(attrs)
+                elif self.pos + 1 < len(self.tokens) and self.tokens[self.pos + 1][0] == "(":
+                    self.parse_macro()
+                else:
+                    # neverallow, dontaudit, type_transition, ... do not grant
+                    self.skip_statement()
+            except (IndexError, ValueError):
+                self.unparsed += 1
+                self.pos = max(self.pos, start + 1)
+                self.skip_statement()
+
+    def comma_list(self) -> List[str]:
+        out = []
+        while self.peek() not in (";", ""):
+            t = self.next()
+            if t != ",":
+                out.append(t)
+        self.next()
+        return out
+
+    def parse_type(self):
+        self.next()
+        name = self.next()
+        attrs = set()
+        if self.peek() == ",":
+            self.next()
+            attrs.update(self.comma_list())
+        else:
+            self.skip_statement()
+        self.types.setdefault(name, set()).update(attrs)
+        self.attributes.update(attrs)
+
+    def parse_allow(self):
+        line = self.line()
+        self.next()
+        sources = self.names()
+        targets = self.names()
+        if self.next() != ":":
+            raise ValueError("expected ':'")
+        classes = self.names()
+        perms = self.names()
+        perms = [p for name in perms for p in PERM_MACROS.get(name, name).split()]
+        if self.next() != ";":
+            raise ValueError("expected ';'")
+        self.rules.append(AllowRule(sources, targets, classes, perms, self.path, line))
+
+    def parse_macro(self):
+        line = self.line()
+        name = self.next()
+        self.next()  # (
+        args = []
+        while self.peek() not in (")", ""):
+            t = self.next()
+            if t != ",":
+                args.append(t)
+        self.next()
+        if self.peek() == ";":
+            self.next()
+
+        def add(s, t, c, perms):
+            self.rules.append(AllowRule([s], [t], [c], perms.split(), self.path, line))
+
+        if name == "binder_call" and len(args) == 2:
+            s, t = args
+            add(s, t, "binder", "call transfer")
+            add(t, s, "binder", "transfer")
+            add(s, t, "fd", "use")
+        elif name == "set_prop" and len(args) == 2:
+            add(args[0], args[1], "property_service", "set")
+            add(args[0], args[1], "file", "getattr open read map")
+        elif name == "get_prop" and len(args) == 2:
+            add(args[0], args[1], "file", "getattr open read map")
+        else:
+            self.unparsed += 1
+
+
+def iter_te_files(paths: Iterable[str]) -> Iterable[str]:
+    for p in paths:
+        if os.path.isdir(p):
+            for name in sorted(os.listdir(p)):
+                # system/sepolicy/public declares its attributes in "attributes"
+                if name.endswith(".te") or name == "attributes":
+                    yield os.path.join(p, name)
+        elif os.path.isfile(p):
+            yield p
+
+
+# ============================================================
+# Index
+# ============================================================
+
+class TeIndex:
+    """(source, target, class) -> permission bitset, with attribute lookup."""
+
+    def __init__(self):
+        self.grants: Dict[Key, int] = {}
+        self.perm_bits: Dict[str, Dict[str, int]] = {}
+        self.type_attrs: Dict[str, Set[str]] = {}
+        self.attributes: Set[str] = set()
+        self.files: Dict[str, PolicyFile] = OrderedDict()
+        self.unparsed = 0
+        self._memo: Dict[Key, int] = {}
+        self._members: Dict[str, Set[str]] = {}
+        self._dirty = False
+        # Names the resolved (exclusion / * / self) rules depend on
+        self._resolved_names: Set[str] = set()
+        # Rules naming types/attributes no loaded file declares, with
+        # their per-class masks, and memoized possibly_granted() answers
+        self._open_rules: List[Tuple[AllowRule, Dict[str, int]]] = []
+        self._open_memo: Dict[Key, Tuple[int, List[str]]] = {}
+
+    # -- permission interning --
+    def bit(self, cls: str, perm: str) -> int:
+        table = self.perm_bits.setdefault(cls, {})
+        b = table.get(perm)
+        if b is None:
+            b = table[perm] = 1 << len(table)
+        return b
+
+    def mask(self, cls: str, perms: Iterable[str]) -> int:
+        m = 0
+        for p in perms:
+            m |= self.bit(cls, p)
+        return m
+
+    def perms_of(self, cls: str, mask: int) -> List[str]:
+        return [p for p, b in self.perm_bits.get(cls, {}).items() if mask & b]
+
+    # -- loading --
+    def add_file(self, path: str):
+        with open(path, "r", errors="replace") as f:
+            parser = TeParser(path, tokenize(f.read()))
+        parser.parse()
+        self.unparsed += parser.unparsed
+        for t, attrs in parser.types.items():
+            self.type_attrs.setdefault(t, set()).update(attrs)
+        self.attributes.update(parser.attributes)
+        self.files[path] = PolicyFile(path, parser.rules)
+        # Exclusions and self need attribute members from every file
+        self._dirty = True
+
+    def build(self):
+        """(Re)computes the grants once all files are loaded."""
+        self.grants.clear()
+        self._memo.clear()
+        self._open_memo.clear()
+        self._resolved_names = set()
+        self._open_rules = []
+        self._members = {}
+        for t, attrs in self.type_attrs.items():
+            for a in attrs:
+                self._members.setdefault(a, set()).add(t)
+        for pf in self.files.values():
+            for rule in pf.rules:
+                self.add_rule(rule)
+        self._dirty = False
+
+    def declared(self, name: str) -> bool:
+        return name in self.attributes or name in self.type_attrs
+
+    def unresolved(self, name: str) -> bool:
+        """An AOSP attribute the loaded policy uses but never declares."""
+        return not self.declared(name) and AOSP_ATTRIBUTE_RE.match(name) is not None
+
+    def add_domain(self, stype: str):
+        """Marks a process context type as a member of AOSP's `domain`.
+
+        Project overlays use `domain` without declaring it, and the types
+        of the processes in a denial log need not be declared either.
+        """
+        attrs = self.type_attrs.setdefault(stype, set())
+        if DOMAIN in attrs:
+            return
+        attrs.add(DOMAIN)
+        self.attributes.add(DOMAIN)
+        self._members.setdefault(DOMAIN, set()).add(stype)
+        if DOMAIN in self._resolved_names or "*" in self._resolved_names:
+            self._dirty = True
+        self._memo.clear()
+        self._open_memo.clear()
+
+    def members(self, name: str) -> Optional[Set[str]]:
+        """Concrete types behind `name`; None for an attribute with no known members."""
+        if name in self.attributes:
+            return set(self._members.get(name, ())) or None
+        return {name}
+
+    def resolve(self, names: List[str]) -> Optional[List[str]]:
+        """Resolves a type set with '-x' / '~{...}' / '*' to concrete types.
+
+        Sets without exclusions are kept as written, so attribute rules still
+        match through expand(). None means the set cannot be resolved from the
+        loaded policy (an attribute with no known members, declared or not,
+        or an undeclared attribute excluded) and the rule grants nothing.
+        """
+        excluded = [n[1:] for n in names if n.startswith("~")]
+        if not excluded and "*" not in names:
+            return list(names)
+        if any(self.unresolved(n) for n in excluded):
+            return None
+        self._resolved_names.update(n.lstrip("~") for n in names)
+        positive = [n for n in names if not n.startswith("~")]
+        if not positive or "*" in positive:
+            # ~{...} and *: every type the loaded policy declares
+            self._resolved_names.add("*")
+            out = set(self.type_attrs)
+        else:
+            out = set()
+            for n in positive:
+                m = None if self.unresolved(n) else self.members(n)
+                if m is None:
+                    return None
+                out |= m
+        for n in excluded:
+            out -= {n} | self._members.get(n, set())
+        return sorted(out)
+
+    def class_masks(self, rule: AllowRule) -> Dict[str, int]:
+        if "*" in rule.perms:
+            base = ALL_PERMS
+        elif rule.perms and all(p.startswith("~") for p in rule.perms):
+            base = ALL_PERMS   # complement: everything but the excluded bits
+        else:
+            base = 0
+        masks = {}
+        for cls in rule.classes:
+            if cls.startswith("~"):
+                continue
+            mask = base
+            for p in rule.perms:
+                if p == "*":
+                    continue
+                if p.startswith("~"):
+                    mask &= ~self.bit(cls, p[1:])
+                else:
+                    mask |= self.bit(cls, p)
+            masks[cls] = mask
+        return masks
+
+    def add_rule(self, rule: AllowRule):
+        masks = self.class_masks(rule)
+        names = [n.lstrip("~") for n in rule.sources + rule.targets]
+        if any(self.unresolved(n) for n in names):
+            self._open_rules.append((rule, masks))
+        sources = self.resolve(rule.sources)
+        targets = self.resolve([t for t in rule.targets if t != "self"])
+        if sources is None or targets is None:
+            return
+        self_sources: List[str] = []
+        if "self" in rule.targets:
+            # self is per concrete source type, never attribute to attribute
+            self._resolved_names.update(sources)
+            for s in sources:
+                self_sources.extend(sorted(self.members(s) or ()))
+        for cls, mask in masks.items():
+            keys = [(s, t, cls) for s in sources for t in targets]
+            keys += [(s, s, cls) for s in self_sources]
+            for key in keys:
+                self.grants[key] = self.grants.get(key, 0) | mask
+
+    # -- queries --
+    def expand(self, name: str) -> Set[str]:
+        return {name} | self.type_attrs.get(name, set())
+
+    def granted(self, stype: str, ttype: str, cls: str) -> int:
+        if self._dirty:
+            self.build()
+        key = (stype, ttype, cls)
+        m = self._memo.get(key)
+        if m is None:
+            m = 0
+            grants = self.grants
+            for s in self.expand(stype):
+                for t in self.expand(ttype):
+                    m |= grants.get((s, t, cls), 0)
+            self._memo[key] = m
+        return m
+
+    def possibly_granted(self, stype: str, ttype: str, cls: str) -> Tuple[int, List[str]]:
+        """Permissions that rules on undeclared attributes may grant, and where.
+
+        A rule such as `allow hal_foo sysfs:file read;` with hal_foo an AOSP
+        attribute this policy never declares cannot be resolved here; if the
+        denial matches it on every side that is declared, it is reported as
+        possibly covered instead of suggested again.
+        """
+        if self._dirty:
+            self.build()
+        key = (stype, ttype, cls)
+        hit = self._open_memo.get(key)
+        if hit is None:
+            m, where = 0, []
+            src, tgt = self.expand(stype), self.expand(ttype)
+            for rule, masks in self._open_rules:
+                mask = masks.get(cls)
+                if not mask:
+                    continue
+                s_ok, s_open = self._side(rule.sources, src)
+                t_ok, t_open = self._side([t for t in rule.targets if t != "self"], tgt)
+                if "self" in rule.targets and stype == ttype:
+                    t_ok, t_open = t_ok or s_ok, t_open or s_open
+                if (s_ok or s_open) and (t_ok or t_open) and (s_open or t_open):
+                    m |= mask
+                    where.append(f"{os.path.basename(rule.path)}:{rule.line}")
+            hit = self._open_memo[key] = (m, where)
+        return hit
+
+    def _side(self, names: List[str], expanded: Set[str]) -> Tuple[bool, bool]:
+        """(matches a declared name, could match an undeclared one) for one side."""
+        if any(n[1:] in expanded for n in names if n.startswith("~")):
+            return False, False
+        positive = [n for n in names if not n.startswith("~")]
+        if "*" in positive or (not positive and names):
+            matched, open_ = True, False
+        else:
+            matched = any(n in expanded for n in positive)
+            open_ = any(self.unresolved(n) for n in positive)
+        # An undeclared exclusion (-coredomain) may still remove the type
+        if matched and any(self.unresolved(n[1:]) for n in names if n.startswith("~")):
+            return False, True
+        return matched, open_
+
+
+def load_index(paths: Iterable[str]) -> TeIndex:
+    index = TeIndex()
+    for path in iter_te_files(paths):
+        index.add_file(path)
+    index.build()
+    return index
+
+
+# ============================================================
+# AVC filtering
+# ============================================================
+
+def context_type(ctx: str) -> str:
+    parts = ctx.split(":")
+    return parts[2] if len(parts) >= 3 else ctx
+
+
+def is_process_context(ctx: str) -> bool:
+    parts = ctx.split(":")
+    return len(parts) >= 3 and parts[1] == "r"
+
+
+@dataclass
+class DenialStats:
+    lines: int = 0
+    denials: int = 0
+    covered: int = 0
+    missing: Dict[Key, int] = field(default_factory=dict)     # key -> needed mask
+    counts: Dict[Key, int] = field(default_factory=dict)      # key -> denial hits
+    # key -> mask / rule locations for rules on undeclared AOSP attributes
+    possible: Dict[Key, int] = field(default_factory=dict)
+    possible_at: Dict[Key, List[str]] = field(default_factory=dict)
+
+
+def filter_denials(index: TeIndex, lines: Iterable[str]) -> DenialStats:
+    stats = DenialStats()
+    for line in lines:
+        stats.lines += 1
+        if "avc:" not in line:
+            continue
+        m = AVC_RE.search(line)
+        if not m:
+            continue
+        stats.denials += 1
+        perms, scon, tcon, cls = m.groups()
+        key = (context_type(scon), context_type(tcon), cls)
+        index.add_domain(key[0])
+        if is_process_context(tcon):
+            index.add_domain(key[1])
+        need = index.mask(cls, perms.split())
+        need &= ~index.granted(*key)
+        if not need:
+            stats.covered += 1
+            continue
+        maybe, where = index.possibly_granted(*key)
+        if need & maybe:
+            stats.possible[key] = stats.possible.get(key, 0) | (need & maybe)
+            stats.possible_at[key] = where
+            need &= ~maybe
+            if not need:
+                continue
+        stats.missing[key] = stats.missing.get(key, 0) | need
+        stats.counts[key] = stats.counts.get(key, 0) + 1
+    return stats
+
+
+def _fmt_set(items: List[str]) -> str:
+    return items[0] if len(items) == 1 else "{ " + " ".join(items) + " }"
+
+
+def merge_rules(index: TeIndex, stats: DenialStats) -> List[Dict]:
+    """Folds needed permissions into minimal allow rules.
+
+    Targets sharing (source, class, perms) are merged first, then classes
+    sharing (source, targets, perms).
+    """
+    by_perm: Dict[Tuple[str, str, Tuple[str, ...]], List[str]] = OrderedDict()
+    hits: Dict[Tuple[str, str, Tuple[str, ...]], int] = {}
+    for (s, t, c), mask in sorted(stats.missing.items()):
+        perms = tuple(sorted(index.perms_of(c, mask)))
+        k = (s, c, perms)
+        by_perm.setdefault(k, []).append(t)
+        hits[k] = hits.get(k, 0) + stats.counts[(s, t, c)]
+
+    by_targets: Dict[Tuple[str, Tuple[str, ...], Tuple[str, ...]], List[str]] = OrderedDict()
+    merged_hits: Dict[Tuple, int] = {}
+    for (s, c, perms), targets in by_perm.items():
+        k = (s, tuple(targets), perms)
+        by_targets.setdefault(k, []).append(c)
+        merged_hits[k] = merged_hits.get(k, 0) + hits[(s, c, perms)]
+
+    rules = []
+    for (s, targets, perms), classes in by_targets.items():
+        rules.append({
+            "source": s,
+            "targets": list(targets),
+            "classes": classes,
+            "perms": list(perms),
+            "denials": merged_hits[(s, targets, perms)],
+            "rule": f"allow {s} {_fmt_set(list(targets))}:{_fmt_set(classes)} {_fmt_set(list(perms))};",
+        })
+    rules.sort(key=lambda r: (-r["denials"], r["rule"]))
+    return rules
+
+
+def choose_owner(index: TeIndex, rule: Dict, overlay_files: List[str]) -> str:
+    """Overlay file with the most rules about the same domain.
+
+    Target and class overlap only break ties; a rule for a domain no
+    overlay mentions yet goes to binder_relax.te (binder class),
+    hal_relax.te (hal_* domains) or minimal_compat.te.
+    """
+    best, best_score = None, 0.0
+    targets = set(rule["targets"])
+    classes = set(rule["classes"])
+    for path in overlay_files:
+        pf = index.files.get(path)
+        if pf is None:
+            continue
+        score = 0.0
+        for r in pf.rules:
+            if rule["source"] in r.sources:
+                score += 3
+            if targets & set(r.targets):
+                score += 1
+            if classes & set(r.classes):
+                score += 0.25
+        if score > best_score:
+            best, best_score = path, score
+    if best is not None and best_score >= 3:
+        return os.path.basename(best)
+    names = {os.path.basename(p) for p in overlay_files}
+    if classes == {"binder"} and BINDER_OWNER in names:
+        return BINDER_OWNER
+    return HAL_FALLBACK_OWNER if rule["source"].startswith("hal_") else FALLBACK_OWNER
+
+
+def write_diff(rules: List[Dict], overlay_dir_files: Dict[str, str], out_path: str):
+    """Unified diff appending each owner's new rules to its overlay file."""
+    by_owner: Dict[str, List[Dict]] = OrderedDict()
+    for r in rules:
+        by_owner.setdefault(r["owner"], []).append(r)
+    chunks = []
+    for owner, owned in sorted(by_owner.items()):
+        path = overlay_dir_files.get(owner)
+        old = []
+        if path and os.path.exists(path):
+            with open(path, "r") as f:
+                old = f.read().splitlines(keepends=True)
+        rel = os.path.relpath(path, PROJECT_ROOT) if path else f"sepolicy/overlays/{owner}"
+        new = list(old)
+        if new and not new[-1].endswith("\n"):
+            new[-1] += "\n"
+        new.extend(["\n", "# --- Suggested from AVC denials (review before merging) ---\n"])
+        new.extend(f"{r['rule']}\n" for r in owned)
+        chunks.extend(difflib.unified_diff(old, new, f"a/{rel}", f"b/{rel}"))
+    with open(out_path, "w") as f:
+        f.writelines(chunks)
+
+
+# ============================================================
+# CLI
+# ============================================================
+
+def open_lines(path: str):
+    if path == "-":
+        return sys.stdin
+    return open(path, "r", errors="replace")
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description="Index .te policy and filter AVC denials down to missing rules."
+    )
+    parser.add_argument(
+        "--overlays",
+        action="append",
+        help="Project policy files/dirs that may own new rules "
+             "(default: sepolicy/vendor15_survival.te, sepolicy/overlays/)",
+    )
+    parser.add_argument(
+        "--te",
+        action="append",
+        default=[],
+        help="Extra policy files/dirs (e.g. system/sepolicy) for grants and attributes",
+    )
+    parser.add_argument("--avc", help="Log containing avc: denied lines ('-' for stdin)")
+    parser.add_argument("--json", help="Write the filtered result as JSON")
+    parser.add_argument("--diff", help="Write a unified diff adding the rules to their owners")
+    parser.add_argument(
+        "--query",
+        nargs=3,
+        metavar=("SOURCE", "TARGET", "CLASS"),
+        help="Print the permissions granted for one (source, target, class)",
+    )
+
+    args = parser.parse_args()
+    overlay_paths = args.overlays or DEFAULT_OVERLAYS
+    overlay_files = list(iter_te_files(overlay_paths))
+    index = load_index(args.te + overlay_files)
+
+    if args.query:
+        s, t, c = args.query
+        index.add_domain(s)   # a rule source is always a process type
+        mask = index.granted(s, t, c)
+        if mask < 0:
+            # "*" or a complement: name what is left out instead
+            excluded = sorted(set(index.perm_bits.get(c, {})) - set(index.perms_of(c, mask)))
+            granted = "~" + _fmt_set(excluded) if excluded else "*"
+        else:
+            perms = sorted(index.perms_of(c, mask))
+            granted = _fmt_set(perms) if perms else "{ }"
+        print(f"allow {s} {t}:{c} {granted};")
+        sys.exit(0)
+
+    if not args.avc:
+        print(f"Indexed {len(index.grants)} (source, target, class) keys from "
+              f"{len(index.files)} file(s); {index.unparsed} statement(s) not understood")
+        sys.exit(0)
+
+    f = open_lines(args.avc)
+    try:
+        stats = filter_denials(index, f)
+    finally:
+        if f is not sys.stdin:
+            f.close()
+
+    rules = merge_rules(index, stats)
+    for r in rules:
+        r["owner"] = choose_owner(index, r, overlay_files)
+
+    possible = [
+        {"rule": f"allow {s} {t}:{c} {_fmt_set(sorted(index.perms_of(c, mask)))};",
+         "at": stats.possible_at[(s, t, c)]}
+        for (s, t, c), mask in sorted(stats.possible.items())
+    ]
+    print(f"Denials: {stats.denials} ({stats.covered} already granted by policy), "
+          f"{len(stats.missing)} missing (source, target, class), {len(rules)} rule(s)")
+    if possible:
+        print("")
+        print(f"# Possibly covered by rules on attributes not declared in the loaded "
+              f"policy ({len(possible)}); add --te <aosp>/system/sepolicy/... to check")
+        for p in possible:
+            print(f"#   {p['rule']}  # {', '.join(p['at'])}")
+    by_owner: Dict[str, List[Dict]] = OrderedDict()
+    for r in rules:
+        by_owner.setdefault(r["owner"], []).append(r)
+    for owner, owned in sorted(by_owner.items()):
+        print("")
+        print(f"# {owner}")
+        for r in owned:
+            print(f"{r['rule']}  # {r['denials']} denial(s)")
+
+    if args.json:
+        with open(args.json, "w") as out:
+            json.dump({
+                "lines": stats.lines,
+                "denials": stats.denials,
+                "covered": stats.covered,
+                "missing_keys": len(stats.missing),
+                "rules": rules,
+                "possibly_covered": possible,
+            }, out, indent=2)
+    if args.diff:
+        write_diff(rules, {os.path.basename(p): p for p in overlay_files}, args.diff)
+
+    sys.exit(1 if rules else 0)
+
+
+if __name__ == "__main__":
+    main()
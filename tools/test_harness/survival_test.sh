@@ -286,6 +286,14 @@ else
     fail "Fatal crashes detected: $FATAL_COUNT (review: adb logcat | grep -E 'FATAL|SIGABRT')"
 fi
 
+# Crash loops repeat one crash many times; fold hits into distinct signatures
+# (set CRASH_REPORT=path to keep the full JSON report)
+CRASH_ANALYZER="$(dirname "$0")/../crash_analyzer/crash_signatures.py"
+if [ "$FATAL_COUNT" -gt 0 ] && command -v python3 >/dev/null 2>&1 && [ -f "$CRASH_ANALYZER" ]; then
+    echo "$LOGCAT" | python3 "$CRASH_ANALYZER" - --top 5 ${CRASH_REPORT:+--json "$CRASH_REPORT"} \
+        | sed 's/^/  /' || true
+fi
+
 SS_CRASH_COUNT=$(echo "$LOGCAT" | grep -c "system_server.*died" 2>/dev/null || echo "0")
 if [ "$SS_CRASH_COUNT" -eq 0 ]; then
     pass "system_server: no crashes detected"
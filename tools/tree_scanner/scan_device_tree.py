@@ -0,0 +1,327 @@
+#!/usr/bin/env python3
+"""
+Single-pass Device Tree Policy Scanner for Vendor15 Survival Architecture.
+
+Evaluates a data-defined list of checks (default: aidl_only_checks.json,
+the AIDL-only compliance rules from scripts/verify_aidl_only.sh) against a
+TrebleDroid device tree. The tree is walked once, files are read in
+parallel, and every regex rule that applies to a file is evaluated through
+one combined pattern, so each file is read exactly once regardless of how
+many checks there are. VINTF manifests and compatibility matrices are
+checked structurally (manifests through the shared vintf_model index).
+
+Check types:
+  regex            pattern matched line by line ("include" globs or "paths")
+  vintf_manifest   HALs declared with format="hidl" or hwbinder transport
+  matrix_optional  <hal> entries in a compatibility matrix lacking optional="true"
+                   (format="native" HALs are exempt)
+
+"paths" entries may use {tree} for the device tree root; other relative
+paths are resolved against the current directory. With "first_existing",
+only the first path that exists is checked.
+
+Usage:
+    python3 scan_device_tree.py [DEVICE_TREE_ROOT] [--checks rules.json] [--json report.json]
+
+Exit codes:
+    0 = all checks pass
+    1 = one or more checks failed
+"""
+
+import argparse
+import fnmatch
+import json
+import os
+import re
+import sys
+import xml.parsers.expat
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass, field
+from pathlib import Path
+from typing import Dict, List, Optional
+
+SCRIPT_DIR = Path(__file__).resolve().parent
+sys.path.insert(0, str(SCRIPT_DIR.parents[1] / "build" / "make" / "tools" / "vndk_compat"))
+
+import vintf_model  # noqa: E402
+
+DEFAULT_CHECKS = SCRIPT_DIR / "aidl_only_checks.json"
+
+# Never descend into VCS metadata
+SKIP_DIRS = {".git", ".repo"}
+
+
+@dataclass
+class Finding:
+    path: str
+    line: int
+    text: str
+
+
+@dataclass
+class Check:
+    id: str
+    description: str
+    type: str
+    pattern: Optional[re.Pattern] = None
+    include: List[str] = field(default_factory=list)
+    paths: List[str] = field(default_factory=list)
+    first_existing: bool = False
+    findings: List[Finding] = field(default_factory=list)
+    scanned: int = 0
+
+    @property
+    def passed(self) -> bool:
+        return not self.findings
+
+
+def load_checks(checks_path: str, tree: str) -> List[Check]:
+    with open(checks_path, "r") as f:
+        data = json.load(f)
+    checks = []
+    for spec in data.get("checks", []):
+        paths = [os.path.normpath(p.replace("{tree}", tree)) for p in spec.get("paths", [])]
+        if spec.get("first_existing"):
+            paths = [p for p in paths if os.path.isfile(p)][:1]
+        checks.append(Check(
+            id=spec["id"],
+            description=spec.get("description", spec["id"]),
+            type=spec.get("type", "regex"),
+            pattern=re.compile(spec["pattern"]) if spec.get("pattern") else None,
+            include=spec.get("include", []),
+            paths=paths,
+            first_existing=spec.get("first_existing", False),
+        ))
+    return checks
+
+
+def walk_tree(tree: str) -> List[str]:
+    files = []
+    stack = [tree]
+    while stack:
+        d = stack.pop()
+        try:
+            with os.scandir(d) as it:
+                for entry in it:
+                    if entry.is_dir(follow_symlinks=False):
+                        if entry.name not in SKIP_DIRS:
+                            stack.append(entry.path)
+                    elif entry.is_file():
+                        files.append(os.path.normpath(entry.path))
+        except OSError:
+            continue
+    return files
+
+
+def assign_files(checks: List[Check], tree_files: List[str]) -> Dict[str, List[Check]]:
+    """Maps each file to the checks that apply to it (one read per file)."""
+    plan: Dict[str, List[Check]] = {}
+    for chk in checks:
+        if chk.paths:
+            for p in chk.paths:
+                if os.path.isfile(p):
+                    plan.setdefault(p, []).append(chk)
+    glob_checks = [c for c in checks if c.include and not c.paths]
+    for path in tree_files:
+        name = os.path.basename(path)
+        for chk in glob_checks:
+            if any(fnmatch.fnmatch(name, g) for g in chk.include):
+                plan.setdefault(path, []).append(chk)
+    return plan
+
+
+class FileScanner:
+    """Evaluates every check that applies to one file from a single read."""
+
+    def __init__(self):
+        self._combined: Dict[tuple, re.Pattern] = {}
+
+    def combined(self, checks: List[Check]) -> re.Pattern:
+        key = tuple(c.id for c in checks)
+        rx = self._combined.get(key)
+        if rx is None:
+            rx = re.compile("|".join(f"(?:{c.pattern.pattern})" for c in checks))
+            self._combined[key] = rx
+        return rx
+
+    def scan(self, path: str, checks: List[Check]) -> List[tuple]:
+        try:
+            with open(path, "r", errors="replace") as f:
+                content = f.read()
+        except OSError:
+            return []
+
+        hits = []
+        regex_checks = [c for c in checks if c.type == "regex"]
+        if regex_checks:
+            rx = self.combined(regex_checks)
+            last_line_end = -1
+            lineno, pos = 1, 0
+            for m in rx.finditer(content):
+                start = content.rfind("\n", 0, m.start()) + 1
+                if start <= last_line_end:
+                    continue  # line already evaluated
+                lineno += content.count("\n", pos, start)
+                pos = start
+                end = content.find("\n", m.start())
+                end = len(content) if end < 0 else end
+                line = content[start:end]
+                # Combined regex is only the prefilter; attribute per rule
+                for chk in regex_checks:
+                    if chk.pattern.search(line):
+                        hits.append((chk, Finding(path, lineno, line.strip())))
+                last_line_end = end
+
+        for chk in checks:
+            if chk.type == "vintf_manifest" and "<manifest" in content:
+                hits.extend((chk, f) for f in scan_manifest(path, content))
+            elif chk.type == "matrix_optional":
+                hits.extend((chk, f) for f in scan_matrix(path, content))
+        return hits
+
+
+def _line_of(content: str, needle: str) -> int:
+    idx = content.find(needle)
+    return content.count("\n", 0, idx) + 1 if idx >= 0 else 0
+
+
+def scan_manifest(path: str, content: str) -> List[Finding]:
+    # Each file is checked on its own; fragments are scanned as separate files
+    try:
+        index = vintf_model.VintfIndex(vintf_model.parse_file(path))
+    except vintf_model.ET.ParseError as e:
+        return [Finding(path, 0, f"XML parse error: {e}")]
+
+    flagged = {id(h): h for h in index.with_format("hidl")}
+    flagged.update((id(h), h) for h in index.hals if h.transport == "hwbinder")
+    return [
+        Finding(path, _line_of(content, f"<name>{hal.name}</name>"),
+                f"{hal.name} (format={hal.format}, transport={hal.transport or '-'})")
+        for hal in flagged.values()
+    ]
+
+
+def scan_matrix(path: str, content: str) -> List[Finding]:
+    findings = []
+    parser = xml.parsers.expat.ParserCreate()
+    depth = [0]
+
+    def start(tag, attrs):
+        depth[0] += 1
+        if tag == "hal" and depth[0] == 2:
+            if attrs.get("optional") != "true" and attrs.get("format", "hidl") != "native":
+                attr_text = " ".join(f'{k}="{v}"' for k, v in attrs.items())
+                findings.append(Finding(path, parser.CurrentLineNumber, f"<hal {attr_text}>"))
+
+    def end(tag):
+        depth[0] -= 1
+
+    parser.StartElementHandler = start
+    parser.EndElementHandler = end
+    try:
+        parser.Parse(content, True)
+    except xml.parsers.expat.ExpatError as e:
+        findings.append(Finding(path, e.lineno, f"XML parse error: {e}"))
+    return findings
+
+
+def run_checks(tree: str, checks: List[Check], jobs: int) -> List[Check]:
+    plan = assign_files(checks, walk_tree(tree))
+    scanner = FileScanner()
+    with ThreadPoolExecutor(max_workers=jobs) as pool:
+        results = pool.map(lambda item: scanner.scan(*item), plan.items())
+        for hits in results:
+            for chk, finding in hits:
+                chk.findings.append(finding)
+    for path, file_checks in plan.items():
+        for chk in file_checks:
+            chk.scanned += 1
+    for chk in checks:
+        chk.findings.sort(key=lambda f: (f.path, f.line))
+    return checks
+
+
+def print_report(tree: str, checks: List[Check]):
+    print("=== AIDL-Only Compliance Verification ===")
+    print(f"Device tree: {tree}")
+    print("")
+    for chk in checks:
+        note = " (no matching files — skipped)" if chk.scanned == 0 else ""
+        print(f"  {'PASS' if chk.passed else 'FAIL'}: {chk.description}{note}")
+        for f in chk.findings[:50]:
+            print(f"      {f.path}:{f.line}: {f.text}")
+        if len(chk.findings) > 50:
+            print(f"      ... {len(chk.findings) - 50} more")
+
+    failed = sum(1 for c in checks if not c.passed)
+    print("")
+    print("=== AIDL-Only Compliance Summary ===")
+    print(f"  Total : {len(checks)}")
+    print(f"  Pass  : {len(checks) - failed}")
+    print(f"  Fail  : {failed}")
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description="Evaluate data-defined policy checks over a device tree in one pass."
+    )
+    parser.add_argument(
+        "tree",
+        nargs="?",
+        help="Device tree root (default: device/phh/treble or trebledroid/device_phh_treble)",
+    )
+    parser.add_argument(
+        "--checks",
+        default=str(DEFAULT_CHECKS),
+        help="Check definitions JSON (default: aidl_only_checks.json)",
+    )
+    parser.add_argument(
+        "--json",
+        help="Write per-check results with file/line locations to this path",
+    )
+    parser.add_argument(
+        "--jobs",
+        type=int,
+        default=min(32, (os.cpu_count() or 1) * 4),
+        help="Parallel file readers",
+    )
+
+    args = parser.parse_args()
+
+    tree = args.tree
+    if not tree:
+        for candidate in ("device/phh/treble", "trebledroid/device_phh_treble"):
+            if os.path.isdir(candidate):
+                tree = candidate
+                break
+    if not tree or not os.path.isdir(tree):
+        print("Error: Could not find device tree.", file=sys.stderr)
+        print("Usage: scan_device_tree.py [DEVICE_TREE_ROOT]", file=sys.stderr)
+        sys.exit(1)
+    tree = os.path.normpath(tree)
+
+    checks = run_checks(tree, load_checks(args.checks, tree), max(1, args.jobs))
+    print_report(tree, checks)
+
+    if args.json:
+        report = {
+            "tree": tree,
+            "checks": [
+                {
+                    "id": c.id,
+                    "description": c.description,
+                    "passed": c.passed,
+                    "files_scanned": c.scanned,
+                    "findings": [f.__dict__ for f in c.findings],
+                }
+                for c in checks
+            ],
+        }
+        with open(args.json, "w") as f:
+            json.dump(report, f, indent=2)
+
+    sys.exit(1 if any(not c.passed for c in checks) else 0)
+
+
+if __name__ == "__main__":
+    main()
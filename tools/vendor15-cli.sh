@@ -15,6 +15,7 @@
 #   diagnose          Run diagnostics on connected device
 #   test              Run survival test harness on device
 #   probe             Run HAL capability probes on device
+#   farm              Run probes + survival checks on many devices
 #   dp-detect         Run dynamic partition detection on device
 #   avc-parse         Parse AVC denials and suggest SELinux rules
 #   vndk-check        Check VNDK version mismatch on device
@@ -28,6 +29,7 @@ set -euo pipefail
 SCRIPT_DIR="$(cd "$(dirname "${BASH_SOURCE[0]}")" && pwd)"
 PROJECT_ROOT="$(cd "$SCRIPT_DIR/.." && pwd)"
 ADB="${ADB:-adb}"
+STAGE_CACHE="$PROJECT_ROOT/build/make/tools/vndk_compat/stage_cache.py"
 
 # Colors
 RED='\033[0;31m'
@@ -68,6 +70,10 @@ usage() {
     echo "  probe"
     echo "      Push and run HAL probes on connected device."
     echo ""
+    echo "  farm [device_farm.py args...]"
+    echo "      Run HAL probes, survival checks and AVC scan on many devices"
+    echo "      concurrently. Default: all devices, report to farm_report.json"
+    echo ""
     echo "  dp-detect"
     echo "      Run dynamic partition detection on connected device."
     echo ""
@@ -109,6 +115,14 @@ cmd_generate_matrix() {
             --output "$output" \
             --verbose
     elif [ -n "$vendor_manifest" ] && [ -n "$upstream_matrix" ]; then
+        # Memoized when VNDK_COMPAT_CACHE_DIR is set (fragments dir included in the key)
+        python3 "$STAGE_CACHE" --stage optimize_matrix --verbose \
+            --input "$vendor_manifest" --input "${vendor_manifest%.xml}" \
+            --input "$upstream_matrix" \
+            --tool "$SCRIPT_DIR/matrix_optimizer/optimize_matrix.py" \
+            --tool "$PROJECT_ROOT/build/make/tools/vndk_compat/vintf_model.py" \
+            --tool "$PROJECT_ROOT/build/make/tools/vndk_compat/vintf_versions.py" \
+            --output "$output" -- \
         python3 "$SCRIPT_DIR/matrix_optimizer/optimize_matrix.py" \
             --vendor-manifest "$vendor_manifest" \
             --upstream-matrix "$upstream_matrix" \
@@ -134,6 +148,9 @@ cmd_generate_shim() {
     local target_ver="${2:-5}"
     local output_dir="${3:-./mapper_shim_output}"
 
+    python3 "$STAGE_CACHE" --stage mapper_shim --verbose \
+        --tool "$SCRIPT_DIR/shim_generator/generate_mapper_shim.py" \
+        --output "$output_dir" -- \
     python3 "$SCRIPT_DIR/shim_generator/generate_mapper_shim.py" \
         --vendor-version "$vendor_ver" \
         --target-version "$target_ver" \
@@ -209,6 +226,21 @@ cmd_probe() {
         echo "(no probe results found)"
 }
 
+# ============================================================
+# Command: farm
+# ============================================================
+cmd_farm() {
+    banner
+    echo "=== Device Farm Run ==="
+    echo ""
+
+    if [ "$#" -eq 0 ]; then
+        set -- --all --json farm_report.json --junit farm_report.xml
+    fi
+
+    python3 "$SCRIPT_DIR/device_farm/device_farm.py" --adb "$ADB" "$@"
+}
+
 # ============================================================
 # Command: scaffold
 # ============================================================
@@ -510,6 +542,7 @@ case "$COMMAND" in
     diagnose)           cmd_diagnose "$@" ;;
     test)               cmd_test "$@" ;;
     probe)              cmd_probe "$@" ;;
+    farm)               cmd_farm "$@" ;;
     dp-detect)          cmd_dp_detect "$@" ;;
     avc-parse)          cmd_avc_parse "$@" ;;
     vndk-check)         cmd_vndk_check "$@" ;;